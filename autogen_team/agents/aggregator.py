@@ -1,4 +1,5 @@
-from typing import List
+import asyncio
+from typing import Any, Dict, List
 
 from autogen_core import (
     DefaultTopicId,
@@ -7,8 +8,22 @@ from autogen_core import (
     default_subscription,
     message_handler,
 )
+from autogen_core.models import ChatCompletionClient, UserMessage
 
-from ..data_models.messages import Question, SolverRequest, FinalSolverResponse, Answer
+from ..data_models.artifacts import (
+    SolutionArtifacts,
+    merge_artifacts,
+    split_artifacts,
+)
+from ..data_models.messages import (
+    Question,
+    SolverRequest,
+    FinalSolverResponse,
+    FollowUpAnswer,
+    Answer,
+)
+from ..prompts import PROMPTS
+from ..solution_clustering import SolutionClusterer
 from ..utils.logging import (
     get_agent_log_path,
     log_initialization,
@@ -18,18 +33,46 @@ from ..utils.logging import (
     log_response_received,
     log_all_responses_received,
     log_final_answer_published,
+    log_solution_clusters,
+    log_follow_up_answer,
+    log_synthesis,
 )
+from ..utils.tokens import count_tokens
 
 
 @default_subscription
 class CodeConsultantAggregator(RoutedAgent):
     def __init__(
-        self, num_solvers: int, log_base_path: str, experiment_name: str
+        self,
+        num_solvers: int,
+        log_base_path: str,
+        experiment_name: str,
+        clusterer: SolutionClusterer | None = None,
+        quorum: int | None = None,
+        early_agreement: int | None = None,
+        synthesis_client: ChatCompletionClient | None = None,
+        synthesis_token_budget: int = 800,
     ) -> None:
         super().__init__("CodeConsultant Aggregator")
         self._num_solvers = num_solvers
+        self._clusterer = clusterer
+        # Finalization policy: publish after quorum responses, or as soon as the
+        # first early_agreement responses agree with each other
+        self._quorum = min(quorum or num_solvers, num_solvers)
+        self._early_agreement = early_agreement
+        self._agreement_clusterer = clusterer or SolutionClusterer()
+        # Set once the final answer is stored, guarded by _finalizing while the
+        # answer is built and synthesized
+        self.finalized = asyncio.Event()
+        self._finalizing = False
+        self.follow_up_answers: List[str] = []
+        # Optional cheap model call merging the solutions into one plan
+        self._synthesis_client = synthesis_client
+        self._synthesis_token_budget = synthesis_token_budget
         self._buffer: List[FinalSolverResponse] = []
         self.final_answer: str = ""
+        # Files, line ranges, patches and tests merged from all solutions
+        self.artifacts: Dict[str, Any] = {}
         self._log_base_path = log_base_path
         self._experiment_name = experiment_name
         self._log_path = get_agent_log_path(
@@ -42,19 +85,18 @@ class CodeConsultantAggregator(RoutedAgent):
         """Handle an incoming question by logging it and publishing to solvers."""
         log_question_received(self._log_path, str(self.id), message.content)
 
-        prompt = self._create_solver_prompt(message.content)
+        prompt = self._create_solver_prompt(message.content, message.context)
 
         await self._publish_solver_request(prompt, message.content)
 
         log_request_published(self._log_path, str(self.id))
 
-    def _create_solver_prompt(self, question_content: str) -> str:
+    def _create_solver_prompt(self, question_content: str, context: str = "") -> str:
         """Create a prompt for the solver agents based on the question."""
-        return (
-            f"Can you solve the following GitHub issue?\n{question_content}\n"
-            "Explain your reasoning. Your final answer should be a general description of the solution, and steps to take to fix the issue.\n"
-            "Provide your answer in the form of FINAL ANSWER: [your answer], at the end of your response."
-        )
+        prompt = PROMPTS.render("solver_request", question=question_content)
+        if context:
+            prompt += "\n\n" + PROMPTS.render("repository_context", context=context)
+        return prompt
 
     async def _publish_solver_request(self, prompt: str, question: str) -> None:
         """Publish a solver request to all consultants."""
@@ -70,10 +112,43 @@ class CodeConsultantAggregator(RoutedAgent):
         """Handle a final solution response from a solver agent."""
         log_response_received(self._log_path, str(self.id), ctx.sender)
 
+        # Keep late arrivals as follow-ups, rather than dropping them
+        if self._finalizing:
+            await self._publish_follow_up(message, str(ctx.sender))
+            return
+
         self._add_response_to_buffer(message)
 
         if self._have_all_responses():
+            await self.finalize("quorum")
+        elif self._first_responses_agree():
+            await self.finalize("early agreement")
+
+    async def finalize(self, reason: str) -> None:
+        """
+        Publish the final answer from the responses received so far.
+
+        Called when the finalization policy is met, or by the runtime when the
+        deadline passes. Does nothing if the answer was already published.
+
+        Args:
+            reason: Why the answer is being finalized, for the logs
+        """
+        if self._finalizing:
+            return
+        self._finalizing = True
+
+        log_message(
+            self._log_path,
+            f"Aggregator {self.id} finalizing on {reason} with {len(self._buffer)} of {self._num_solvers} responses",
+        )
+        try:
+            if not self._buffer:
+                return
+
             aggregated_response = self._create_aggregated_response()
+            if self._synthesis_client is not None:
+                aggregated_response = await self._synthesize(aggregated_response)
 
             self._store_final_answer(aggregated_response)
 
@@ -82,6 +157,21 @@ class CodeConsultantAggregator(RoutedAgent):
             log_final_answer_published(self._log_path, str(self.id), len(self._buffer))
 
             self._buffer.clear()
+        finally:
+            # Only now, as the runtime stops once the answer is finalized
+            self.finalized.set()
+
+    async def _publish_follow_up(
+        self, message: FinalSolverResponse, source: str
+    ) -> None:
+        """Record and publish a response that arrived after finalization."""
+        answer, _ = split_artifacts(message.answer)
+        self.follow_up_answers.append(answer)
+        log_follow_up_answer(self._log_path, str(self.id), source)
+        await self.publish_message(
+            FollowUpAnswer(answer=answer, source=source),
+            topic_id=DefaultTopicId(),
+        )
 
     def _add_response_to_buffer(self, message: FinalSolverResponse) -> None:
         """Add a response to the buffer."""
@@ -89,16 +179,43 @@ class CodeConsultantAggregator(RoutedAgent):
 
     def _have_all_responses(self) -> bool:
         """Check if all expected responses have been received."""
-        have_all = len(self._buffer) == self._num_solvers
+        have_all = len(self._buffer) >= self._quorum
 
         if have_all:
-            log_all_responses_received(self._log_path, str(self.id), self._num_solvers)
+            log_all_responses_received(self._log_path, str(self.id), len(self._buffer))
 
         return have_all
 
+    def _first_responses_agree(self) -> bool:
+        """Check if the first early_agreement responses fall into one cluster."""
+        if not self._early_agreement or len(self._buffer) < self._early_agreement:
+            return False
+
+        answers = [
+            split_artifacts(resp.answer)[0]
+            for resp in self._buffer[: self._early_agreement]
+        ]
+        return len(self._agreement_clusterer.cluster(answers)) == 1
+
     def _create_aggregated_response(self) -> str:
         """Create an aggregated response from all solutions."""
-        all_solutions = [resp.answer for resp in self._buffer]
+        all_solutions = []
+        solution_artifacts = []
+        for resp in self._buffer:
+            # Keep the JSON artifacts out of the prose
+            answer, artifacts = split_artifacts(resp.answer)
+            all_solutions.append(answer)
+            solution_artifacts.append(artifacts or SolutionArtifacts.from_prose(answer))
+        self.artifacts = merge_artifacts(solution_artifacts)
+
+        # Merge near-duplicate solutions, rather than repeating them verbatim
+        if self._clusterer is not None:
+            clusters = self._clusterer.cluster(all_solutions)
+            log_solution_clusters(
+                self._log_path,
+                [[member.index for member in cluster.members] for cluster in clusters],
+            )
+            return self._clusterer.render(clusters, len(all_solutions))
 
         # Format the response with all solutions
         aggregated_response = "## All solutions from the solver agents:\n\n"
@@ -107,6 +224,47 @@ class CodeConsultantAggregator(RoutedAgent):
 
         return aggregated_response
 
+    async def _synthesize(self, aggregated_response: str) -> str:
+        """
+        Merge the aggregated solutions into one plan within the token budget.
+
+        Args:
+            aggregated_response: The solutions, concatenated or clustered
+
+        Returns:
+            The synthesized plan, or aggregated_response if synthesis failed or
+            the plan was cut off by the token limit
+        """
+        input_tokens = count_tokens(aggregated_response)
+        if input_tokens <= self._synthesis_token_budget:
+            # Already fits the budget, no need to pay for a model call
+            return aggregated_response
+
+        prompt = PROMPTS.render(
+            "synthesis",
+            max_words=int(self._synthesis_token_budget * 0.75),
+            solutions=aggregated_response,
+        )
+        try:
+            response = await self._synthesis_client.create(
+                messages=[UserMessage(content=prompt, source="user")],
+                extra_create_args={"max_tokens": self._synthesis_token_budget},
+            )
+        except Exception as e:
+            print(f"Error during synthesis: {type(e).__name__}: {str(e)}")
+            log_synthesis(self._log_path, input_tokens, None, f"error: {e}")
+            return aggregated_response
+
+        content = response.content if isinstance(response.content, str) else ""
+        if response.finish_reason != "stop" or not content.strip():
+            # A plan cut off mid-way could drop solutions, keep them all instead
+            reason = f"finish reason {response.finish_reason}"
+            log_synthesis(self._log_path, input_tokens, None, reason)
+            return aggregated_response
+
+        log_synthesis(self._log_path, input_tokens, count_tokens(content))
+        return content
+
     def _store_final_answer(self, aggregated_response: str) -> None:
         """Store the final answer for future reference."""
         self.final_answer = aggregated_response
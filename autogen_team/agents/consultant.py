@@ -1,4 +1,5 @@
 from autogen_core import (
+    CancellationToken,
     DefaultTopicId,
     FunctionCall,
     MessageContext,
@@ -9,16 +10,23 @@ from autogen_core import (
 from autogen_core.models import (
     AssistantMessage,
     ChatCompletionClient,
+    CreateResult,
     FunctionExecutionResult,
     FunctionExecutionResultMessage,
     LLMMessage,
+    RequestUsage,
     SystemMessage,
     UserMessage,
 )
-from autogen_core.tools import BaseTool
-from typing import Any, Dict, List, Union
+from autogen_core.tools import BaseTool, ToolSchema
+from typing import Any, Dict, List, Sequence, Set, Tuple, Union
+import itertools
 import json
+import time
 
+from ..data_models.blackboard import Blackboard
+from ..models.retry import ModelCallError
+from ..prompts import PROMPTS
 from ..data_models.messages import (
     FinalSolverResponse,
     IntermediateSolverResponse,
@@ -34,7 +42,26 @@ from ..utils.logging import (
     log_tool_execution,
     log_reflection_process,
     log_llm_response,
+    log_blackboard_digest,
+    log_reflection_budget_change,
+    log_reflection_steps_saved,
+    log_loop_detected,
+    log_stream_timing,
 )
+from ..utils.loop_detection import LoopDetector
+from ..utils.reflection_budget import ReflectionBudget
+from ..utils.tokens import count_tokens
+from ..tool_executor import ToolExecutor
+from ..tool_protocol import (
+    INVALID_TOOL_CALL,
+    TOOL_PROTOCOLS,
+    format_tool_calls,
+    format_tool_results,
+    parse_tool_call_response,
+    with_tool_instructions,
+)
+from ..tool_selection import ToolSchemaSelector
+from ..tools import extract_tool_facts
 
 
 @default_subscription
@@ -49,8 +76,22 @@ class CodeConsultant(RoutedAgent):
         max_reflection_steps: int = 3,  # Control reflection depth
         log_base_path: str = "/root/inspect_evals/src/inspect_evals/swe_bench",
         experiment_name: str = "test_experiment",
+        blackboard: Blackboard | None = None,
+        reflection_budget: ReflectionBudget | None = None,
+        loop_detector: LoopDetector | None = None,
+        tool_executor: ToolExecutor | None = None,
+        dynamic_tools: bool = False,
+        prune_tools_when_remaining: int | None = None,
+        stream: bool = False,
+        final_answer_word_limit: int = 500,
+        tool_protocol: str = "native",
+        structured_artifacts: bool = False,
     ) -> None:
         super().__init__("A debator.")
+        if tool_protocol not in TOOL_PROTOCOLS:
+            raise ValueError(
+                f"Unknown tool_protocol {tool_protocol!r}, expected one of {sorted(TOOL_PROTOCOLS)}"
+            )
         self._topic_type = topic_type
         self._model_client = model_client
         self._num_neighbors = num_neighbors
@@ -60,40 +101,46 @@ class CodeConsultant(RoutedAgent):
             str(self.id), log_base_path, experiment_name
         )
         self._max_reflection_steps = max_reflection_steps
+        self._blackboard = blackboard
+        self._budget = reflection_budget or ReflectionBudget(max_reflection_steps)
+        self._loop_detector = loop_detector
+        self._tool_executor = tool_executor
+        self._stream = stream
+        self._final_answer_word_limit = final_answer_word_limit
+        self._tool_protocol = tool_protocol
+        # Set once the team answer is final, so no more model calls are made
+        self._stop_requested = False
+        # Usage of streams cut off before the provider reported it, estimated locally
+        self.estimated_usage = RequestUsage(prompt_tokens=0, completion_tokens=0)
+        # Token of the stream in flight, cancelled with the handler's token
+        self._stream_token: CancellationToken | None = None
+        self._linked_handler_token: CancellationToken | None = None
+        # Progress tracking for the reflection budget
+        self._seen_fact_keys: Set[Tuple[str, str, str]] = set()
+        self._seen_results: Set[int] = set()
+        self._new_findings = 0
+        self._last_answer: str | None = None
+        min_steps = (
+            self._budget.min_steps
+            if self._budget.adaptive
+            else int(self._max_reflection_steps * 0.6)
+        )
         # Add reflection state tracking
         self._is_reflecting = False
         self._message_queue = []
-        self._system_messages = [
-            SystemMessage(
-                content=(
-                    f"You are a helpful assistant with expertise in coding. \
-                    Your task is to provide another language model with guidance on how to solve a GitHub issue by providing \
-                    a clear and detailed solution. \
-                    You should have a codebase already which you can explore. \
-                    You don't need to download it, just explore it. \
-                    You have a number of tools at your disposal to help you create this guidance. Use these to explore the codebase. \
-                    DO NOT RUN ANYTHING WHICH CHANGES THE CODEBASE, ONLY USE THIS TO EXPLORE THE CODEBASE. \
-                    These tools are: \
-                    - run_bash_tool: to run commands in the terminal (output truncated to 5000 characters) \
-                    - open_file: to open a file \
-                    - search_dir: to search for a file in a directory \
-                    - search_file: to search for a search term in a file \
-                    - find_file: to find a file in the current directory \
-                    - scroll_down: to scroll down in the terminal \
-                    - scroll_up: to scroll up in the terminal \
-                    IMPORTANT REQUIREMENTS: \
-                    You MUST use at least {int(self._max_reflection_steps * 0.6)} reflection steps before providing a final answer \
-                    You will be given messages from other agents at the end of each round. \
-                    You should try to be as critical as possible of the messages you receive, and use your reflection loop to explore alternative solutions. \
-                    Try to reduce redundant exploration amongst all agents, by summarising what steps you've already taken, in your final answer. \
-                    Limit your final answer to 500 words, and explicitly mark it with \
-                    FINAL ANSWER: at the beginning."
-                )
-            )
-        ]
+        system_prompt = PROMPTS.render("consultant_system", min_steps=min_steps)
+        if structured_artifacts:
+            system_prompt += "\n" + PROMPTS.render("artifacts_request")
+        self._system_messages = [SystemMessage(content=system_prompt)]
         self._round = 0
         self._max_round = max_round
         self._tools = tools or []
+        self._tool_selector = ToolSchemaSelector(
+            self._tools,
+            dynamic=dynamic_tools,
+            prune_when_remaining=prune_tools_when_remaining,
+        )
+        self._used_tools: Set[str] = set()
 
         # Log initialization information
         log_initialization(
@@ -110,31 +157,44 @@ class CodeConsultant(RoutedAgent):
 
     async def _execute_tool_call(
         self, tool_call: Union[str, FunctionCall], ctx: MessageContext
-    ) -> FunctionExecutionResult:
-        """Execute a single tool call and return the result"""
+    ) -> Tuple[FunctionExecutionResult, str]:
+        """
+        Execute a single tool call.
+
+        Returns:
+            The result for the model, and the tool's plain text output, which
+            tool results are parsed and fingerprinted from
+        """
         if isinstance(tool_call, str):
-            return FunctionExecutionResult(
-                call_id="",
-                content=f"Invalid tool call format: {tool_call}",
+            tool_call = FunctionCall(id="", name=INVALID_TOOL_CALL, arguments=tool_call)
+        if tool_call.name == INVALID_TOOL_CALL:
+            result = FunctionExecutionResult(
+                call_id=tool_call.id,
+                content=f"Invalid tool call format: {tool_call.arguments}",
                 is_error=True,
                 name="unknown",
             )
+            return result, result.content
 
         matching_tool = next(
             (tool for tool in self._tools if tool.name == tool_call.name),
             None,
         )
+        self._used_tools.add(tool_call.name)
 
         if not matching_tool:
             error_msg = f"Tool {tool_call.name} not found"
             log_tool_execution(
                 self._log_path, tool_call.name, {}, error=ValueError(error_msg)
             )
-            return FunctionExecutionResult(
-                call_id=tool_call.id,
-                content=error_msg,
-                is_error=True,
-                name=tool_call.name,
+            return (
+                FunctionExecutionResult(
+                    call_id=tool_call.id,
+                    content=error_msg,
+                    is_error=True,
+                    name=tool_call.name,
+                ),
+                error_msg,
             )
 
         try:
@@ -149,27 +209,119 @@ class CodeConsultant(RoutedAgent):
             )
             # Get the result as string using the tool's return_value_as_string method
             result_str = matching_tool.return_value_as_string(result)
+            # For the tools' ToolResponse, that is JSON, so parse the plain output
+            output = getattr(result, "output", result_str)
 
             # Log successful tool execution
             log_tool_execution(self._log_path, tool_call.name, args, result=result_str)
 
-            return FunctionExecutionResult(
-                call_id=tool_call.id,
-                content=result_str,
-                is_error=False,
-                name=tool_call.name,
+            # Track what the tool discovered, and share it with the rest of the team
+            self._record_tool_findings(matching_tool, args, output)
+
+            return (
+                FunctionExecutionResult(
+                    call_id=tool_call.id,
+                    content=result_str,
+                    is_error=False,
+                    name=tool_call.name,
+                ),
+                output,
             )
         except Exception as e:
             # Log tool execution error
             print(f"Error executing tool: {str(e)}")
             log_tool_execution(self._log_path, tool_call.name, args, error=e)
 
-            return FunctionExecutionResult(
-                call_id=tool_call.id,
-                content=f"Error executing tool: {str(e)}",
-                is_error=True,
-                name=tool_call.name,
+            error_msg = f"Error executing tool: {str(e)}"
+            return (
+                FunctionExecutionResult(
+                    call_id=tool_call.id,
+                    content=error_msg,
+                    is_error=True,
+                    name=tool_call.name,
+                ),
+                error_msg,
+            )
+
+    async def _run_tool_calls(
+        self, tool_calls: List[FunctionCall], ctx: MessageContext
+    ) -> List[FunctionExecutionResult]:
+        """Execute the tool calls from one model response, checking for loops."""
+        tool_results: List[FunctionExecutionResult | None] = []
+        calls_to_execute: List[Tuple[int, Union[str, FunctionCall]]] = []
+        for index, tool_call in enumerate(tool_calls):
+            # Answer repeated read-only calls from the cache instead of re-running them
+            cached = (
+                self._loop_detector.cached_result(tool_call.name, tool_call.arguments)
+                if self._loop_detector and isinstance(tool_call, FunctionCall)
+                else None
             )
+            if cached is not None:
+                log_loop_detected(self._log_path, tool_call.name, "cached repeat")
+                tool_results.append(
+                    FunctionExecutionResult(
+                        call_id=tool_call.id,
+                        content=cached,
+                        is_error=False,
+                        name=tool_call.name,
+                    )
+                )
+            else:
+                tool_results.append(None)
+                calls_to_execute.append((index, tool_call))
+
+        # Run the remaining calls, concurrently where the tool executor allows it
+        async def execute(
+            tool_call: Union[str, FunctionCall],
+        ) -> Tuple[FunctionExecutionResult, str]:
+            return await self._execute_tool_call(tool_call, ctx)
+
+        calls = [tool_call for _, tool_call in calls_to_execute]
+        if self._tool_executor is not None:
+            executed = await self._tool_executor.run_all(calls, execute)
+        else:
+            executed = [await execute(tool_call) for tool_call in calls]
+
+        # Check results for loops in call order
+        for (index, tool_call), (tool_result, output) in zip(
+            calls_to_execute, executed
+        ):
+            if (
+                self._loop_detector
+                and isinstance(tool_call, FunctionCall)
+                and not tool_result.is_error
+            ):
+                hint = self._loop_detector.record(
+                    tool_call.name, tool_call.arguments, tool_result.content, output
+                )
+                if hint:
+                    log_loop_detected(self._log_path, tool_call.name, hint)
+                    tool_result = FunctionExecutionResult(
+                        call_id=tool_result.call_id,
+                        content=f"{tool_result.content}\n\n{hint}",
+                        is_error=False,
+                        name=tool_result.name,
+                    )
+            tool_results[index] = tool_result
+
+        return [tool_result for tool_result in tool_results if tool_result is not None]
+
+    def _record_tool_findings(
+        self, tool: BaseTool[Any, Any], args: Dict[str, Any], result: str
+    ) -> None:
+        """Count new facts and results for the reflection budget, and record facts on the blackboard."""
+        facts = extract_tool_facts(tool, args, result)
+        new_fact_keys = {fact.key() for fact in facts} - self._seen_fact_keys
+        self._seen_fact_keys.update(new_fact_keys)
+        self._new_findings += len(new_fact_keys)
+
+        result_hash = hash(result)
+        if result_hash not in self._seen_results:
+            self._seen_results.add(result_hash)
+            self._new_findings += 1
+
+        if self._blackboard is not None:
+            self._blackboard.record(facts, source=str(self.id))
 
     @message_handler
     async def handle_solver_request(
@@ -190,6 +342,7 @@ class CodeConsultant(RoutedAgent):
 
         # Extract final answer from reflection result
         final_answer = self._extract_final_answer(reflection_result)
+        self._last_answer = final_answer
 
         # Update history
         self._update_history_with_reflection(message.content, reflection_result)
@@ -228,21 +381,39 @@ class CodeConsultant(RoutedAgent):
             # Log the start of reflection
             self._log_reflection_start(message_content, messages)
 
-            # Main reflection loop
+            # Main reflection loop, bounded by the reflection budget
             final_answer = None
             retry_count = 0
-            for step in range(self._max_reflection_steps):
+            steps_used = 0
+            self._budget.start(self._last_answer)
+            if self._loop_detector:
+                self._loop_detector.start()
+            for step in itertools.count():
+                if not self._budget.allows(step):
+                    break
+                if self._stop_requested:
+                    log_message(
+                        self._log_path,
+                        f"Agent {self.id} was asked to stop, ending reflection",
+                    )
+                    break
+                steps_used = step + 1
                 try:
+                    # Inject facts other consultants discovered since the last step
+                    self._inject_blackboard_digest(messages)
+
                     # Log current reflection step
                     log_reflection_process(
-                        self._log_path, step, self._max_reflection_steps, messages
+                        self._log_path, step, self._budget.limit, messages
                     )
 
                     # Call the model to get a response
-                    response = await self._model_client.create(
-                        messages=messages,
-                        cancellation_token=ctx.cancellation_token,
-                        tools=self._tools,
+                    response = await self._create_step_response(
+                        messages,
+                        self._tool_selector.for_exploration(
+                            self._used_tools, self._budget.limit - step - 1
+                        ),
+                        ctx,
                     )
 
                     # Log model's response
@@ -250,23 +421,29 @@ class CodeConsultant(RoutedAgent):
 
                     # Handle model response based on type
                     if self._is_tool_call_response(response):
-                        # Add the assistant's response containing the tool calls
-                        messages.append(
-                            AssistantMessage(
-                                content=response.content, source="assistant"
-                            )
-                        )
-
                         # Process each tool call
-                        tool_results = []
-                        for tool_call in response.content:
-                            tool_result = await self._execute_tool_call(tool_call, ctx)
-                            tool_results.append(tool_result)
+                        self._new_findings = 0
+                        tool_results = await self._run_tool_calls(response.content, ctx)
 
-                        # Add all tool results in a single message
-                        messages.append(
-                            FunctionExecutionResultMessage(content=tool_results)
+                        # Add the tool calls and all their results to the conversation
+                        messages.extend(
+                            self._tool_exchange_messages(response.content, tool_results)
                         )
+
+                        budget_change = self._budget.observe_tool_step(
+                            step, self._new_findings
+                        )
+                        if budget_change:
+                            log_reflection_budget_change(
+                                self._log_path, step, budget_change
+                            )
+
+                        if self._loop_detector and self._loop_detector.should_stop:
+                            log_message(
+                                self._log_path,
+                                f"Agent {self.id} is looping ({self._loop_detector.loop_hits} repeats), ending reflection",
+                            )
+                            break
                     else:
                         # Check if response contains final answer
                         content = str(response.content)
@@ -282,6 +459,21 @@ class CodeConsultant(RoutedAgent):
                             )
                             break
 
+                        budget_change = self._budget.observe_answer(step, content)
+                        if budget_change:
+                            log_reflection_budget_change(
+                                self._log_path, step, budget_change
+                            )
+
+                except ModelCallError as e:
+                    # The retry layer has already retried and failed over, so
+                    # re-sending the conversation would only repeat the failure
+                    print(f"Model call failed during reflection: {str(e)}")
+                    log_message(
+                        self._log_path,
+                        f"Model call failed, ending reflection: {str(e)}",
+                    )
+                    break
                 except Exception as e:
                     print(f"Error during reflection: {type(e).__name__}: {str(e)}")
                     self._handle_reflection_error(e, messages)
@@ -294,8 +486,13 @@ class CodeConsultant(RoutedAgent):
                         )
                         break
 
+            steps_saved = self._budget.finish(steps_used)
+            log_reflection_steps_saved(self._log_path, steps_used, steps_saved)
+
             # If no final answer was found, ask explicitly for one
-            if final_answer is None:
+            if final_answer is None and self._stop_requested:
+                final_answer = "FINAL ANSWER: Stopped before reaching an answer."
+            elif final_answer is None:
                 final_answer = await self._get_final_answer(messages, ctx)
 
             log_message(
@@ -309,6 +506,144 @@ class CodeConsultant(RoutedAgent):
             self._is_reflecting = False
             await self._process_queued_messages()
 
+    async def _create_step_response(
+        self,
+        messages: List[LLMMessage],
+        tools: Sequence[ToolSchema],
+        ctx: MessageContext,
+    ) -> CreateResult:
+        """Call the model for one reflection step, using the configured tool protocol."""
+        if self._tool_protocol == "text":
+            # Describe the tools in the prompt, and parse calls from the reply
+            response = await self._create_model_response(
+                with_tool_instructions(messages, tools), [], ctx
+            )
+            return parse_tool_call_response(response)
+        return await self._create_model_response(messages, tools, ctx)
+
+    async def _create_model_response(
+        self,
+        messages: List[LLMMessage],
+        tools: Sequence[ToolSchema],
+        ctx: MessageContext,
+    ) -> CreateResult:
+        """Call the model, streaming if enabled."""
+        if not self._stream:
+            return await self._model_client.create(
+                messages=messages,
+                cancellation_token=ctx.cancellation_token,
+                tools=tools,
+            )
+
+        # Own token, so the stream can be cancelled without cancelling the agent.
+        # Linked once per handler call, not once per step.
+        stream_token = CancellationToken()
+        self._stream_token = stream_token
+        if self._linked_handler_token is not ctx.cancellation_token:
+            self._linked_handler_token = ctx.cancellation_token
+            ctx.cancellation_token.add_callback(self._cancel_stream)
+        start_time = time.perf_counter()
+        time_to_first_token = None
+        text = ""
+        result = None
+
+        stream = self._model_client.create_stream(
+            messages=messages,
+            tools=tools,
+            # Without this, providers don't report the usage of streams
+            extra_create_args={"stream_options": {"include_usage": True}},
+            cancellation_token=stream_token,
+        )
+        try:
+            async for chunk in stream:
+                if isinstance(chunk, CreateResult):
+                    result = chunk
+                    break
+                if time_to_first_token is None:
+                    time_to_first_token = time.perf_counter() - start_time
+                text += chunk
+                if self._final_answer_word_count(text) >= self._final_answer_word_limit:
+                    break
+        finally:
+            self._stream_token = None
+            stream_token.cancel()
+            await stream.aclose()
+
+        log_stream_timing(
+            self._log_path,
+            time_to_first_token,
+            time.perf_counter() - start_time,
+            cut_off=result is None,
+        )
+        if result is not None:
+            if result.usage.prompt_tokens or result.usage.completion_tokens:
+                return result
+            # The provider ignored include_usage, so estimate the usage instead
+            return result.model_copy(
+                update={"usage": self._estimate_usage(messages, str(result.content))}
+            )
+
+        # The final answer reached the word limit, so the stream was cut off before
+        # the provider reported usage. Estimate it so token counts stay comparable.
+        return CreateResult(
+            finish_reason="stop",
+            content=text,
+            usage=self._estimate_usage(messages, text),
+            cached=False,
+        )
+
+    def _cancel_stream(self) -> None:
+        if self._stream_token is not None:
+            self._stream_token.cancel()
+
+    def _estimate_usage(
+        self, messages: List[LLMMessage], completion: str
+    ) -> RequestUsage:
+        """Count the usage of a call locally, adding it to estimated_usage."""
+        model = self._model_client.model_info.get("family", "unknown")
+        prompt_tokens = sum(
+            count_tokens(str(message.content), model) for message in messages
+        )
+        completion_tokens = count_tokens(completion, model)
+        self.estimated_usage = RequestUsage(
+            prompt_tokens=self.estimated_usage.prompt_tokens + prompt_tokens,
+            completion_tokens=self.estimated_usage.completion_tokens
+            + completion_tokens,
+        )
+        return RequestUsage(
+            prompt_tokens=prompt_tokens, completion_tokens=completion_tokens
+        )
+
+    def _tool_exchange_messages(
+        self,
+        tool_calls: List[Union[str, FunctionCall]],
+        tool_results: List[FunctionExecutionResult],
+    ) -> List[LLMMessage]:
+        """Build the messages recording a round of tool calls and their results."""
+        if self._tool_protocol == "text":
+            # Keep the history in plain text, which needs no tool definitions
+            return [
+                AssistantMessage(
+                    content=format_tool_calls(tool_calls), source="assistant"
+                ),
+                UserMessage(content=format_tool_results(tool_results), source="user"),
+            ]
+        return [
+            AssistantMessage(content=tool_calls, source="assistant"),
+            FunctionExecutionResultMessage(content=tool_results),
+        ]
+
+    def _final_answer_word_count(self, text: str) -> int:
+        """Count the words written after the FINAL ANSWER: marker, if present."""
+        marker = text.find("FINAL ANSWER:")
+        if marker == -1:
+            return 0
+        return len(text[marker + len("FINAL ANSWER:") :].split())
+
+    def request_stop(self) -> None:
+        """Stop reflecting at the next step, once the team answer is final."""
+        self._stop_requested = True
+
     async def _process_queued_messages(self) -> None:
         """Process any messages that were queued during reflection."""
         if not self._message_queue:
@@ -343,12 +678,29 @@ class CodeConsultant(RoutedAgent):
         # Add the current problem last
         messages.append(
             UserMessage(
-                content=f"GitHub issue to solve: {message_content}",
+                content=PROMPTS.render("issue", issue=message_content),
                 source="user",
             )
         )
         return messages
 
+    def _inject_blackboard_digest(self, messages: List[LLMMessage]) -> None:
+        """Append a digest of new facts from other consultants, if there are any."""
+        if self._blackboard is None:
+            return
+
+        digest = self._blackboard.digest(str(self.id))
+        if not digest:
+            return
+
+        log_blackboard_digest(self._log_path, digest)
+        messages.append(
+            UserMessage(
+                content=PROMPTS.render("blackboard_digest", digest=digest),
+                source="user",
+            )
+        )
+
     def _log_reflection_start(
         self, message_content: str, messages: List[LLMMessage]
     ) -> None:
@@ -423,7 +775,7 @@ class CodeConsultant(RoutedAgent):
         # Add request for final answer
         messages.append(
             UserMessage(
-                content="Please provide your FINAL ANSWER now, starting with 'FINAL ANSWER:'",
+                content=PROMPTS.render("final_answer_request"),
                 source="user",
             )
         )
@@ -432,7 +784,11 @@ class CodeConsultant(RoutedAgent):
             response = await self._model_client.create(
                 messages=messages,
                 cancellation_token=ctx.cancellation_token,
-                tools=self._tools,
+                tools=(
+                    self._tool_selector.for_final_answer(messages)
+                    if self._tool_protocol == "native"
+                    else []
+                ),
             )
 
             log_llm_response(self._log_path, response)
@@ -546,37 +902,32 @@ class CodeConsultant(RoutedAgent):
 
     def _create_consolidated_prompt(self, message: IntermediateSolverResponse) -> str:
         """Create a consolidated prompt from all responses for a round."""
-        prompt = f"ROUND {self._round + 1} - New solutions from other agents:\n"
-
-        for resp in self._buffer[message.round]:
-            prompt += f"One agent solution: {resp.content}\n"
-
-        prompt += (
-            "Using the solutions from other agents as additional information, "
-            "can you provide your solution to the GitHub issue? "
-            f"The original coding problem is {message.question}. "
+        solutions = "".join(
+            f"One agent solution: {resp.content}\n"
+            for resp in self._buffer[message.round]
         )
 
         # Add the agent's conversation history
+        history = ""
         if self._history and len(self._history) >= 2:
-            prompt += "\nYour conversation history:\n"
+            history = "Your conversation history:\n"
             # Add a summarized version of the history
             for i, msg in enumerate(self._history):
                 if i == 0:
-                    prompt += f"Original problem: {msg.content}...\n"
+                    history += f"Original problem: {msg.content}...\n"
                 elif isinstance(msg, AssistantMessage):
-                    prompt += f"Your previous analysis: {msg.content}...\n"
+                    history += f"Your previous analysis: {msg.content}...\n"
                 else:
-                    prompt += f"Previous input: {msg.content}...\n"
-
-        prompt += (
-            "\nUsing all available information, revise your solution. "
-            "Your final answer should be an explanation of the solution, "
-            "in the form of FINAL ANSWER: [your answer], at the end of your response."
+                    history += f"Previous input: {msg.content}...\n"
+
+        return PROMPTS.render(
+            "consolidation",
+            round=self._round + 1,
+            solutions=solutions,
+            question=message.question,
+            history=history,
         )
 
-        return prompt
-
     async def _send_consolidated_prompt_to_self(
         self, question: str, prompt: str
     ) -> None:
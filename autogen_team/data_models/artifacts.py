@@ -0,0 +1,189 @@
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..solution_clustering import extract_references
+
+# Marker consultants put before the JSON block at the end of their final answer
+ARTIFACTS_MARKER = "ARTIFACTS:"
+
+_ARTIFACTS_BLOCK = re.compile(
+    re.escape(ARTIFACTS_MARKER) + r"\s*(?:```(?:json)?\s*)?(\{.*\})\s*(?:```)?\s*$",
+    re.DOTALL,
+)
+
+
+def _entries(data: Dict[str, Any], key: str) -> List[Any]:
+    value = data.get(key)
+    return value if isinstance(value, list) else []
+
+
+def _scalar(value: Any) -> Optional[str]:
+    """A string or number as a string, None for anything else."""
+    if isinstance(value, (str, int, float)) and not isinstance(value, bool):
+        return str(value)
+    return None
+
+
+@dataclass
+class CodeLocation:
+    path: str
+    start_line: Optional[int] = None
+    end_line: Optional[int] = None
+    symbol: Optional[str] = None
+
+
+@dataclass
+class SolutionArtifacts:
+    """The machine-readable part of one consultant's solution."""
+
+    locations: List[CodeLocation] = field(default_factory=list)
+    patches: List[Dict[str, str]] = field(default_factory=list)
+    tests: List[str] = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SolutionArtifacts":
+        """Build artifacts from parsed JSON, skipping malformed entries."""
+        locations = []
+        for location in _entries(data, "locations"):
+            if not isinstance(location, dict):
+                continue
+            path = _scalar(location.get("path"))
+            if not path:
+                continue
+            start_line = location.get("start_line")
+            end_line = location.get("end_line", start_line)
+            try:
+                locations.append(
+                    CodeLocation(
+                        path=path.removeprefix("./"),
+                        start_line=int(start_line) if start_line is not None else None,
+                        end_line=int(end_line) if end_line is not None else None,
+                        symbol=_scalar(location.get("symbol")) or None,
+                    )
+                )
+            except (TypeError, ValueError):
+                continue
+        patches = [
+            {"path": _scalar(patch.get("path")) or "", "diff": patch["diff"]}
+            for patch in _entries(data, "patches")
+            if isinstance(patch, dict)
+            and isinstance(patch.get("diff"), str)
+            and patch["diff"].strip()
+        ]
+        tests = [
+            test for test in (_scalar(test) for test in _entries(data, "tests")) if test
+        ]
+        return cls(locations, patches, tests)
+
+    @classmethod
+    def from_prose(cls, text: str) -> "SolutionArtifacts":
+        """Fall back to the files and symbols mentioned in a solution's text."""
+        references = extract_references(text)
+        return cls(locations=[CodeLocation(path) for path in sorted(references.files)])
+
+
+def split_artifacts(answer: str) -> Tuple[str, Optional[SolutionArtifacts]]:
+    """
+    Split the artifacts block off the end of a final answer.
+
+    Args:
+        answer: A consultant's final answer
+
+    Returns:
+        The answer without the artifacts block, and the parsed artifacts, or
+        None if the answer has no valid artifacts block
+    """
+    match = _ARTIFACTS_BLOCK.search(answer)
+    if match is None:
+        return answer, None
+    try:
+        data = json.loads(match.group(1))
+    except json.JSONDecodeError:
+        return answer, None
+    if not isinstance(data, dict):
+        return answer, None
+    try:
+        artifacts = SolutionArtifacts.from_dict(data)
+    except (TypeError, ValueError):
+        return answer, None
+    return answer[: match.start()].rstrip(), artifacts
+
+
+def _merge_line_ranges(ranges: List[Tuple[int, int]]) -> List[List[int]]:
+    merged: List[List[int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def merge_artifacts(
+    artifacts: List[SolutionArtifacts], max_patches: int = 3
+) -> Dict[str, Any]:
+    """
+    Merge the artifacts of all solutions into one compact summary.
+
+    Entries are ordered by how many solutions mention them, so the locations
+    most consultants agree on come first.
+
+    Args:
+        artifacts: Artifacts from each solution
+        max_patches: Maximum number of suggested patches to keep
+
+    Returns:
+        JSON-serialisable summary with "files", "patches" and "tests"
+    """
+    files: Dict[str, Dict[str, Any]] = {}
+    patches: Dict[Tuple[str, str], int] = {}
+    tests: Dict[str, int] = {}
+    for solution in artifacts:
+        for path in {location.path for location in solution.locations}:
+            entry = files.setdefault(
+                path, {"path": path, "votes": 0, "lines": [], "symbols": set()}
+            )
+            entry["votes"] += 1
+        for location in solution.locations:
+            entry = files[location.path]
+            if location.start_line is not None:
+                end_line = location.end_line or location.start_line
+                entry["lines"].append((location.start_line, end_line))
+            if location.symbol:
+                entry["symbols"].add(location.symbol)
+        for patch in solution.patches:
+            key = (patch["path"], patch["diff"].strip())
+            patches[key] = patches.get(key, 0) + 1
+        for test in set(solution.tests):
+            tests[test] = tests.get(test, 0) + 1
+
+    def by_votes(entry: Dict[str, Any]) -> Tuple[int, str]:
+        return -entry["votes"], str(entry.get("path", entry.get("id", "")))
+
+    return {
+        "files": sorted(
+            (
+                {
+                    "path": entry["path"],
+                    "votes": entry["votes"],
+                    "lines": _merge_line_ranges(entry["lines"]),
+                    "symbols": sorted(entry["symbols"]),
+                }
+                for entry in files.values()
+            ),
+            key=by_votes,
+        ),
+        "patches": sorted(
+            (
+                {"path": path, "diff": diff, "votes": votes}
+                for (path, diff), votes in patches.items()
+            ),
+            key=by_votes,
+        )[:max_patches],
+        "tests": sorted(
+            ({"id": test, "votes": votes} for test, votes in tests.items()),
+            key=by_votes,
+        ),
+    }
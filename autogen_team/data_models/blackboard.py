@@ -0,0 +1,103 @@
+from dataclasses import dataclass
+from typing import Dict, List, Set, Tuple
+
+
+@dataclass(frozen=True)
+class Fact:
+    """A structured fact discovered by a consultant tool call.
+
+    kind is one of:
+        - "viewed": subject is a file path, detail is a line range ("10-110")
+        - "symbol": subject is a class/function name, detail is "path:line"
+        - "search": subject is a search term, detail summarises the matches
+        - "found": subject is a file name, detail lists the matching paths
+    """
+
+    kind: str
+    subject: str
+    detail: str
+
+    def key(self) -> Tuple[str, str, str]:
+        return (self.kind, self.subject, self.detail)
+
+
+class Blackboard:
+    """
+    Per-team store of facts discovered by the consultants during a run.
+
+    Tool adapters extract facts from their results, and consultants record them
+    here. Each consultant reads a digest of the facts recorded by the other
+    consultants since its last read, so findings are shared mid-round rather than
+    only through the round-end IntermediateSolverResponse messages.
+    """
+
+    def __init__(self, max_digest_facts: int = 20) -> None:
+        self._max_digest_facts = max_digest_facts
+        self._entries: List[Tuple[str, Fact]] = []
+        self._keys: Set[Tuple[str, str, str]] = set()
+        self._cursors: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def record(self, facts: List[Fact], source: str) -> int:
+        """
+        Record facts discovered by a consultant, ignoring ones already known.
+
+        Args:
+            facts: Facts extracted from a tool result
+            source: ID of the consultant that discovered the facts
+
+        Returns:
+            Number of facts that were new to the blackboard
+        """
+        new_count = 0
+        for fact in facts:
+            if fact.key() in self._keys:
+                continue
+            self._keys.add(fact.key())
+            self._entries.append((source, fact))
+            new_count += 1
+        return new_count
+
+    def digest(self, reader: str) -> str:
+        """
+        Build a compact digest of the facts other consultants recorded since the
+        reader's last digest, and advance the reader's cursor.
+
+        Args:
+            reader: ID of the consultant reading the blackboard
+
+        Returns:
+            The digest text, or an empty string if there is nothing new
+        """
+        start = self._cursors.get(reader, 0)
+        self._cursors[reader] = len(self._entries)
+        facts = [fact for source, fact in self._entries[start:] if source != reader]
+        if not facts:
+            return ""
+
+        # Keep the most recent facts if there are too many to show
+        omitted = max(0, len(facts) - self._max_digest_facts)
+        facts = facts[omitted:]
+
+        viewed: Dict[str, List[str]] = {}
+        lines: List[str] = []
+        for fact in facts:
+            if fact.kind == "viewed":
+                viewed.setdefault(fact.subject, []).append(fact.detail)
+            elif fact.kind == "symbol":
+                lines.append(f"- {fact.subject} defined at {fact.detail}")
+            elif fact.kind == "search":
+                lines.append(f'- search "{fact.subject}" matched {fact.detail}')
+            elif fact.kind == "found":
+                lines.append(f'- file "{fact.subject}" found at {fact.detail}')
+
+        viewed_lines = [
+            f"- viewed {path} lines {', '.join(ranges)}"
+            for path, ranges in viewed.items()
+        ]
+        digest = "\n".join(viewed_lines + lines)
+        if omitted:
+            digest += f"\n({omitted} older facts omitted)"
+        return digest
@@ -4,6 +4,8 @@ from dataclasses import dataclass
 @dataclass
 class Question:
     content: str
+    # Extra context for the first round, such as a repository map
+    context: str = ""
 
 
 @dataclass
@@ -28,3 +30,11 @@ class IntermediateSolverResponse:
 @dataclass
 class FinalSolverResponse:
     answer: str
+
+
+@dataclass
+class FollowUpAnswer:
+    """A final solver response that arrived after the team answer was published."""
+
+    answer: str
+    source: str
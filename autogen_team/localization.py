@@ -0,0 +1,89 @@
+import json
+from pathlib import Path
+from typing import Any, Dict, List
+
+from inspect_ai.util import sandbox
+
+from .utils.tokens import count_tokens
+
+LOCALIZE_SCRIPT_LOCAL = Path(__file__).parent / "sandbox_scripts" / "localize.py"
+LOCALIZE_SCRIPT_SANDBOX = Path("/tmp/_localize.py")
+ISSUE_LOCATION_SANDBOX = Path("/tmp/_issue.txt")
+
+
+async def localize_issue(
+    issue: str,
+    root: str = ".",
+    top_k: int = 5,
+    context_lines: int = 8,
+    max_regions: int = 2,
+) -> List[Dict[str, Any]]:
+    """
+    Find the code regions most likely related to an issue, inside the sandbox.
+
+    Args:
+        issue: The issue text
+        root: Repository root in the sandbox
+        top_k: Number of files to return
+        context_lines: Lines of context either side of each matching line
+        max_regions: Maximum number of regions per file
+
+    Returns:
+        Files in rank order, each with "path", "score" and "regions", where each
+        region has "start", "end" and line-numbered "text"
+    """
+    await sandbox().write_file(
+        LOCALIZE_SCRIPT_SANDBOX.as_posix(), LOCALIZE_SCRIPT_LOCAL.read_text()
+    )
+    await sandbox().write_file(ISSUE_LOCATION_SANDBOX.as_posix(), issue)
+    result = await sandbox().exec(
+        [
+            "python3",
+            LOCALIZE_SCRIPT_SANDBOX.as_posix(),
+            ISSUE_LOCATION_SANDBOX.as_posix(),
+            root,
+            str(top_k),
+            str(context_lines),
+            str(max_regions),
+        ]
+    )
+    if not result.success:
+        raise RuntimeError(f"Failed to localize issue: {result.stderr}")
+    return json.loads(result.stdout)["files"]
+
+
+def render_localization(
+    files: List[Dict[str, Any]], token_budget: int = 2000, model: str = "gpt-4o"
+) -> str:
+    """
+    Render localized code regions for the prompt, within a token budget.
+
+    Regions are added in rank order, and a region that doesn't fit is skipped
+    rather than cut, so every region shown is complete.
+
+    Args:
+        files: Files returned by localize_issue
+        token_budget: Maximum number of tokens for the rendered regions
+        model: Model to count tokens for
+
+    Returns:
+        The rendered regions, or an empty string if there are none
+    """
+    header = "Code regions most likely related to the issue (line numbers shown):"
+    sections = []
+    tokens = count_tokens(header, model)
+    for file in files:
+        for region in file["regions"]:
+            section = (
+                f"--- {file['path']} lines {region['start']}-{region['end']}\n"
+                f"{region['text']}"
+            )
+            section_tokens = count_tokens(section, model) + 1
+            if tokens + section_tokens > token_budget:
+                continue
+            sections.append(section)
+            tokens += section_tokens
+
+    if not sections:
+        return ""
+    return "\n".join([header, *sections])
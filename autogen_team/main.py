@@ -1,13 +1,26 @@
+import json
+
+from inspect_ai.solver import TaskState
 from inspect_ai.tool import Tool, tool
 from inspect_ai.util import subtask
 from inspect_ai.util import store
 from typing import Any, Callable, Coroutine, Dict
 
+from .models.batch import aclose_batch_executors
+from .models.client_registry import HTTP_CLIENTS
 from .runtime import setup_debate_team
 
 
+# Store key for the structured artifacts of the latest consultation
+TEAM_ARTIFACTS_KEY = "TEAM_ARTIFACTS"
+
+# Consultations running in this process, which share the HTTP clients and
+# batch executors
+_active_consultations = 0
+
+
 @subtask
-async def consult_team_subtask(question: str) -> str:
+async def consult_team_subtask(question: str) -> Dict[str, Any]:
     # Force install tools at subtask start - once for the entire subtask
     from inspect_evals.swe_bench.swe_agent_tools.utils import install_tool_requirements
 
@@ -23,14 +36,19 @@ async def consult_team_subtask(question: str) -> str:
         "target": [""],
     }
 
-    # First call multi_agent_consultancy_team() to get the run function
-    team_function = await setup_debate_team()
+    global _active_consultations
+    _active_consultations += 1
+    try:
+        # First call multi_agent_consultancy_team() to get the run function
+        team_function = await setup_debate_team()
 
-    # Then call that function with your sample
-    result = await team_function(sample)
+        # Then call that function with your sample
+        result = await team_function(sample)
+    finally:
+        _active_consultations -= 1
 
-    # Extract and return the output
-    return str(result["output"])
+    # Extract and return the output, with the artifacts if there are any
+    return {"output": str(result["output"]), "artifacts": result.get("artifacts")}
 
 
 @tool
@@ -55,8 +73,18 @@ def consult_multi_agent_team(
             if result is None:
                 return "No result was provided by the consultation team."
 
+            output = str(result["output"])
+            artifacts = result.get("artifacts")
+            if artifacts:
+                # Keep the artifacts where later steps of the solver can read them
+                store().set(TEAM_ARTIFACTS_KEY, artifacts)
+                output += (
+                    "\n\n## Artifacts (merged from all solutions):\n"
+                    f"```json\n{json.dumps(artifacts, indent=1)}\n```"
+                )
+
             # Make sure we return a plain string result
-            return str(result)
+            return output
 
         except Exception as e:
             print(f"Error during multi-agent consultation: {str(e)}")
@@ -65,3 +93,15 @@ def consult_multi_agent_team(
             return error_msg
 
     return execute
+
+
+async def cleanup_team(state: TaskState) -> None:
+    """
+    Close the shared HTTP clients and batch executors at the end of a sample,
+    unless another sample is still consulting the team. Pass as the cleanup
+    of the task, so nothing is left open when the evaluation ends.
+    """
+    if _active_consultations:
+        return
+    await aclose_batch_executors()
+    await HTTP_CLIENTS.aclose()
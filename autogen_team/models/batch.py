@@ -0,0 +1,321 @@
+"""Offline batch API execution of model calls."""
+
+import asyncio
+import contextvars
+import json
+import os
+import time
+import uuid
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import httpx
+from autogen_core import CancellationToken
+from autogen_core.models import (
+    ChatCompletionClient,
+    CreateResult,
+    LLMMessage,
+    RequestUsage,
+)
+from autogen_core.tools import Tool, ToolSchema
+from autogen_ext.models.openai import OpenAIChatCompletionClient
+from openai import AsyncOpenAI
+
+from .delegating_client import DelegatingChatCompletionClient, find_wrapper
+
+# Batch statuses after which no results will be added
+_FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+class BatchError(Exception):
+    """A request that the batch API didn't answer."""
+
+
+class BatchExecutor:
+    """
+    Collects chat completion requests and sends them through a batch API.
+
+    Requests are collected until max_batch_size have arrived, or until
+    max_wait_seconds after the first one, then uploaded as one batch. The
+    batch is polled every poll_interval_seconds, and each request's caller
+    resumes once the batch completes. Batches run concurrently, so requests
+    keep being collected while earlier batches are processed.
+
+    Speaks the OpenAI batch API, so base_url can point at OpenAI or at a
+    local stand-in such as stub_server.py.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        max_batch_size: int = 1000,
+        max_wait_seconds: float = 60.0,
+        poll_interval_seconds: float = 30.0,
+        completion_window: str = "24h",
+    ) -> None:
+        self._client = AsyncOpenAI(api_key=api_key, base_url=base_url)
+        self._max_batch_size = max_batch_size
+        self._max_wait_seconds = max_wait_seconds
+        self._poll_interval_seconds = poll_interval_seconds
+        self._completion_window = completion_window
+        self._pending: List[Tuple[str, Dict[str, Any], asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # Keeps running batches from being garbage collected
+        self._tasks: set = set()
+        self.batches = 0
+        self.requests = 0
+        self.failed_requests = 0
+
+    async def submit(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Add a request to the next batch, and wait for its response.
+
+        Args:
+            body: Chat completions request body
+
+        Returns:
+            Chat completions response body
+
+        Raises:
+            BatchError: If the batch failed, or didn't answer the request
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((f"request-{uuid.uuid4().hex}", body, future))
+        self.requests += 1
+        if len(self._pending) >= self._max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self._max_wait_seconds, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        """Start a batch with the pending requests."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        requests, self._pending = self._pending, []
+        if not requests:
+            return
+        task = asyncio.get_running_loop().create_task(self._run_batch(requests))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(
+        self, requests: List[Tuple[str, Dict[str, Any], asyncio.Future]]
+    ) -> None:
+        futures = {custom_id: future for custom_id, _, future in requests}
+        try:
+            results = await self._send_batch(
+                [(custom_id, body) for custom_id, body, _ in requests]
+            )
+        except Exception as e:
+            print(f"Error running batch: {type(e).__name__}: {str(e)}")
+            results = {}
+            error = BatchError(f"Batch failed: {type(e).__name__}: {str(e)}")
+        else:
+            error = BatchError("Batch returned no response for the request")
+
+        for custom_id, future in futures.items():
+            if future.done():
+                continue
+            if custom_id in results:
+                future.set_result(results[custom_id])
+            else:
+                self.failed_requests += 1
+                future.set_exception(error)
+
+    async def _send_batch(
+        self, requests: List[Tuple[str, Dict[str, Any]]]
+    ) -> Dict[str, Dict[str, Any]]:
+        """Upload, run and download one batch, returning responses by request id."""
+        lines = [
+            json.dumps(
+                {
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": body,
+                }
+            )
+            for custom_id, body in requests
+        ]
+        input_file = await self._client.files.create(
+            file=("batch.jsonl", "\n".join(lines).encode("utf-8")), purpose="batch"
+        )
+        batch = await self._client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window=self._completion_window,
+        )
+        self.batches += 1
+        start_time = time.perf_counter()
+        print(f"Submitted batch {batch.id} with {len(requests)} requests")
+
+        while batch.status not in _FINAL_STATUSES:
+            await asyncio.sleep(self._poll_interval_seconds)
+            batch = await self._client.batches.retrieve(batch.id)
+        print(
+            f"Batch {batch.id} {batch.status} after "
+            f"{time.perf_counter() - start_time:.0f}s"
+        )
+
+        results = {}
+        if batch.output_file_id:
+            output = await self._client.files.content(batch.output_file_id)
+            for line in output.text.splitlines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                response = record.get("response") or {}
+                if response.get("status_code") == 200:
+                    results[record["custom_id"]] = response["body"]
+        return results
+
+    async def aclose(self) -> None:
+        """Send any pending requests, and wait for all batches to finish."""
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self._client.close()
+
+
+_EXECUTORS: Dict[Tuple[str, str], BatchExecutor] = {}
+
+
+def get_batch_executor(base_url: str, config: Mapping[str, Any]) -> BatchExecutor:
+    """
+    Get the process-wide executor for a batch API, creating it if needed.
+
+    Args:
+        base_url: Base URL of the batch API, unless config overrides it
+        config: The batch config
+
+    Returns:
+        The executor, shared by every consultation in the process
+    """
+    base_url = config.get("base_url", base_url)
+    api_key = config.get("api_key") or os.environ.get("OPENAI_API_KEY", "")
+    key = (base_url, api_key)
+    if key not in _EXECUTORS:
+        _EXECUTORS[key] = BatchExecutor(
+            base_url,
+            api_key,
+            max_batch_size=config.get("max_batch_size", 1000),
+            max_wait_seconds=config.get("max_wait_seconds", 60.0),
+            poll_interval_seconds=config.get("poll_interval_seconds", 30.0),
+            completion_window=config.get("completion_window", "24h"),
+        )
+    return _EXECUTORS[key]
+
+
+async def aclose_batch_executors() -> None:
+    """Close every executor, e.g. at the end of an evaluation."""
+    executors = list(_EXECUTORS.values())
+    _EXECUTORS.clear()
+    for executor in executors:
+        try:
+            await executor.aclose()
+        except Exception as e:
+            print(f"Error closing batch executor: {type(e).__name__}: {str(e)}")
+
+
+# Executor for the model call running in the current task, for the transport
+_CURRENT_EXECUTOR: contextvars.ContextVar[Optional[BatchExecutor]] = (
+    contextvars.ContextVar("batch_executor", default=None)
+)
+
+
+class BatchTransport(httpx.AsyncBaseTransport):
+    """
+    Sends chat completion requests of a BatchingChatCompletionClient through
+    its batch executor, and answers them with the batch's responses, so the
+    OpenAI SDK parses them like any other response. Requests the batch fails
+    to answer are sent directly instead. Other requests pass through.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport) -> None:
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        executor = _CURRENT_EXECUTOR.get()
+        if executor is None or not request.url.path.endswith("/chat/completions"):
+            return await self._transport.handle_async_request(request)
+
+        body = json.loads(await request.aread())
+        if body.get("stream"):
+            return await self._transport.handle_async_request(request)
+        try:
+            response_body = await executor.submit(body)
+        except BatchError as e:
+            print(f"Sending model call directly: {str(e)}")
+            return await self._transport.handle_async_request(request)
+        return httpx.Response(200, json=response_body, request=request)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class BatchingChatCompletionClient(DelegatingChatCompletionClient):
+    """
+    Sends the first batched_calls create() calls of an agent through a batch
+    executor, and every later call directly.
+
+    Batched calls go straight to the OpenAI client, past rate limiting and
+    retries, as the batch API has its own limits, and waiting for a batch
+    mustn't hold a rate limiter slot. Needs an HTTP client with a
+    BatchTransport, see create_model_client.
+    """
+
+    def __init__(
+        self,
+        client: ChatCompletionClient,
+        executor: BatchExecutor,
+        batched_calls: int = 1,
+    ) -> None:
+        super().__init__(client)
+        self._executor = executor
+        self._batched_calls = batched_calls
+        self._direct_client = find_wrapper(client, OpenAIChatCompletionClient)
+        self.calls = 0
+        self.batched = 0
+        # Usage of batched calls, which the batch API bills at a discount
+        self.batched_usage = RequestUsage(prompt_tokens=0, completion_tokens=0)
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> CreateResult:
+        self.calls += 1
+        if self.calls > self._batched_calls or self._direct_client is None:
+            return await self._client.create(
+                messages,
+                tools=tools,
+                json_output=json_output,
+                extra_create_args=extra_create_args,
+                cancellation_token=cancellation_token,
+            )
+
+        self.batched += 1
+        context_token = _CURRENT_EXECUTOR.set(self._executor)
+        try:
+            result = await self._direct_client.create(
+                messages,
+                tools=tools,
+                json_output=json_output,
+                extra_create_args=extra_create_args,
+                cancellation_token=cancellation_token,
+            )
+        finally:
+            _CURRENT_EXECUTOR.reset(context_token)
+        self.batched_usage = RequestUsage(
+            prompt_tokens=self.batched_usage.prompt_tokens + result.usage.prompt_tokens,
+            completion_tokens=self.batched_usage.completion_tokens
+            + result.usage.completion_tokens,
+        )
+        return result
@@ -1,12 +1,102 @@
 """Simple model client factory for Autogen team."""
 
 import os
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
+import httpx
+from autogen_core.models import ChatCompletionClient
 from autogen_ext.models.openai import OpenAIChatCompletionClient
 
+from .batch import BatchingChatCompletionClient, get_batch_executor
+from .client_registry import model_transport
+from .context_window import ContextWindowChatCompletionClient
+from .extra_body import ExtraBodyChatCompletionClient
+from .model_registry import UNSUPPORTED, model_spec
+from .prompt_caching import PromptCachingChatCompletionClient
+from .rate_limiter import (
+    RATE_LIMITERS,
+    RateLimitedChatCompletionClient,
+    install_response_hook,
+)
+from .response_cache import CachedChatCompletionClient, get_response_cache
+from .retry import RetryingChatCompletionClient, RetryPolicy
+from .tracing import CallTracer, TracingChatCompletionClient
 
-def create_model_client(model_config: Dict[str, Any]) -> OpenAIChatCompletionClient:
+PROVIDER_BASE_URLS = {
+    "openai": "https://api.openai.com/v1",
+    "openrouter": "https://openrouter.ai/api/v1",
+    # stub_server.py, or any other OpenAI-compatible server on this machine
+    "local": "http://127.0.0.1:8000/v1",
+}
+
+
+def provider_base_url(model_config: Dict[str, Any]) -> str:
+    """The API base URL requests for a model config are sent to."""
+    return (
+        model_config.get("base_url")
+        or PROVIDER_BASE_URLS[model_config.get("provider", "openai")]
+    )
+
+
+def needs_model_transport(
+    model_config: Dict[str, Any],
+    batch: Optional[Dict[str, Any]] = None,
+    tracer: Optional[CallTracer] = None,
+) -> bool:
+    """
+    Whether a model client needs an HTTP client with model_transport(), for
+    prompt caching, batching, tracing or OpenRouter preferences.
+    """
+    return (
+        bool(model_config.get("prompt_caching"))
+        or _is_batched(model_config, batch)
+        or tracer is not None
+        or any(
+            _extra_body({**model_config, **fallback})
+            for fallback in [{}, *model_config.get("fallbacks", [])]
+        )
+    )
+
+
+def _extra_body(model_config: Dict[str, Any]) -> Dict[str, Any]:
+    """OpenRouter preferences of a model config, sent in the request body."""
+    extra_body: Dict[str, Any] = {}
+    if model_config.get("provider", "openai") != "openrouter":
+        return extra_body
+
+    # Configure provider preferences
+    if model_config.get("require_full_parameter_support", False):
+        extra_body.setdefault("provider", {})["require_parameters"] = True
+
+    # Try OpenRouter's upstream providers in this order, and only these
+    provider_order = model_config.get("provider_order")
+    if provider_order:
+        extra_body.setdefault("provider", {})
+        extra_body["provider"]["order"] = provider_order
+        extra_body["provider"]["allow_fallbacks"] = False
+
+    # Add middle-out transform if enabled
+    if model_config.get("middle_out", False):
+        extra_body["transforms"] = ["middle-out"]
+    return extra_body
+
+
+def _is_batched(model_config: Dict[str, Any], batch: Optional[Dict[str, Any]]) -> bool:
+    # Only OpenAI has a batch API, unless the config points at a stand-in
+    return batch is not None and (
+        model_config.get("provider", "openai") == "openai" or "base_url" in batch
+    )
+
+
+def create_model_client(
+    model_config: Dict[str, Any],
+    http_client: Optional[httpx.AsyncClient] = None,
+    rate_limits: Optional[Dict[str, Any]] = None,
+    response_cache: Optional[Dict[str, Any]] = None,
+    batch: Optional[Dict[str, Any]] = None,
+    tracer: Optional[CallTracer] = None,
+    agent: Optional[str] = None,
+) -> ChatCompletionClient:
     """
     Create a model client based on configuration.
 
@@ -14,23 +104,144 @@ def create_model_client(model_config: Dict[str, Any]) -> OpenAIChatCompletionCli
         model_config: Dictionary with model configuration including:
             - model: Model name/identifier
             - temperature: Sampling temperature
-            - provider: 'openai' or 'openrouter'
+            - provider: 'openai', 'openrouter' or 'local'
+            - base_url: API base URL, instead of the provider's
             - model_family: Model family identifier
+            - prompt_caching: Turn on provider prompt caching, see
+              models/prompt_caching.py
+            - context_management: Trim calls to fit the context window, see
+              models/context_window.py
+        http_client: Shared HTTP client to send requests with, see
+            models/client_registry.py. The caller owns and closes it. If None,
+            a client of its own is created, closed by the model client's
+            close(). Pass one from HTTP_CLIENTS when needs_model_transport()
+            is true and nothing closes the model client.
+        rate_limits: The rate_limits config. If set, calls wait for the shared
+            limiter of their provider and model, see models/rate_limiter.py.
+        response_cache: The response_cache config. If set, responses are
+            cached on disk, see models/response_cache.py.
+        batch: The batch config. If set, the agent's first calls are sent
+            through the OpenAI batch API, see models/batch.py.
+        tracer: If set, every HTTP request of the client's calls is traced to
+            it, see models/tracing.py.
+        agent: Name of the agent the client belongs to, for the traces
 
     Returns:
-        Configured OpenAIChatCompletionClient
+        Configured OpenAIChatCompletionClient, wrapped by a layer adding the
+        OpenRouter preferences to the request body if the config has any, by
+        the rate limiter if rate_limits is set, by the retry layer if the config has "retry" or
+        "fallbacks", by the prompt caching and context window layers if the
+        config turns them on, by the tracing layer if tracer is set, and by the
+        response cache if response_cache is set
     """
+    prompt_caching = model_config.get("prompt_caching")
+    batched = _is_batched(model_config, batch)
+    if needs_model_transport(model_config, batch, tracer) and http_client is None:
+        # Like the client the OpenAI SDK would create, plus the model transports.
+        # The model client owns it, and closes it in close()
+        http_client = httpx.AsyncClient(
+            transport=model_transport(),
+            timeout=httpx.Timeout(600.0, connect=5.0),
+            follow_redirects=True,
+        )
+
+    if "retry" not in model_config and "fallbacks" not in model_config:
+        client = _create_single_client(model_config, http_client, rate_limits)
+    else:
+        # The retry layer owns retries, so the OpenAI SDK shouldn't retry as well
+        base_config = {
+            key: value
+            for key, value in model_config.items()
+            if key not in ("retry", "fallbacks")
+        }
+        fallbacks = [
+            _create_single_client(
+                {**base_config, **fallback}, http_client, rate_limits, max_retries=0
+            )
+            for fallback in model_config.get("fallbacks", [])
+        ]
+        client = RetryingChatCompletionClient(
+            _create_single_client(base_config, http_client, rate_limits, max_retries=0),
+            fallbacks,
+            RetryPolicy(**model_config.get("retry", {})),
+        )
+
+    if prompt_caching:
+        client = PromptCachingChatCompletionClient(
+            client,
+            breakpoints=(
+                prompt_caching.get("breakpoints", "auto")
+                if isinstance(prompt_caching, dict)
+                else "auto"
+            ),
+        )
+
+    if batched:
+        client = BatchingChatCompletionClient(
+            client,
+            get_batch_executor(provider_base_url(model_config), batch),
+            batched_calls=batch.get("batched_calls", 1),
+        )
+
+    context_management = model_config.get("context_management")
+    if context_management:
+        if not isinstance(context_management, dict):
+            context_management = {}
+        model = model_config.get("model", "gpt-4o-mini")
+        # Calls must fit whichever model they end up on
+        window = context_management.get("context_window") or min(
+            model_spec(config.get("model", model), config).context_window
+            for config in [
+                model_config,
+                *(
+                    {**model_config, **fallback}
+                    for fallback in model_config.get("fallbacks", [])
+                ),
+            ]
+        )
+        client = ContextWindowChatCompletionClient(
+            client,
+            model,
+            window,
+            reserve_output_tokens=context_management.get("reserve_output_tokens", 4096),
+            safety_margin=context_management.get("safety_margin", 0.1),
+            keep_recent_messages=context_management.get("keep_recent_messages", 6),
+        )
+
+    if tracer is not None:
+        # Outside the other layers, so queue waits include rate limiting and
+        # retry backoff
+        client = TracingChatCompletionClient(client, tracer, agent)
+
+    if response_cache is None:
+        return client
+    # Outermost, so cache hits skip rate limiting and retries too
+    return CachedChatCompletionClient(
+        client,
+        get_response_cache(
+            response_cache.get("path", "~/.cache/autogen_team/responses.sqlite"),
+            response_cache.get("max_size_mb", 500),
+        ),
+        f"{model_config.get('provider', 'openai')}/{model_config.get('model', 'gpt-4o-mini')}",
+        {"temperature": model_config.get("temperature", 0.2)},
+        cache_nonzero_temperature=response_cache.get(
+            "cache_nonzero_temperature", False
+        ),
+    )
+
+
+def _create_single_client(
+    model_config: Dict[str, Any],
+    http_client: Optional[httpx.AsyncClient],
+    rate_limits: Optional[Dict[str, Any]],
+    max_retries: Optional[int] = None,
+) -> ChatCompletionClient:
+    """Create the client for one model, see create_model_client."""
     # Extract needed values from config
     model = model_config.get("model", "gpt-4o-mini")
     temperature = model_config.get("temperature", 0.2)
     provider = model_config.get("provider", "openai")
-    vision = model_config.get("vision", "True") == "True"
-    function_calling = model_config.get("function_calling", "True") == "True"
-    json_output = model_config.get("json_output", "True") == "True"
-    require_full_parameter_support = model_config.get(
-        "require_full_parameter_support", False
-    )
-    middle_out = model_config.get("middle_out", False)
+    spec = model_spec(model, model_config)
 
     # Create base client args
     client_args = {
@@ -38,32 +249,38 @@ def create_model_client(model_config: Dict[str, Any]) -> OpenAIChatCompletionCli
         "temperature": temperature,
         "model_info": {
             "family": model_config.get("model_family", "unknown"),
-            "vision": vision,
-            "function_calling": function_calling,
-            "json_output": json_output,
+            "vision": spec.vision,
+            "function_calling": spec.function_calling != UNSUPPORTED,
+            "json_output": spec.json_output,
         },
     }
 
     # Adjust for provider
-    if provider == "openrouter":
-        client_args["base_url"] = "https://openrouter.ai/api/v1"
-        client_args["api_key"] = os.environ["OPENROUTER_API_KEY"]
+    if http_client is not None:
+        client_args["http_client"] = http_client
+    if max_retries is not None:
+        client_args["max_retries"] = max_retries
 
-        # Initialize additional parameters if needed
-        if "additional_parameters" not in client_args:
-            client_args["additional_parameters"] = {}
+    if provider == "local":
+        client_args["api_key"] = os.environ.get("LOCAL_API_KEY", "local")
+    if provider != "openai" or "base_url" in model_config:
+        client_args["base_url"] = provider_base_url(model_config)
 
-        # Configure provider preferences
-        if require_full_parameter_support:
-            if "provider" not in client_args["additional_parameters"]:
-                client_args["additional_parameters"]["provider"] = {}
-            client_args["additional_parameters"]["provider"]["require_parameters"] = (
-                True
-            )
-
-        # Add middle-out transform if enabled
-        if middle_out:
-            client_args["additional_parameters"]["transforms"] = ["middle-out"]
+    if provider == "openrouter":
+        client_args["api_key"] = os.environ["OPENROUTER_API_KEY"]
 
     # Create and return the client
-    return OpenAIChatCompletionClient(**client_args)
+    client = OpenAIChatCompletionClient(**client_args)
+    extra_body = _extra_body(model_config)
+    if extra_body:
+        client = ExtraBodyChatCompletionClient(client, extra_body)
+    if rate_limits is not None:
+        if http_client is not None:
+            install_response_hook(http_client)
+        client = RateLimitedChatCompletionClient(
+            client,
+            RATE_LIMITERS.get(provider, model, rate_limits),
+            model,
+            max_requeues=rate_limits.get("max_requeues", 10),
+        )
+    return client
@@ -0,0 +1,176 @@
+"""Shared, connection-pooled HTTP clients for model API calls."""
+
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+from .batch import BatchTransport
+from .extra_body import ExtraBodyTransport
+from .prompt_caching import PromptCachingTransport
+from .tracing import TracingTransport
+
+try:
+    import h2  # noqa: F401
+
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+def model_transport(**kwargs: Any) -> httpx.AsyncBaseTransport:
+    """
+    HTTP transport for model API clients.
+
+    Adds the transports model client wrappers rely on, which only act on the
+    calls of clients with tracing, prompt caching, batching or extra request
+    body fields turned on.
+
+    Args:
+        **kwargs: Arguments for httpx.AsyncHTTPTransport
+    """
+    return TracingTransport(
+        PromptCachingTransport(
+            ExtraBodyTransport(BatchTransport(httpx.AsyncHTTPTransport(**kwargs)))
+        )
+    )
+
+
+@dataclass(frozen=True)
+class PoolLimits:
+    """Connection pool settings for a shared HTTP client."""
+
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    http2: bool = True
+    connect_timeout: float = 10.0
+    timeout: float = 600.0
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "PoolLimits":
+        """Build pool limits from the http_pool config, ignoring unknown keys."""
+        fields = cls.__dataclass_fields__
+        return cls(**{key: value for key, value in config.items() if key in fields})
+
+
+class HttpClientRegistry:
+    """
+    Hands out one pooled httpx.AsyncClient per provider and base URL.
+
+    Clients are reference counted. A client nobody holds is kept for
+    keepalive_expiry seconds, so the next consultation reuses its open
+    connections, and is then closed, as its pooled connections would have
+    expired by then anyway.
+    """
+
+    def __init__(self) -> None:
+        self._clients: Dict[Tuple[str, str, PoolLimits], httpx.AsyncClient] = {}
+        self._refcounts: Dict[int, int] = {}
+        self._keys: Dict[int, Tuple[str, str, PoolLimits]] = {}
+        self._loops: Dict[int, asyncio.AbstractEventLoop] = {}
+        self._close_handles: Dict[int, asyncio.TimerHandle] = {}
+        self.created = 0
+        self.reused = 0
+
+    def acquire(
+        self, provider: str, base_url: str, limits: Optional[PoolLimits] = None
+    ) -> httpx.AsyncClient:
+        """
+        Get the shared client for a provider and base URL, creating it if needed.
+
+        Must be called from the event loop the client will be used on. Every
+        acquire must be paired with a release.
+
+        Args:
+            provider: Provider name, e.g. "openai" or "openrouter"
+            base_url: API base URL the client will send requests to
+            limits: Connection pool settings, defaults to PoolLimits()
+
+        Returns:
+            The shared client
+        """
+        limits = limits or PoolLimits()
+        key = (provider, base_url.rstrip("/"), limits)
+        loop = asyncio.get_running_loop()
+
+        client = self._clients.get(key)
+        # Connections can't move between event loops, so drop clients from
+        # loops that have since closed
+        if client is not None and self._loops[id(client)] is not loop:
+            self._forget(client)
+            client = None
+
+        if client is None:
+            transport = model_transport(
+                http2=limits.http2 and HTTP2_AVAILABLE,
+                limits=httpx.Limits(
+                    max_connections=limits.max_connections,
+                    max_keepalive_connections=limits.max_keepalive_connections,
+                    keepalive_expiry=limits.keepalive_expiry,
+                ),
+            )
+            client = httpx.AsyncClient(
+                transport=transport,
+                timeout=httpx.Timeout(limits.timeout, connect=limits.connect_timeout),
+                follow_redirects=True,
+            )
+            self._clients[key] = client
+            self._keys[id(client)] = key
+            self._loops[id(client)] = loop
+            self._refcounts[id(client)] = 0
+            self.created += 1
+        else:
+            self.reused += 1
+
+        handle = self._close_handles.pop(id(client), None)
+        if handle is not None:
+            handle.cancel()
+        self._refcounts[id(client)] += 1
+        return client
+
+    def release(self, client: httpx.AsyncClient) -> None:
+        """Release a client from acquire, scheduling its close once unused."""
+        if id(client) not in self._refcounts:
+            return
+        self._refcounts[id(client)] -= 1
+        if self._refcounts[id(client)] > 0:
+            return
+
+        keepalive_expiry = self._keys[id(client)][2].keepalive_expiry
+        loop = self._loops[id(client)]
+        self._close_handles[id(client)] = loop.call_later(
+            keepalive_expiry, lambda: loop.create_task(self._close_idle(client))
+        )
+
+    async def _close_idle(self, client: httpx.AsyncClient) -> None:
+        self._close_handles.pop(id(client), None)
+        if self._refcounts.get(id(client)) == 0:
+            self._forget(client)
+            await client.aclose()
+
+    def _forget(self, client: httpx.AsyncClient) -> None:
+        key = self._keys.pop(id(client))
+        if self._clients.get(key) is client:
+            del self._clients[key]
+        self._refcounts.pop(id(client), None)
+        self._loops.pop(id(client), None)
+        handle = self._close_handles.pop(id(client), None)
+        if handle is not None:
+            handle.cancel()
+
+    async def aclose(self) -> None:
+        """Close every client, e.g. at the end of an evaluation."""
+        clients = list(self._clients.values())
+        for client in clients:
+            self._forget(client)
+        for client in clients:
+            try:
+                await client.aclose()
+            except Exception as e:
+                print(f"Error closing HTTP client: {type(e).__name__}: {str(e)}")
+
+
+# Shared by every consultation in the process
+HTTP_CLIENTS = HttpClientRegistry()
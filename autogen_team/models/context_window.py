@@ -0,0 +1,391 @@
+"""Pre-flight context length management for model calls."""
+
+import json
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import (
+    Any,
+    AsyncGenerator,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from autogen_core import CancellationToken, FunctionCall
+from autogen_core.models import (
+    AssistantMessage,
+    ChatCompletionClient,
+    CreateResult,
+    FunctionExecutionResult,
+    FunctionExecutionResultMessage,
+    LLMMessage,
+    SystemMessage,
+    UserMessage,
+)
+from autogen_core.tools import Tool, ToolSchema
+
+from ..utils.tokens import count_tokens
+from .delegating_client import DelegatingChatCompletionClient
+from .retry import CONTEXT_OVERFLOW, ModelCallError
+
+# Tokens every message adds on top of its content, for the role and separators
+MESSAGE_OVERHEAD_TOKENS = 4
+# Rough token cost of an image, whatever its size
+IMAGE_TOKENS = 1000
+# Tool outputs this small aren't worth truncating
+MIN_TRUNCATED_TOOL_OUTPUT_TOKENS = 200
+SUMMARY_LINE_CHARS = 150
+MAX_SUMMARY_LINES = 50
+TOOL_OUTPUT_REMOVED = "[Tool output removed to fit the context window]"
+
+
+@lru_cache(maxsize=1024)
+def _count_text_tokens(text: str, model: str) -> int:
+    return count_tokens(text, model)
+
+
+def _message_text(message: LLMMessage) -> Tuple[str, int]:
+    """Text of a message as sent to the model, and the number of images in it."""
+    if isinstance(message, FunctionExecutionResultMessage):
+        return "\n".join(result.content for result in message.content), 0
+    if isinstance(message.content, str):
+        return message.content, 0
+    parts = []
+    images = 0
+    for part in message.content:
+        if isinstance(part, str):
+            parts.append(part)
+        elif isinstance(part, FunctionCall):
+            parts.append(f"{part.name}({part.arguments})")
+        else:
+            images += 1
+    return "\n".join(parts), images
+
+
+def _is_tool_output(message: LLMMessage) -> bool:
+    """Check for tool results, native or in the text tool protocol."""
+    if isinstance(message, FunctionExecutionResultMessage):
+        return True
+    return (
+        isinstance(message, UserMessage)
+        and isinstance(message.content, str)
+        and (
+            message.content.startswith("<tool_result")
+            or message.content == TOOL_OUTPUT_REMOVED
+        )
+    )
+
+
+def _is_tool_call(message: LLMMessage) -> bool:
+    return (
+        isinstance(message, AssistantMessage)
+        and isinstance(message.content, list)
+        and any(isinstance(part, FunctionCall) for part in message.content)
+    )
+
+
+def _truncate(text: str, ratio: float) -> str:
+    """Keep the start and end of a text, dropping its middle."""
+    half = int(len(text) * ratio) // 2
+    if half == 0:
+        return "[... output truncated to fit the context window ...]"
+    return (
+        f"{text[:half]}\n[... output truncated to fit the context window ...]\n"
+        f"{text[-half:]}"
+    )
+
+
+def _map_tool_output(
+    message: LLMMessage, transform: Callable[[str], str]
+) -> LLMMessage:
+    """Copy of a tool output message, with transform applied to each output."""
+    if isinstance(message, FunctionExecutionResultMessage):
+        return FunctionExecutionResultMessage(
+            content=[
+                FunctionExecutionResult(
+                    content=transform(result.content),
+                    name=result.name,
+                    call_id=result.call_id,
+                    is_error=result.is_error,
+                )
+                for result in message.content
+            ]
+        )
+    return UserMessage(content=transform(message.content), source=message.source)
+
+
+def _summary_line(message: LLMMessage) -> str:
+    if _is_tool_call(message):
+        calls = ", ".join(
+            f"{part.name}({part.arguments})"
+            for part in message.content
+            if isinstance(part, FunctionCall)
+        )
+        line = f"- You called {calls}"
+    elif _is_tool_output(message):
+        return ""
+    elif isinstance(message, AssistantMessage):
+        line = f"- You said: {_message_text(message)[0]}"
+    else:
+        line = f"- You were told: {_message_text(message)[0]}"
+    line = " ".join(line.split())
+    if len(line) > SUMMARY_LINE_CHARS:
+        line = line[: SUMMARY_LINE_CHARS - 3] + "..."
+    return line
+
+
+def summarize_messages(messages: Sequence[LLMMessage]) -> UserMessage:
+    """
+    Summarize earlier steps of a conversation into one message.
+
+    The summary is built without calling a model, so the same steps always
+    give the same summary: a line per tool call or message, tool outputs left
+    out.
+
+    Args:
+        messages: Messages to summarize, oldest first
+
+    Returns:
+        A user message standing in for the summarized messages
+    """
+    lines = [line for line in map(_summary_line, messages) if line]
+    omitted = max(0, len(lines) - MAX_SUMMARY_LINES)
+    lines = lines[omitted:]
+    if omitted:
+        lines.insert(0, f"- ({omitted} earlier steps omitted)")
+    return UserMessage(
+        content="Earlier steps were removed to fit the context window. "
+        "Summary of what happened in them:\n" + "\n".join(lines),
+        source="user",
+    )
+
+
+@dataclass
+class ContextTrim:
+    """Record of one call that was trimmed to fit the context window."""
+
+    tokens_before: int
+    tokens_after: int
+    budget: int
+    dropped_tool_outputs: int = 0
+    summarized_messages: int = 0
+    truncated_tool_outputs: int = 0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.tokens_before} -> {self.tokens_after} tokens "
+            f"(budget {self.budget}): dropped {self.dropped_tool_outputs} tool "
+            f"outputs, summarized {self.summarized_messages} messages, "
+            f"truncated {self.truncated_tool_outputs} tool outputs"
+        )
+
+
+class ContextWindowChatCompletionClient(DelegatingChatCompletionClient):
+    """
+    Trims the messages of every call to fit the model's context window.
+
+    Tokens are counted locally before the call, once per message. Calls over
+    budget are trimmed in a fixed order, each stage only running while the
+    call is still over: tool outputs outside the most recent messages are
+    dropped, oldest first, then the oldest steps are replaced by a summary,
+    then the largest recent tool outputs are truncated. The system messages
+    and the first message after them, the issue, are always kept. A call that
+    still doesn't fit raises a ModelCallError instead of being sent.
+
+    The caller's messages are never changed, only the copy sent to the model.
+    """
+
+    def __init__(
+        self,
+        client: ChatCompletionClient,
+        model: str,
+        context_window: int,
+        reserve_output_tokens: int = 4096,
+        safety_margin: float = 0.1,
+        keep_recent_messages: int = 6,
+    ) -> None:
+        super().__init__(client)
+        self._model = model
+        # Token counts of non-OpenAI models are approximate, hence the margin
+        self.budget = int(context_window * (1 - safety_margin)) - reserve_output_tokens
+        self._keep_recent_messages = keep_recent_messages
+        # Keeps a reference to each message, so its id can't be reused
+        self._message_tokens: Dict[int, Tuple[LLMMessage, int]] = {}
+        self.trims: List[ContextTrim] = []
+
+    def _count(self, message: LLMMessage) -> int:
+        text, images = _message_text(message)
+        return (
+            _count_text_tokens(text, self._model)
+            + images * IMAGE_TOKENS
+            + MESSAGE_OVERHEAD_TOKENS
+        )
+
+    def _tokens(self, message: LLMMessage) -> int:
+        """Count the tokens of a message of the conversation, once."""
+        cached = self._message_tokens.get(id(message))
+        if cached is not None and cached[0] is message:
+            return cached[1]
+        tokens = self._count(message)
+        self._message_tokens[id(message)] = (message, tokens)
+        return tokens
+
+    def _tool_tokens(self, tools: Sequence[Tool | ToolSchema]) -> int:
+        schemas = [tool.schema if isinstance(tool, Tool) else tool for tool in tools]
+        if not schemas:
+            return 0
+        return _count_text_tokens(json.dumps(schemas, sort_keys=True), self._model)
+
+    def _tail_start(self, messages: List[LLMMessage], head: int) -> int:
+        """Index of the first recent message, which is never dropped or summarized."""
+        start = max(head, len(messages) - self._keep_recent_messages)
+        # Tool outputs must stay with the tool calls they answer
+        while start > head and isinstance(
+            messages[start], FunctionExecutionResultMessage
+        ):
+            start -= 1
+        return start
+
+    def fit(
+        self,
+        messages: Sequence[LLMMessage],
+        tools: Sequence[Tool | ToolSchema] = [],
+    ) -> List[LLMMessage]:
+        """
+        Trim messages to fit the budget, see the class docstring.
+
+        Args:
+            messages: Messages of the call
+            tools: Tools sent with the call, which count towards the budget
+
+        Returns:
+            The messages to send, the original list if nothing was trimmed
+
+        Raises:
+            ModelCallError: If the messages don't fit even after trimming
+        """
+        budget = self.budget - self._tool_tokens(tools)
+        sizes = [self._tokens(message) for message in messages]
+        total = sum(sizes)
+        if total <= budget:
+            return list(messages)
+
+        trim = ContextTrim(tokens_before=total, tokens_after=total, budget=budget)
+        trimmed = list(messages)
+        head = 0
+        while head < len(trimmed) and isinstance(trimmed[head], SystemMessage):
+            head += 1
+        head = min(head + 1, len(trimmed))
+        tail = self._tail_start(trimmed, head)
+
+        def replace(index: int, message: LLMMessage) -> None:
+            nonlocal total
+            tokens = self._count(message)
+            total += tokens - sizes[index]
+            trimmed[index] = message
+            sizes[index] = tokens
+
+        # Drop old tool outputs first, they are the bulk of most conversations
+        for index in range(head, tail):
+            if total <= budget:
+                break
+            if _is_tool_output(trimmed[index]):
+                replace(
+                    index,
+                    _map_tool_output(trimmed[index], lambda _: TOOL_OUTPUT_REMOVED),
+                )
+                trim.dropped_tool_outputs += 1
+
+        # Then summarize the oldest steps, whole tool exchanges at a time
+        if total > budget and tail > head:
+            end = head
+            while end < tail:
+                end += 1
+                while end < tail and isinstance(
+                    trimmed[end], FunctionExecutionResultMessage
+                ):
+                    end += 1
+                summary = summarize_messages(trimmed[head:end])
+                summary_tokens = self._count(summary)
+                if total - sum(sizes[head:end]) + summary_tokens <= budget:
+                    break
+            total += summary_tokens - sum(sizes[head:end])
+            trimmed[head:end] = [summary]
+            sizes[head:end] = [summary_tokens]
+            trim.summarized_messages = end - head
+            tail -= end - head - 1
+
+        # Then cut the middle out of the largest recent tool outputs
+        while total > budget:
+            candidates = [
+                index
+                for index in range(tail, len(trimmed))
+                if _is_tool_output(trimmed[index])
+                and sizes[index] > MIN_TRUNCATED_TOOL_OUTPUT_TOKENS
+            ]
+            if not candidates:
+                break
+            index = max(candidates, key=lambda i: (sizes[i], -i))
+            target = max(
+                MIN_TRUNCATED_TOOL_OUTPUT_TOKENS // 2,
+                min(sizes[index] // 2, sizes[index] - (total - budget)),
+            )
+            ratio = target / sizes[index]
+            replace(
+                index,
+                _map_tool_output(trimmed[index], lambda text: _truncate(text, ratio)),
+            )
+            trim.truncated_tool_outputs += 1
+
+        trim.tokens_after = total
+        self.trims.append(trim)
+        if total > budget:
+            raise ModelCallError(
+                CONTEXT_OVERFLOW,
+                0,
+                ValueError(
+                    f"{total} prompt tokens don't fit the budget of {budget} "
+                    "tokens, even after trimming"
+                ),
+            )
+        print(f"Trimmed model call to fit the context window: {trim}")
+        return trimmed
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> CreateResult:
+        return await self._client.create(
+            self.fit(messages, tools),
+            tools=tools,
+            json_output=json_output,
+            extra_create_args=extra_create_args,
+            cancellation_token=cancellation_token,
+        )
+
+    def create_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        return self._client.create_stream(
+            self.fit(messages, tools),
+            tools=tools,
+            json_output=json_output,
+            extra_create_args=extra_create_args,
+            cancellation_token=cancellation_token,
+        )
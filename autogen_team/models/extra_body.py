@@ -0,0 +1,111 @@
+"""Extra fields in the body of chat completion requests, e.g. OpenRouter's."""
+
+import contextvars
+import json
+from typing import Any, AsyncGenerator, Dict, Mapping, Optional, Sequence, Union
+
+import httpx
+from autogen_core import CancellationToken
+from autogen_core.models import ChatCompletionClient, CreateResult, LLMMessage
+from autogen_core.tools import Tool, ToolSchema
+
+from .delegating_client import DelegatingChatCompletionClient
+
+# Fields to add to the request of the model call running in the current task
+_CURRENT_EXTRA_BODY: contextvars.ContextVar[Optional[Dict[str, Any]]] = (
+    contextvars.ContextVar("extra_body", default=None)
+)
+
+
+class ExtraBodyTransport(httpx.AsyncBaseTransport):
+    """
+    Adds the fields of an ExtraBodyChatCompletionClient to its chat completion
+    requests. Other requests pass through untouched.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport) -> None:
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        extra_body = _CURRENT_EXTRA_BODY.get()
+        if not extra_body or not request.url.path.endswith("/chat/completions"):
+            return await self._transport.handle_async_request(request)
+
+        body = json.loads(await request.aread())
+        body.update(extra_body)
+        headers = request.headers.copy()
+        del headers["content-length"]
+        request = httpx.Request(
+            request.method,
+            request.url,
+            headers=headers,
+            content=json.dumps(body).encode("utf-8"),
+            extensions=request.extensions,
+        )
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class ExtraBodyChatCompletionClient(DelegatingChatCompletionClient):
+    """
+    Sends extra fields in the body of every request of a model client.
+
+    Autogen drops config keys the OpenAI SDK doesn't declare, and rejects them
+    in extra_create_args, so fields like OpenRouter's "provider" can't be
+    passed through it. Needs an HTTP client with an ExtraBodyTransport, see
+    create_model_client.
+    """
+
+    def __init__(
+        self, client: ChatCompletionClient, extra_body: Dict[str, Any]
+    ) -> None:
+        super().__init__(client)
+        self.extra_body = extra_body
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> CreateResult:
+        context_token = _CURRENT_EXTRA_BODY.set(self.extra_body)
+        try:
+            return await self._client.create(
+                messages,
+                tools=tools,
+                json_output=json_output,
+                extra_create_args=extra_create_args,
+                cancellation_token=cancellation_token,
+            )
+        finally:
+            _CURRENT_EXTRA_BODY.reset(context_token)
+
+    def create_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        async def _generator() -> AsyncGenerator[Union[str, CreateResult], None]:
+            context_token = _CURRENT_EXTRA_BODY.set(self.extra_body)
+            try:
+                async for chunk in self._client.create_stream(
+                    messages,
+                    tools=tools,
+                    json_output=json_output,
+                    extra_create_args=extra_create_args,
+                    cancellation_token=cancellation_token,
+                ):
+                    yield chunk
+            finally:
+                _CURRENT_EXTRA_BODY.reset(context_token)
+
+        return _generator()
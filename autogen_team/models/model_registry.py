@@ -0,0 +1,179 @@
+"""Known models: context windows, prices and capabilities."""
+
+from dataclasses import dataclass, fields, replace
+from typing import Any, Dict, Mapping, Optional
+
+# Share of the price the OpenAI batch API charges
+BATCH_PRICE_FACTOR = 0.5
+
+# Function calling reliability levels
+RELIABLE = "reliable"
+UNRELIABLE = "unreliable"
+UNSUPPORTED = "none"
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    """
+    What a model can do and what it costs.
+
+    Prices are in US dollars per million tokens, as listed by the provider.
+    Prices of None mean the price isn't known, and calls to the model aren't
+    costed. Anthropic's surcharge for writing the prompt cache isn't modelled.
+    typical_latency_seconds is a rough duration of one reflection step, for
+    comparing configs, not a measurement.
+    """
+
+    context_window: int = 128000
+    prompt_price: Optional[float] = None
+    completion_price: Optional[float] = None
+    cached_prompt_price: Optional[float] = None
+    function_calling: str = RELIABLE
+    vision: bool = True
+    json_output: bool = True
+    typical_latency_seconds: Optional[float] = None
+
+    @property
+    def priced(self) -> bool:
+        return self.prompt_price is not None and self.completion_price is not None
+
+    def cost(
+        self, prompt_tokens: int, completion_tokens: int, cached_prompt_tokens: int = 0
+    ) -> float:
+        """
+        Dollar cost of a number of tokens, 0 if the model isn't priced.
+
+        Args:
+            prompt_tokens: Prompt tokens, including cached ones
+            completion_tokens: Completion tokens
+            cached_prompt_tokens: Prompt tokens read from the provider's cache
+
+        Returns:
+            Cost in US dollars
+        """
+        if not self.priced:
+            return 0.0
+        cached_price = (
+            self.prompt_price
+            if self.cached_prompt_price is None
+            else self.cached_prompt_price
+        )
+        return (
+            (prompt_tokens - cached_prompt_tokens) * self.prompt_price
+            + cached_prompt_tokens * cached_price
+            + completion_tokens * self.completion_price
+        ) / 1_000_000
+
+
+# By model name without the provider prefix
+MODELS: Dict[str, ModelSpec] = {
+    "gpt-4o": ModelSpec(128000, 2.50, 10.00, 1.25, typical_latency_seconds=5),
+    "gpt-4o-mini": ModelSpec(128000, 0.15, 0.60, 0.075, typical_latency_seconds=3),
+    "gpt-4-turbo": ModelSpec(128000, 10.00, 30.00, typical_latency_seconds=8),
+    "gpt-4.1": ModelSpec(1047576, 2.00, 8.00, 0.50, typical_latency_seconds=5),
+    "gpt-4.1-mini": ModelSpec(1047576, 0.40, 1.60, 0.10, typical_latency_seconds=3),
+    "o1": ModelSpec(200000, 15.00, 60.00, 7.50, typical_latency_seconds=30),
+    "o1-mini": ModelSpec(
+        128000,
+        1.10,
+        4.40,
+        0.55,
+        function_calling=UNSUPPORTED,
+        vision=False,
+        json_output=False,
+        typical_latency_seconds=15,
+    ),
+    "o3-mini": ModelSpec(
+        200000, 1.10, 4.40, 0.55, vision=False, typical_latency_seconds=15
+    ),
+    "claude-3-haiku": ModelSpec(200000, 0.25, 1.25, 0.03, typical_latency_seconds=3),
+    "claude-3.5-haiku": ModelSpec(
+        200000, 0.80, 4.00, 0.08, vision=False, typical_latency_seconds=4
+    ),
+    "claude-3.5-sonnet": ModelSpec(
+        200000, 3.00, 15.00, 0.30, typical_latency_seconds=6
+    ),
+    "claude-3.7-sonnet": ModelSpec(
+        200000, 3.00, 15.00, 0.30, typical_latency_seconds=8
+    ),
+    "gemini-2.0-flash-001": ModelSpec(
+        1048576, 0.10, 0.40, 0.025, typical_latency_seconds=2
+    ),
+    "gemini-2.0-flash-lite-001": ModelSpec(
+        1048576, 0.075, 0.30, json_output=False, typical_latency_seconds=2
+    ),
+    "deepseek-chat": ModelSpec(
+        64000,
+        0.27,
+        1.10,
+        0.07,
+        function_calling=UNRELIABLE,
+        vision=False,
+        typical_latency_seconds=10,
+    ),
+    "llama-3.3-70b-instruct": ModelSpec(
+        131072,
+        0.12,
+        0.30,
+        function_calling=UNRELIABLE,
+        vision=False,
+        typical_latency_seconds=4,
+    ),
+    "qwen-2.5-coder-32b-instruct": ModelSpec(
+        32768,
+        0.07,
+        0.16,
+        function_calling=UNRELIABLE,
+        vision=False,
+        typical_latency_seconds=4,
+    ),
+}
+# For models not listed above, with the capabilities the configs used to default to
+DEFAULT_MODEL = ModelSpec()
+
+
+def parse_flag(value: Any) -> bool:
+    """Read a boolean config flag, given as a boolean or as "True" or "False"."""
+    if isinstance(value, str):
+        return value.strip().lower() == "true"
+    return bool(value)
+
+
+def model_spec(model: str, overrides: Optional[Mapping[str, Any]] = None) -> ModelSpec:
+    """
+    Look up a model, applying any overrides from its agent config.
+
+    Args:
+        model: Model name, with or without a provider prefix
+        overrides: Agent config, whose keys named after ModelSpec fields
+            override the registry. vision and json_output are flags, and
+            function_calling is a reliability level or a flag.
+
+    Returns:
+        The model's spec
+    """
+    spec = MODELS.get(model.split("/")[-1], DEFAULT_MODEL)
+    if not overrides:
+        return spec
+
+    changes = {
+        field.name: overrides[field.name]
+        for field in fields(ModelSpec)
+        if field.name in overrides
+    }
+    for flag in ("vision", "json_output"):
+        if flag in changes:
+            changes[flag] = parse_flag(changes[flag])
+    if "function_calling" in changes and changes["function_calling"] not in (
+        RELIABLE,
+        UNRELIABLE,
+        UNSUPPORTED,
+    ):
+        # Flags only say whether the model can call functions, not how well
+        if not parse_flag(changes["function_calling"]):
+            changes["function_calling"] = UNSUPPORTED
+        elif spec.function_calling == UNSUPPORTED:
+            changes["function_calling"] = RELIABLE
+        else:
+            changes["function_calling"] = spec.function_calling
+    return replace(spec, **changes)
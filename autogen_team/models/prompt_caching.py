@@ -0,0 +1,219 @@
+"""Provider prompt caching: cache breakpoints and cached token accounting."""
+
+import contextvars
+import json
+import re
+from dataclasses import dataclass
+from typing import (
+    Any,
+    AsyncGenerator,
+    AsyncIterator,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Union,
+)
+
+import httpx
+from autogen_core import CancellationToken
+from autogen_core.models import ChatCompletionClient, CreateResult, LLMMessage
+from autogen_core.tools import Tool, ToolSchema
+
+from .delegating_client import DelegatingChatCompletionClient
+
+_CACHED_TOKENS = re.compile(rb'"cached_tokens"\s*:\s*(\d+)')
+# Enough of the previous chunk to match a "cached_tokens" field split across two
+_SCAN_OVERLAP = 64
+
+# Models that need explicit cache_control breakpoints, other providers cache
+# repeated prefixes automatically
+BREAKPOINT_MODEL_PREFIXES = ("anthropic/",)
+# Roles whose content can carry a cache_control breakpoint
+_BREAKPOINT_ROLES = ("system", "user", "tool")
+
+
+@dataclass
+class PromptCacheStats:
+    """Prompt caching settings and counts for one agent's model calls."""
+
+    breakpoints: Union[bool, str] = "auto"
+    calls: int = 0
+    cached_tokens: int = 0
+
+    def wants_breakpoints(self, model: str) -> bool:
+        if self.breakpoints == "auto":
+            return model.startswith(BREAKPOINT_MODEL_PREFIXES)
+        return bool(self.breakpoints)
+
+
+# Stats of the model call running in the current task, for the transport
+_CURRENT_STATS: contextvars.ContextVar[Optional[PromptCacheStats]] = (
+    contextvars.ContextVar("prompt_cache_stats", default=None)
+)
+
+
+def _mark(message: Dict[str, Any]) -> None:
+    """Put an ephemeral cache_control breakpoint on a message's last text part."""
+    content = message.get("content")
+    if isinstance(content, str):
+        message["content"] = [
+            {"type": "text", "text": content, "cache_control": {"type": "ephemeral"}}
+        ]
+    elif isinstance(content, list) and content and content[-1].get("type") == "text":
+        content[-1]["cache_control"] = {"type": "ephemeral"}
+
+
+def add_cache_breakpoints(messages: List[Dict[str, Any]]) -> None:
+    """
+    Mark cache breakpoints in chat completion messages, in place.
+
+    At most three of the four breakpoints Anthropic allows are used: the end
+    of the system prompt and of the issue, shared by all consultants, and the
+    end of the conversation, so the next step reuses everything before it.
+
+    Args:
+        messages: Messages of a chat completions request body
+    """
+    candidates = [
+        index
+        for index, message in enumerate(messages)
+        if message.get("role") in _BREAKPOINT_ROLES and message.get("content")
+    ]
+    if not candidates:
+        return
+    breakpoints = set()
+    system = [i for i in candidates if messages[i]["role"] == "system"]
+    if system:
+        breakpoints.add(system[-1])
+    first_user = next((i for i in candidates if messages[i]["role"] == "user"), None)
+    if first_user is not None:
+        breakpoints.add(first_user)
+    breakpoints.add(candidates[-1])
+    for index in sorted(breakpoints):
+        _mark(messages[index])
+
+
+class _CachedTokenScanner(httpx.AsyncByteStream):
+    """Passes a response body through, counting the cached tokens it reports."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, stats: PromptCacheStats):
+        self._stream = stream
+        self._stats = stats
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        tail = b""
+        async for chunk in self._stream:
+            window = tail + chunk
+            for match in _CACHED_TOKENS.finditer(window):
+                # Skip matches wholly inside the overlap, they were counted already
+                if match.end() > len(tail):
+                    self._stats.cached_tokens += int(match.group(1))
+            tail = window[-_SCAN_OVERLAP:]
+            yield chunk
+
+    async def aclose(self) -> None:
+        await self._stream.aclose()
+
+
+class PromptCachingTransport(httpx.AsyncBaseTransport):
+    """
+    Adds cache breakpoints to chat completion requests, and counts the cached
+    prompt tokens in their responses, for calls made by a
+    PromptCachingChatCompletionClient. Other requests pass through untouched.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport) -> None:
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        stats = _CURRENT_STATS.get()
+        if stats is None or not request.url.path.endswith("/chat/completions"):
+            return await self._transport.handle_async_request(request)
+
+        stats.calls += 1
+        body = json.loads(await request.aread())
+        if stats.wants_breakpoints(str(body.get("model", ""))):
+            add_cache_breakpoints(body.get("messages", []))
+            headers = request.headers.copy()
+            del headers["content-length"]
+            request = httpx.Request(
+                request.method,
+                request.url,
+                headers=headers,
+                content=json.dumps(body).encode("utf-8"),
+                extensions=request.extensions,
+            )
+
+        response = await self._transport.handle_async_request(request)
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_CachedTokenScanner(response.stream, stats),
+            extensions=response.extensions,
+            request=request,
+        )
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class PromptCachingChatCompletionClient(DelegatingChatCompletionClient):
+    """
+    Turns prompt caching on for the calls of one agent.
+
+    Needs an HTTP client with a PromptCachingTransport, see create_model_client.
+    """
+
+    def __init__(
+        self, client: ChatCompletionClient, breakpoints: Union[bool, str] = "auto"
+    ) -> None:
+        super().__init__(client)
+        self.stats = PromptCacheStats(breakpoints=breakpoints)
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> CreateResult:
+        context_token = _CURRENT_STATS.set(self.stats)
+        try:
+            return await self._client.create(
+                messages,
+                tools=tools,
+                json_output=json_output,
+                extra_create_args=extra_create_args,
+                cancellation_token=cancellation_token,
+            )
+        finally:
+            _CURRENT_STATS.reset(context_token)
+
+    def create_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        async def _generator() -> AsyncGenerator[Union[str, CreateResult], None]:
+            context_token = _CURRENT_STATS.set(self.stats)
+            try:
+                async for chunk in self._client.create_stream(
+                    messages,
+                    tools=tools,
+                    json_output=json_output,
+                    extra_create_args=extra_create_args,
+                    cancellation_token=cancellation_token,
+                ):
+                    yield chunk
+            finally:
+                _CURRENT_STATS.reset(context_token)
+
+        return _generator()
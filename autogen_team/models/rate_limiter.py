@@ -0,0 +1,462 @@
+"""Client-side rate limiting for model calls, shared by every consultation."""
+
+import asyncio
+import contextvars
+import random
+import re
+import time
+from typing import Any, AsyncGenerator, Dict, Mapping, Optional, Sequence, Union
+
+import httpx
+from autogen_core import CancellationToken
+from autogen_core.models import ChatCompletionClient, CreateResult, LLMMessage
+from autogen_core.tools import Tool, ToolSchema
+
+from ..utils.tokens import count_tokens
+from .delegating_client import DelegatingChatCompletionClient
+
+# Limiter of the model call running in the current task, so the HTTP response
+# hook can hand it the rate limit headers of the call's responses
+_CURRENT_LIMITER: contextvars.ContextVar[Optional["RateLimiter"]] = (
+    contextvars.ContextVar("current_rate_limiter", default=None)
+)
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_SECONDS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+# Don't halve the concurrency limit more than once per this many seconds, as
+# a burst of 429s usually comes from a single overload
+DECREASE_COOLDOWN_SECONDS = 2.0
+
+# Backoff before requeueing a call whose 429 didn't say how long to wait
+REQUEUE_BASE_DELAY_SECONDS = 1.0
+REQUEUE_MAX_DELAY_SECONDS = 30.0
+
+
+def _parse_duration(value: str) -> Optional[float]:
+    """Parse "1s", "6m0s", "20ms" or plain seconds into seconds."""
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_SECONDS[unit] for amount, unit in parts)
+
+
+def retry_after_seconds(headers: Mapping[str, str]) -> Optional[float]:
+    """How long a rate limited response asks the client to wait, if it says."""
+    if "retry-after-ms" in headers:
+        return float(headers["retry-after-ms"]) / 1000
+    if "retry-after" in headers:
+        return _parse_duration(headers["retry-after"])
+    # OpenRouter sends the reset time as a timestamp in milliseconds
+    if "x-ratelimit-reset" in headers:
+        try:
+            return max(0.0, float(headers["x-ratelimit-reset"]) / 1000 - time.time())
+        except ValueError:
+            return None
+    return None
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """Check if an exception from a model client is an HTTP 429."""
+    return getattr(error, "status_code", None) == 429
+
+
+class TokenBucket:
+    """
+    A per-minute budget, refilled continuously.
+
+    Callers wait in arrival order until their amount is available. An amount
+    larger than the whole budget waits for a full bucket rather than forever.
+    """
+
+    def __init__(self, per_minute: float) -> None:
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self._rate = per_minute / 60.0
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self._updated) * self._rate
+        )
+        self._updated = now
+
+    async def acquire(self, amount: float) -> None:
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self._rate)
+
+    def adjust(self, amount: float) -> None:
+        """Give back (positive) or take (negative) tokens after the fact."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def sync(self, remaining: float) -> None:
+        """Lower the budget to what the provider reports is left."""
+        self._refill()
+        self.tokens = min(self.tokens, remaining)
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD concurrency limit: grows by about one per limit's worth of successful
+    calls, and halves on a 429 or shrinks when calls get slower than the
+    latency target.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        max_limit: int,
+        min_limit: int = 1,
+        latency_target: Optional[float] = None,
+    ) -> None:
+        self.limit = float(max(min_limit, min(initial, max_limit)))
+        self._min_limit = min_limit
+        self._max_limit = max_limit
+        self._latency_target = latency_target
+        self._last_decrease = 0.0
+        self.in_flight = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self) -> None:
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self, latency: float) -> None:
+        if self._latency_target is not None and latency > self._latency_target:
+            self._decrease(0.9)
+        elif self.in_flight >= int(self.limit):
+            # Only grow while the limit is actually what holds calls back
+            self.limit = min(self._max_limit, self.limit + 1 / self.limit)
+
+    def on_rate_limit(self) -> None:
+        self._decrease(0.5)
+
+    def _decrease(self, factor: float) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < DECREASE_COOLDOWN_SECONDS:
+            return
+        self._last_decrease = now
+        self.limit = max(self._min_limit, self.limit * factor)
+
+
+class RateLimiter:
+    """
+    Rate limits for one provider and model: requests and tokens per minute,
+    an adaptive concurrency limit, and pauses requested by the provider.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_concurrency: int = 32,
+        initial_concurrency: int = 8,
+        latency_target_seconds: Optional[float] = None,
+    ) -> None:
+        self.name = name
+        self.requests = (
+            TokenBucket(requests_per_minute) if requests_per_minute else None
+        )
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.concurrency = AdaptiveConcurrency(
+            initial_concurrency, max_concurrency, latency_target=latency_target_seconds
+        )
+        self._paused_until = 0.0
+        self.calls = 0
+        self.rate_limited = 0
+        self.wait_seconds = 0.0
+
+    async def acquire(self, estimated_tokens: int) -> None:
+        """Wait until a call estimated at estimated_tokens tokens may be sent."""
+        start = time.monotonic()
+        while True:
+            pause = self._paused_until - time.monotonic()
+            if pause <= 0:
+                break
+            await asyncio.sleep(pause)
+        if self.requests is not None:
+            await self.requests.acquire(1)
+        if self.tokens is not None:
+            await self.tokens.acquire(estimated_tokens)
+        await self.concurrency.acquire()
+        self.calls += 1
+        self.wait_seconds += time.monotonic() - start
+
+    async def release(self) -> None:
+        await self.concurrency.release()
+
+    def on_success(
+        self, latency: float, estimated_tokens: int, used_tokens: int
+    ) -> None:
+        self.concurrency.on_success(latency)
+        if self.tokens is not None:
+            self.tokens.adjust(estimated_tokens - used_tokens)
+
+    def on_rate_limit(self, retry_after: Optional[float]) -> None:
+        self.rate_limited += 1
+        self.concurrency.on_rate_limit()
+        if retry_after:
+            self.pause(retry_after)
+
+    def pause(self, seconds: float) -> None:
+        """Hold new calls back for the given number of seconds."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def observe_headers(self, status_code: int, headers: Mapping[str, str]) -> None:
+        """Follow the rate limit headers of a provider response."""
+        if status_code == 429:
+            self.on_rate_limit(retry_after_seconds(headers))
+            return
+        # OpenAI style x-ratelimit-remaining-* headers, with their reset times
+        for kind, bucket in (("requests", self.requests), ("tokens", self.tokens)):
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            if remaining is None:
+                continue
+            try:
+                remaining_value = float(remaining)
+            except ValueError:
+                continue
+            if bucket is not None:
+                bucket.sync(remaining_value)
+            if remaining_value <= 0:
+                reset = _parse_duration(headers.get(f"x-ratelimit-reset-{kind}", ""))
+                if reset:
+                    self.pause(reset)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "rate_limited": self.rate_limited,
+            "wait_seconds": round(self.wait_seconds, 2),
+            "concurrency_limit": round(self.concurrency.limit, 1),
+        }
+
+
+async def _observe_response(response: httpx.Response) -> None:
+    limiter = _CURRENT_LIMITER.get()
+    if limiter is not None:
+        limiter.observe_headers(response.status_code, response.headers)
+
+
+def install_response_hook(http_client: httpx.AsyncClient) -> None:
+    """Feed the rate limit headers of every response to the calling limiter."""
+    hooks = http_client.event_hooks
+    if _observe_response not in hooks["response"]:
+        hooks["response"] = [*hooks["response"], _observe_response]
+        http_client.event_hooks = hooks
+
+
+class RateLimiterRegistry:
+    """One RateLimiter per provider and model, configured by the rate_limits key."""
+
+    def __init__(self) -> None:
+        self._limiters: Dict[str, RateLimiter] = {}
+
+    def get(
+        self, provider: str, model: str, rate_limits: Dict[str, Any]
+    ) -> RateLimiter:
+        """
+        Get the limiter for a provider and model, creating it if needed.
+
+        Settings are taken from the first of the "<provider>/<model>",
+        "<provider>" and "default" entries of rate_limits.
+
+        Args:
+            provider: Provider name, e.g. "openrouter"
+            model: Model name as sent to the provider
+            rate_limits: The rate_limits config
+
+        Returns:
+            The shared limiter
+        """
+        name = f"{provider}/{model}"
+        if name not in self._limiters:
+            settings = next(
+                (
+                    rate_limits[key]
+                    for key in (name, provider, "default")
+                    if key in rate_limits
+                ),
+                {},
+            )
+            self._limiters[name] = RateLimiter(name, **settings)
+        return self._limiters[name]
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: limiter.stats() for name, limiter in self._limiters.items()}
+
+
+# Shared by every consultation in the process
+RATE_LIMITERS = RateLimiterRegistry()
+
+
+class RateLimitedChatCompletionClient(DelegatingChatCompletionClient):
+    """
+    Waits for the limiter before every call, and requeues calls that get a
+    429 instead of failing them, up to max_requeues times.
+    """
+
+    def __init__(
+        self,
+        client: ChatCompletionClient,
+        limiter: RateLimiter,
+        model: str,
+        max_requeues: int = 10,
+    ) -> None:
+        super().__init__(client)
+        self._limiter = limiter
+        self._model = model
+        self._max_requeues = max_requeues
+
+    def _estimate_tokens(
+        self, messages: Sequence[LLMMessage], extra_create_args: Mapping[str, Any]
+    ) -> int:
+        prompt_tokens = sum(
+            count_tokens(str(message.content), self._model) for message in messages
+        )
+        return prompt_tokens + int(extra_create_args.get("max_tokens", 0))
+
+    def _should_requeue(
+        self, error: Exception, rate_limited_before: int, requeues: int
+    ) -> bool:
+        """Check if a failed call should be requeued, backing the limiter off."""
+        if not is_rate_limit_error(error) or requeues >= self._max_requeues:
+            return False
+        # The response hook has already counted the 429s it saw
+        if self._limiter.rate_limited == rate_limited_before:
+            response = getattr(error, "response", None)
+            self._limiter.on_rate_limit(
+                retry_after_seconds(response.headers) if response is not None else None
+            )
+        return True
+
+    def _requeue_delay(self, error: Exception, requeues: int) -> float:
+        """
+        Full jitter delay before requeue number requeues, counting from 1.
+
+        No delay is needed if the provider sent a retry-after, as the limiter
+        already holds calls back for that long.
+        """
+        response = getattr(error, "response", None)
+        if response is not None and retry_after_seconds(response.headers):
+            return 0.0
+        return random.uniform(
+            0,
+            min(REQUEUE_MAX_DELAY_SECONDS, REQUEUE_BASE_DELAY_SECONDS * 2**requeues),
+        )
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> CreateResult:
+        estimated_tokens = self._estimate_tokens(messages, extra_create_args)
+        requeues = 0
+        while True:
+            await self._limiter.acquire(estimated_tokens)
+            context_token = _CURRENT_LIMITER.set(self._limiter)
+            rate_limited_before = self._limiter.rate_limited
+            start = time.monotonic()
+            try:
+                result = await self._client.create(
+                    messages,
+                    tools=tools,
+                    json_output=json_output,
+                    extra_create_args=extra_create_args,
+                    cancellation_token=cancellation_token,
+                )
+            except Exception as e:
+                if not self._should_requeue(e, rate_limited_before, requeues):
+                    raise
+                requeues += 1
+                requeue_delay = self._requeue_delay(e, requeues)
+            else:
+                # Before releasing, so the limit only grows while saturated
+                usage = result.usage
+                self._limiter.on_success(
+                    time.monotonic() - start,
+                    estimated_tokens,
+                    usage.prompt_tokens + usage.completion_tokens,
+                )
+                return result
+            finally:
+                _CURRENT_LIMITER.reset(context_token)
+                await self._limiter.release()
+            # Without holding a concurrency slot
+            await asyncio.sleep(requeue_delay)
+
+    def create_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        async def _generator() -> AsyncGenerator[Union[str, CreateResult], None]:
+            estimated_tokens = self._estimate_tokens(messages, extra_create_args)
+            requeues = 0
+            while True:
+                await self._limiter.acquire(estimated_tokens)
+                context_token = _CURRENT_LIMITER.set(self._limiter)
+                rate_limited_before = self._limiter.rate_limited
+                start = time.monotonic()
+                started = False
+                try:
+                    async for chunk in self._client.create_stream(
+                        messages,
+                        tools=tools,
+                        json_output=json_output,
+                        extra_create_args=extra_create_args,
+                        cancellation_token=cancellation_token,
+                    ):
+                        started = True
+                        if isinstance(chunk, CreateResult):
+                            usage = chunk.usage
+                            self._limiter.on_success(
+                                time.monotonic() - start,
+                                estimated_tokens,
+                                usage.prompt_tokens + usage.completion_tokens,
+                            )
+                        yield chunk
+                    return
+                except Exception as e:
+                    # Only requeue streams that failed before yielding anything
+                    if started or not self._should_requeue(
+                        e, rate_limited_before, requeues
+                    ):
+                        raise
+                    requeues += 1
+                    requeue_delay = self._requeue_delay(e, requeues)
+                finally:
+                    _CURRENT_LIMITER.reset(context_token)
+                    await self._limiter.release()
+                await asyncio.sleep(requeue_delay)
+
+        return _generator()
@@ -0,0 +1,247 @@
+"""Persistent, content-addressed cache of model responses."""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, AsyncGenerator, Dict, Mapping, Optional, Sequence, Union
+
+from autogen_core import CancellationToken
+from autogen_core.models import ChatCompletionClient, CreateResult, LLMMessage
+from autogen_core.tools import Tool, ToolSchema
+
+from .delegating_client import DelegatingChatCompletionClient
+
+# Bump when the key or stored value format changes, so old entries are missed
+CACHE_FORMAT_VERSION = 1
+
+
+def cache_key(
+    model: str,
+    messages: Sequence[LLMMessage],
+    tools: Sequence[Tool | ToolSchema],
+    params: Mapping[str, Any],
+) -> str:
+    """
+    Hash a model call canonically, so identical calls get the same key.
+
+    Args:
+        model: Model name, with its provider
+        messages: Messages sent to the model
+        tools: Tools or tool schemas sent with the messages
+        params: Sampling parameters and other create arguments
+
+    Returns:
+        Hex SHA-256 digest of the call
+    """
+    payload = {
+        "version": CACHE_FORMAT_VERSION,
+        "model": model,
+        "messages": [message.model_dump(mode="json") for message in messages],
+        "tools": [tool.schema if isinstance(tool, Tool) else tool for tool in tools],
+        "params": params,
+    }
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    SQLite-backed store of model responses, evicted least recently used first
+    once the stored responses exceed max_size_mb.
+
+    Safe to share between consultations, threads and processes: SQLite's WAL
+    mode lets several eval processes read and write the same file.
+    """
+
+    def __init__(self, path: str, max_size_mb: float = 500) -> None:
+        self._path = Path(path).expanduser()
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._max_bytes = int(max_size_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            self._path, timeout=30, check_same_thread=False
+        )
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS responses_last_used "
+                "ON responses (last_used)"
+            )
+
+    def get(self, key: str) -> Optional[CreateResult]:
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT value FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute(
+                "UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key)
+            )
+        return CreateResult.model_validate_json(row[0])
+
+    def put(self, key: str, result: CreateResult) -> None:
+        value = result.model_dump_json()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, value, len(value), time.time()),
+            )
+            self._evict()
+
+    def _evict(self) -> None:
+        """Delete the least recently used responses until under the size limit."""
+        (total,) = self._connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        if total <= self._max_bytes:
+            return
+        excess = total - self._max_bytes
+        freed = 0
+        stale_keys = []
+        for key, size in self._connection.execute(
+            "SELECT key, size FROM responses ORDER BY last_used"
+        ):
+            if freed >= excess:
+                break
+            stale_keys.append((key,))
+            freed += size
+        self._connection.executemany("DELETE FROM responses WHERE key = ?", stale_keys)
+
+
+_CACHES: Dict[str, ResponseCache] = {}
+
+
+def get_response_cache(path: str, max_size_mb: float = 500) -> ResponseCache:
+    """Open the cache at a path, once per process."""
+    resolved = str(Path(path).expanduser().resolve())
+    if resolved not in _CACHES:
+        _CACHES[resolved] = ResponseCache(resolved, max_size_mb)
+    return _CACHES[resolved]
+
+
+class CachedChatCompletionClient(DelegatingChatCompletionClient):
+    """
+    Answers repeated model calls from a ResponseCache.
+
+    Calls are only cached at temperature 0, unless cache_nonzero_temperature
+    is set, as caching sampled responses makes repeated runs identical. Hits
+    don't reach the wrapped client, so they add nothing to its token usage.
+    """
+
+    def __init__(
+        self,
+        client: ChatCompletionClient,
+        cache: ResponseCache,
+        model: str,
+        params: Mapping[str, Any],
+        cache_nonzero_temperature: bool = False,
+    ) -> None:
+        super().__init__(client)
+        self._cache = cache
+        self._model = model
+        self._params = dict(params)
+        self._enabled = cache_nonzero_temperature or not params.get("temperature")
+        self.hits = 0
+        self.misses = 0
+        self.saved_tokens = 0
+
+    def _key(
+        self,
+        messages: Sequence[LLMMessage],
+        tools: Sequence[Tool | ToolSchema],
+        json_output: Optional[bool],
+        extra_create_args: Mapping[str, Any],
+    ) -> str:
+        params = {**self._params, **extra_create_args, "json_output": json_output}
+        return cache_key(self._model, messages, tools, params)
+
+    def _hit(self, result: CreateResult) -> CreateResult:
+        self.hits += 1
+        self.saved_tokens += result.usage.prompt_tokens + result.usage.completion_tokens
+        return result.model_copy(update={"cached": True})
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> CreateResult:
+        if not self._enabled:
+            return await super().create(
+                messages,
+                tools=tools,
+                json_output=json_output,
+                extra_create_args=extra_create_args,
+                cancellation_token=cancellation_token,
+            )
+
+        key = self._key(messages, tools, json_output, extra_create_args)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return self._hit(cached)
+
+        self.misses += 1
+        result = await self._client.create(
+            messages,
+            tools=tools,
+            json_output=json_output,
+            extra_create_args=extra_create_args,
+            cancellation_token=cancellation_token,
+        )
+        self._cache.put(key, result)
+        return result
+
+    def create_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        if not self._enabled:
+            return super().create_stream(
+                messages,
+                tools=tools,
+                json_output=json_output,
+                extra_create_args=extra_create_args,
+                cancellation_token=cancellation_token,
+            )
+
+        async def _generator() -> AsyncGenerator[Union[str, CreateResult], None]:
+            key = self._key(messages, tools, json_output, extra_create_args)
+            cached = self._cache.get(key)
+            if cached is not None:
+                result = self._hit(cached)
+                if isinstance(result.content, str):
+                    yield result.content
+                yield result
+                return
+
+            self.misses += 1
+            async for chunk in self._client.create_stream(
+                messages,
+                tools=tools,
+                json_output=json_output,
+                extra_create_args=extra_create_args,
+                cancellation_token=cancellation_token,
+            ):
+                # Streams cut off by the caller never get here, and aren't cached
+                if isinstance(chunk, CreateResult):
+                    self._cache.put(key, chunk)
+                yield chunk
+
+        return _generator()
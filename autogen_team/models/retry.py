@@ -0,0 +1,264 @@
+"""Retries with backoff and failover to fallback models for model calls."""
+
+import asyncio
+import random
+from dataclasses import dataclass
+from typing import (
+    Any,
+    AsyncGenerator,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from autogen_core import CancellationToken
+from autogen_core.models import (
+    ChatCompletionClient,
+    CreateResult,
+    LLMMessage,
+    RequestUsage,
+)
+from autogen_core.tools import Tool, ToolSchema
+
+from .delegating_client import DelegatingChatCompletionClient
+
+RATE_LIMIT = "rate_limit"
+OVERLOADED = "overloaded"
+EMPTY_RESPONSE = "empty_response"
+CONTEXT_OVERFLOW = "context_overflow"
+INVALID_TOOL_SCHEMA = "invalid_tool_schema"
+INVALID_REQUEST = "invalid_request"
+UNKNOWN = "unknown"
+
+# Worth retrying on the same model
+RETRYABLE = {RATE_LIMIT, OVERLOADED, EMPTY_RESPONSE}
+# Worth trying on a fallback model, once retries are used up
+FAILOVER = RETRYABLE | {INVALID_TOOL_SCHEMA}
+
+_CONTEXT_OVERFLOW_MARKERS = (
+    "context_length_exceeded",
+    "maximum context length",
+    "context window",
+    "prompt is too long",
+    "too many tokens",
+)
+# Errors of providers rejecting the tool definitions, or tool use altogether
+_TOOL_SCHEMA_CODES = {"invalid_function_parameters"}
+_TOOL_SCHEMA_PARAMS = ("tools", "functions", "tool_choice")
+_TOOL_SCHEMA_MARKERS = (
+    "invalid schema for function",
+    "input_schema",
+    "does not support tools",
+    "tools is not supported",
+    "support tool use",
+    "function calling is not supported",
+)
+
+
+def classify_error(error: BaseException) -> str:
+    """
+    Classify an exception from a model call.
+
+    Args:
+        error: Exception raised by the model client
+
+    Returns:
+        One of the error categories defined in this module
+    """
+    status_code = getattr(error, "status_code", None)
+    message = str(error).lower()
+    if status_code == 429:
+        return RATE_LIMIT
+    if status_code is not None and (status_code >= 500 or status_code == 408):
+        return OVERLOADED
+    if status_code in (400, 413, 422):
+        if any(marker in message for marker in _CONTEXT_OVERFLOW_MARKERS):
+            return CONTEXT_OVERFLOW
+        # The OpenAI SDK's errors carry the code and parameter of the error
+        param = getattr(error, "param", None)
+        if (
+            getattr(error, "code", None) in _TOOL_SCHEMA_CODES
+            or (isinstance(param, str) and param.startswith(_TOOL_SCHEMA_PARAMS))
+            or any(marker in message for marker in _TOOL_SCHEMA_MARKERS)
+        ):
+            return INVALID_TOOL_SCHEMA
+        return INVALID_REQUEST
+    if status_code is not None:
+        return INVALID_REQUEST
+    # Connection errors and timeouts from the OpenAI SDK
+    if type(error).__name__ in ("APIConnectionError", "APITimeoutError"):
+        return OVERLOADED
+    # OpenRouter reports upstream failures as a 200 with no choices, which
+    # surfaces as a NoneType error while the response is parsed
+    if isinstance(error, (TypeError, AttributeError)) and "NoneType" in str(error):
+        return EMPTY_RESPONSE
+    return UNKNOWN
+
+
+class ModelCallError(Exception):
+    """A model call that failed on every model it was tried on."""
+
+    def __init__(self, category: str, attempts: int, error: BaseException) -> None:
+        super().__init__(
+            f"{category} after {attempts} attempts: {type(error).__name__}: {error}"
+        )
+        self.category = category
+        self.attempts = attempts
+        self.error = error
+
+
+@dataclass
+class RetryPolicy:
+    """Jittered exponential backoff, per model."""
+
+    max_attempts: int = 4
+    base_delay: float = 1.0
+    max_delay: float = 30.0
+
+    def delay(self, attempt: int) -> float:
+        """Full jitter delay before retry number attempt, counting from 1."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+
+class RetryingChatCompletionClient(DelegatingChatCompletionClient):
+    """
+    Retries failed model calls with backoff, then fails over to fallbacks.
+
+    Errors are classified first. Rate limits, overloaded providers and empty
+    responses are retried on the same model, up to policy.max_attempts times,
+    then the call moves on to the next fallback. Invalid tool schemas move on
+    to the next fallback straight away, as another provider may accept them.
+    Context overflows and other invalid requests fail at once. Failed attempts
+    never reach the caller's conversation.
+    """
+
+    def __init__(
+        self,
+        client: ChatCompletionClient,
+        fallbacks: Optional[List[ChatCompletionClient]] = None,
+        policy: Optional[RetryPolicy] = None,
+    ) -> None:
+        super().__init__(client)
+        self._clients = [client, *(fallbacks or [])]
+        self._policy = policy or RetryPolicy()
+        self.retries = 0
+        self.failovers = 0
+
+    async def _next_attempt(
+        self, error: Exception, client_index: int, attempt: int, failures: int
+    ) -> Tuple[int, int]:
+        """
+        Decide where to send the next attempt after a failure, and wait.
+
+        Args:
+            error: The exception the last attempt failed with
+            client_index: Index of the client the last attempt was sent to
+            attempt: Attempt number on that client, counting from 1
+            failures: Attempts failed so far, on all clients
+
+        Returns:
+            The index of the client and the attempt number to use next
+
+        Raises:
+            ModelCallError: If the call shouldn't be attempted again
+        """
+        category = classify_error(error)
+        if category in RETRYABLE and attempt < self._policy.max_attempts:
+            self.retries += 1
+            delay = self._policy.delay(attempt)
+            print(
+                f"Retrying model call in {delay:.1f}s after {category} "
+                f"({attempt}/{self._policy.max_attempts}): {type(error).__name__}"
+            )
+            await asyncio.sleep(delay)
+            return client_index, attempt + 1
+        if category in FAILOVER and client_index + 1 < len(self._clients):
+            self.failovers += 1
+            print(f"Failing over to fallback model {client_index + 1} after {category}")
+            return client_index + 1, 1
+        raise ModelCallError(category, failures, error) from error
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> CreateResult:
+        client_index, attempt, failures = 0, 1, 0
+        while True:
+            try:
+                return await self._clients[client_index].create(
+                    messages,
+                    tools=tools,
+                    json_output=json_output,
+                    extra_create_args=extra_create_args,
+                    cancellation_token=cancellation_token,
+                )
+            except Exception as e:
+                failures += 1
+                client_index, attempt = await self._next_attempt(
+                    e, client_index, attempt, failures
+                )
+
+    def create_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        async def _generator() -> AsyncGenerator[Union[str, CreateResult], None]:
+            client_index, attempt, failures = 0, 1, 0
+            while True:
+                started = False
+                try:
+                    async for chunk in self._clients[client_index].create_stream(
+                        messages,
+                        tools=tools,
+                        json_output=json_output,
+                        extra_create_args=extra_create_args,
+                        cancellation_token=cancellation_token,
+                    ):
+                        started = True
+                        yield chunk
+                    return
+                except Exception as e:
+                    # Chunks already yielded can't be taken back
+                    if started:
+                        raise
+                    failures += 1
+                    client_index, attempt = await self._next_attempt(
+                        e, client_index, attempt, failures
+                    )
+
+        return _generator()
+
+    async def close(self) -> None:
+        for client in self._clients:
+            await client.close()
+
+    def actual_usage(self) -> RequestUsage:
+        return _sum_usage(client.actual_usage() for client in self._clients)
+
+    def total_usage(self) -> RequestUsage:
+        return _sum_usage(client.total_usage() for client in self._clients)
+
+
+def _sum_usage(usages: Iterable[RequestUsage]) -> RequestUsage:
+    prompt_tokens = 0
+    completion_tokens = 0
+    for usage in usages:
+        prompt_tokens += usage.prompt_tokens
+        completion_tokens += usage.completion_tokens
+    return RequestUsage(
+        prompt_tokens=prompt_tokens, completion_tokens=completion_tokens
+    )
@@ -1,5 +1,7 @@
-from dataclasses import dataclass
-from typing import Any
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from .model_registry import BATCH_PRICE_FACTOR, model_spec
 
 
 @dataclass
@@ -7,9 +9,28 @@ class TokenUsage:
     prompt_tokens: int = 0
     completion_tokens: int = 0
     total_tokens: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    cache_saved_tokens: int = 0
+    cached_prompt_tokens: int = 0
+    cost: float = 0.0
+    # Tokens of models without known prices, which aren't in cost
+    unpriced_tokens: int = 0
+    by_agent: Dict[str, "TokenUsage"] = field(default_factory=dict)
+    by_model: Dict[str, "TokenUsage"] = field(default_factory=dict)
+
+    def update(
+        self, usage: Any, agent: Optional[str] = None, model: Optional[str] = None
+    ) -> None:
+        """
+        Update token counts from RequestUsage object
 
-    def update(self, usage: Any) -> None:
-        """Update token counts from RequestUsage object"""
+        Args:
+            usage: Usage to add
+            agent: Agent the usage is attributed to, if any
+            model: Model that used the tokens, to price them and attribute
+                them to, if known
+        """
         if not usage:
             return
 
@@ -17,9 +38,81 @@ class TokenUsage:
         prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
         completion_tokens = getattr(usage, "completion_tokens", 0) or 0
 
-        self.prompt_tokens += prompt_tokens
-        self.completion_tokens += completion_tokens
-        self.total_tokens += prompt_tokens + completion_tokens
+        for token_usage in self._attributed(agent, model):
+            token_usage.prompt_tokens += prompt_tokens
+            token_usage.completion_tokens += completion_tokens
+            token_usage.total_tokens += prompt_tokens + completion_tokens
+            if model is None:
+                continue
+            spec = model_spec(model)
+            if spec.priced:
+                token_usage.cost += spec.cost(prompt_tokens, completion_tokens)
+            else:
+                token_usage.unpriced_tokens += prompt_tokens + completion_tokens
+
+    def update_cache(self, hits: int, misses: int, saved_tokens: int) -> None:
+        """Add response cache hits and misses, and the tokens hits saved"""
+        self.cache_hits += hits
+        self.cache_misses += misses
+        self.cache_saved_tokens += saved_tokens
+
+    def update_prompt_cache(
+        self,
+        cached_tokens: int,
+        agent: Optional[str] = None,
+        model: Optional[str] = None,
+    ) -> None:
+        """
+        Add prompt tokens the provider read from its prompt cache
+
+        The tokens must already be counted as prompt tokens by update(). If
+        the model is given, their cost is reduced to the cached price.
+        """
+        for token_usage in self._attributed(agent, model):
+            token_usage.cached_prompt_tokens += cached_tokens
+            if model is not None:
+                token_usage.cost += model_spec(model).cost(
+                    cached_tokens, 0, cached_tokens
+                ) - model_spec(model).cost(cached_tokens, 0)
+
+    def update_batched(
+        self, usage: Any, agent: Optional[str] = None, model: Optional[str] = None
+    ) -> None:
+        """
+        Apply the batch API discount to usage already added by update()
+
+        Args:
+            usage: Usage of calls sent through the batch API
+            agent: Agent the usage is attributed to, if any
+            model: Model that used the tokens
+        """
+        if not usage or model is None:
+            return
+        discount = (1 - BATCH_PRICE_FACTOR) * model_spec(model).cost(
+            usage.prompt_tokens, usage.completion_tokens
+        )
+        for token_usage in self._attributed(agent, model):
+            token_usage.cost -= discount
+
+    def _attributed(
+        self, agent: Optional[str], model: Optional[str]
+    ) -> List["TokenUsage"]:
+        """This usage, and the per agent and per model usages to attribute to."""
+        usages = [self]
+        if agent is not None:
+            usages.append(self.by_agent.setdefault(agent, TokenUsage()))
+        if model is not None:
+            usages.append(self.by_model.setdefault(model, TokenUsage()))
+        return usages
 
     def __str__(self) -> str:
-        return f"Tokens: {self.total_tokens} (Prompt: {self.prompt_tokens}, Completion: {self.completion_tokens})"
+        text = f"Tokens: {self.total_tokens} (Prompt: {self.prompt_tokens}, Completion: {self.completion_tokens})"
+        if self.cost or self.unpriced_tokens:
+            text += f" Cost: ${self.cost:.4f}"
+        if self.unpriced_tokens:
+            text += f" (excluding {self.unpriced_tokens} tokens of unpriced models)"
+        if self.cached_prompt_tokens:
+            text += f" Prompt cache: {self.cached_prompt_tokens} cached, {self.prompt_tokens - self.cached_prompt_tokens} uncached prompt tokens"
+        if self.cache_hits or self.cache_misses:
+            text += f" Response cache: {self.cache_hits} hits, {self.cache_misses} misses, {self.cache_saved_tokens} tokens saved"
+        return text
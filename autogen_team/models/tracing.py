@@ -0,0 +1,380 @@
+"""Wire-level latency tracing of model API calls."""
+
+import contextvars
+import json
+import re
+import statistics
+import time
+import zlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import (
+    Any,
+    AsyncGenerator,
+    AsyncIterator,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    TextIO,
+    Union,
+)
+
+import httpx
+from autogen_core import CancellationToken
+from autogen_core.models import ChatCompletionClient, CreateResult, LLMMessage
+from autogen_core.tools import Tool, ToolSchema
+
+from .batch import _CURRENT_EXECUTOR
+from .delegating_client import DelegatingChatCompletionClient
+
+# Top-level fields of OpenRouter responses, in every chunk of a stream. Quotes
+# inside JSON strings are escaped, so message content can't match these.
+_PROVIDER = re.compile(rb'"provider"\s*:\s*"([^"]*)"')
+_MODEL = re.compile(rb'"model"\s*:\s*"([^"]*)"')
+# Both are near the start of a response, stop looking after this many bytes
+_SCAN_LIMIT = 4096
+
+
+@dataclass
+class CallTrace:
+    """
+    Timings and sizes of one HTTP request of a model call.
+
+    The durations add up to total: queue_wait is the time from the call, or
+    its previous attempt, to the request being written, which covers rate
+    limiting, retry backoff and waiting for a pooled connection. connect is
+    TCP and TLS setup, 0 on a reused connection. ttfb runs from writing the
+    request to receiving the response headers. The rest of total is reading
+    the response body.
+    """
+
+    agent: Optional[str]
+    attempt: int
+    start: float
+    request_bytes: int
+    batched: bool
+    queue_wait: float = 0.0
+    connect: float = 0.0
+    ttfb: Optional[float] = None
+    stream: bool = False
+    total: Optional[float] = None
+    status: Optional[int] = None
+    response_bytes: int = 0
+    model: Optional[str] = None
+    provider: Optional[str] = None
+    error: Optional[str] = None
+
+    def to_json(self) -> str:
+        """One compact JSON line, without the fields that weren't measured."""
+        record = {
+            key: round(value, 4) if isinstance(value, float) else value
+            for key, value in self.__dict__.items()
+            if value is not None and value is not False
+        }
+        return json.dumps(record, separators=(",", ":"))
+
+
+class CallTracer:
+    """
+    Writes a trace line per model API request to a JSONL file, and keeps the
+    traces for a per-agent summary. One tracer per run.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        self.traces: List[CallTrace] = []
+        self._file: Optional[TextIO] = None
+
+    def record(self, trace: CallTrace) -> None:
+        self.traces.append(trace)
+        try:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(trace.to_json() + "\n")
+            # Keep the trace of a run that crashes
+            self._file.flush()
+        except OSError as e:
+            print(f"Error writing call trace: {type(e).__name__}: {str(e)}")
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Summarize the traces per agent.
+
+        Returns:
+            Per agent: request and error counts, median and 95th percentile
+            queue wait, time to first byte and total time, bytes sent and
+            received, and requests per upstream provider
+        """
+        by_agent: Dict[str, List[CallTrace]] = {}
+        for trace in self.traces:
+            by_agent.setdefault(trace.agent or "unknown", []).append(trace)
+
+        def percentiles(values: List[float]) -> str:
+            if not values:
+                return "-"
+            if len(values) == 1:
+                return f"{values[0]:.2f}s/{values[0]:.2f}s"
+            p95 = statistics.quantiles(values, n=20, method="inclusive")[-1]
+            return f"{statistics.median(values):.2f}s/{p95:.2f}s"
+
+        summary = {}
+        for agent, traces in by_agent.items():
+            providers: Dict[str, int] = {}
+            for trace in traces:
+                if trace.provider:
+                    providers[trace.provider] = providers.get(trace.provider, 0) + 1
+            summary[agent] = {
+                "requests": len(traces),
+                "errors": sum(
+                    1 for trace in traces if trace.error or (trace.status or 0) >= 400
+                ),
+                "queue_wait": percentiles([trace.queue_wait for trace in traces]),
+                "ttfb": percentiles(
+                    [trace.ttfb for trace in traces if trace.ttfb is not None]
+                ),
+                "total": percentiles(
+                    [trace.total for trace in traces if trace.total is not None]
+                ),
+                "request_bytes": sum(trace.request_bytes for trace in traces),
+                "response_bytes": sum(trace.response_bytes for trace in traces),
+                "providers": providers,
+            }
+        return summary
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+@dataclass
+class _CallContext:
+    """A traced model call, shared by the HTTP requests of its attempts."""
+
+    tracer: CallTracer
+    agent: Optional[str]
+    # When the call started, or its last request ended
+    mark: float = field(default_factory=time.perf_counter)
+    attempts: int = 0
+
+
+# The traced model call running in the current task, for the transport
+_CURRENT_CALL: contextvars.ContextVar[Optional[_CallContext]] = contextvars.ContextVar(
+    "traced_call", default=None
+)
+
+
+class _TracedStream(httpx.AsyncByteStream):
+    """Passes a response body through, measuring it, and records the trace."""
+
+    def __init__(
+        self,
+        stream: httpx.AsyncByteStream,
+        trace: CallTrace,
+        context: _CallContext,
+        started: float,
+        content_encoding: str,
+    ) -> None:
+        self._stream = stream
+        self._trace = trace
+        self._context = context
+        self._started = started
+        self._scanned = b""
+        # The body is read compressed, so decompress what is scanned
+        self._decompressor = (
+            zlib.decompressobj(16 + zlib.MAX_WBITS)
+            if content_encoding == "gzip"
+            else zlib.decompressobj()
+            if content_encoding == "deflate"
+            else None
+        )
+        self._scanning = content_encoding in ("", "identity", "gzip", "deflate")
+        self._recorded = False
+
+    def _scan(self, chunk: bytes) -> None:
+        if self._decompressor is not None:
+            try:
+                chunk = self._decompressor.decompress(chunk, _SCAN_LIMIT)
+            except zlib.error:
+                self._scanning = False
+                return
+        self._scanned += chunk
+        for attribute, pattern in (("provider", _PROVIDER), ("model", _MODEL)):
+            if getattr(self._trace, attribute) is None:
+                match = pattern.search(self._scanned)
+                if match:
+                    setattr(self._trace, attribute, match.group(1).decode())
+        if (self._trace.provider is not None and self._trace.model is not None) or len(
+            self._scanned
+        ) >= _SCAN_LIMIT:
+            self._scanning = False
+            self._scanned = b""
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        try:
+            async for chunk in self._stream:
+                self._trace.response_bytes += len(chunk)
+                if self._scanning:
+                    self._scan(chunk)
+                yield chunk
+        except Exception as e:
+            self._trace.error = type(e).__name__
+            raise
+
+    def _record(self) -> None:
+        if self._recorded:
+            return
+        self._recorded = True
+        now = time.perf_counter()
+        self._trace.total = now - self._started
+        self._context.mark = now
+        self._context.tracer.record(self._trace)
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            self._record()
+
+
+class TracingTransport(httpx.AsyncBaseTransport):
+    """
+    Traces the chat completion requests of a TracingChatCompletionClient.
+
+    Connection setup and request timings come from httpcore's trace
+    extension, so nothing is polled and requests aren't slowed down. Other
+    requests pass through untouched.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport) -> None:
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        context = _CURRENT_CALL.get()
+        if context is None or not request.url.path.endswith("/chat/completions"):
+            return await self._transport.handle_async_request(request)
+
+        context.attempts += 1
+        started = context.mark
+        entered = time.perf_counter()
+        trace = CallTrace(
+            agent=context.agent,
+            attempt=context.attempts,
+            start=time.time() - (entered - started),
+            request_bytes=int(request.headers.get("content-length", 0)),
+            batched=_CURRENT_EXECUTOR.get() is not None,
+        )
+        events: Dict[str, float] = {}
+        previous_trace = request.extensions.get("trace")
+
+        async def on_event(name: str, info: Dict[str, Any]) -> None:
+            # e.g. "connection.connect_tcp.started", "http11.send_request_headers.started"
+            events[name.split(".", 1)[-1]] = time.perf_counter()
+            if previous_trace is not None:
+                await previous_trace(name, info)
+
+        request.extensions["trace"] = on_event
+        try:
+            response = await self._transport.handle_async_request(request)
+        except Exception as e:
+            now = time.perf_counter()
+            trace.error = type(e).__name__
+            trace.queue_wait = entered - started
+            trace.total = now - started
+            context.mark = now
+            context.tracer.record(trace)
+            raise
+        headers_received = time.perf_counter()
+
+        for step in ("connect_tcp", "start_tls"):
+            if f"{step}.complete" in events:
+                trace.connect += events[f"{step}.complete"] - events[f"{step}.started"]
+        sent = events.get("send_request_headers.started", entered + trace.connect)
+        trace.queue_wait = max(0.0, sent - started - trace.connect)
+        trace.ttfb = headers_received - sent
+        trace.status = response.status_code
+        trace.stream = response.headers.get("content-type", "").startswith(
+            "text/event-stream"
+        )
+
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_TracedStream(
+                response.stream,
+                trace,
+                context,
+                started,
+                response.headers.get("content-encoding", "").lower(),
+            ),
+            extensions=response.extensions,
+            request=request,
+        )
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class TracingChatCompletionClient(DelegatingChatCompletionClient):
+    """
+    Traces every HTTP request of an agent's model calls, retries and
+    fallbacks included, to a CallTracer. Calls answered without a request,
+    e.g. from the response cache, aren't traced.
+
+    Needs an HTTP client with a TracingTransport, see create_model_client.
+    """
+
+    def __init__(
+        self, client: ChatCompletionClient, tracer: CallTracer, agent: Optional[str]
+    ) -> None:
+        super().__init__(client)
+        self._tracer = tracer
+        self._agent = agent
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> CreateResult:
+        context_token = _CURRENT_CALL.set(_CallContext(self._tracer, self._agent))
+        try:
+            return await self._client.create(
+                messages,
+                tools=tools,
+                json_output=json_output,
+                extra_create_args=extra_create_args,
+                cancellation_token=cancellation_token,
+            )
+        finally:
+            _CURRENT_CALL.reset(context_token)
+
+    def create_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        async def _generator() -> AsyncGenerator[Union[str, CreateResult], None]:
+            context_token = _CURRENT_CALL.set(_CallContext(self._tracer, self._agent))
+            try:
+                async for chunk in self._client.create_stream(
+                    messages,
+                    tools=tools,
+                    json_output=json_output,
+                    extra_create_args=extra_create_args,
+                    cancellation_token=cancellation_token,
+                ):
+                    yield chunk
+            finally:
+                _CURRENT_CALL.reset(context_token)
+
+        return _generator()
@@ -0,0 +1,206 @@
+import re
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable
+
+from .utils.tokens import count_tokens
+
+_HORIZONTAL_WHITESPACE = re.compile(r"[ \t]+")
+
+
+def normalize_whitespace(text: str) -> str:
+    """
+    Strip indentation and collapse runs of spaces in template text.
+
+    Line breaks are kept, but blank lines at the start and end are removed.
+
+    Args:
+        text: Raw template text
+
+    Returns:
+        Normalized text
+    """
+    lines = [
+        _HORIZONTAL_WHITESPACE.sub(" ", line).strip() for line in text.splitlines()
+    ]
+    return "\n".join(lines).strip()
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """A versioned prompt template with str.format placeholders."""
+
+    name: str
+    version: int
+    text: str
+
+    def render(self, **kwargs: Any) -> str:
+        """Fill the placeholders. Values are inserted as-is, without normalization."""
+        return self.text.format(**kwargs)
+
+    def fixed_text(self) -> str:
+        """The template with empty placeholders, i.e. the fixed overhead it adds."""
+        return self.text.format_map(defaultdict(str))
+
+
+class PromptRegistry:
+    """
+    Registry of the prompt templates used by the team.
+
+    Template text is whitespace-normalized when registered, so templates can be
+    written as indented triple-quoted strings without sending the indentation to
+    the model. Bump a template's version whenever its wording changes, so logs
+    and results can be traced back to the prompt that produced them.
+    """
+
+    def __init__(self) -> None:
+        self._templates: Dict[str, PromptTemplate] = {}
+
+    def register(self, name: str, text: str, version: int = 1) -> PromptTemplate:
+        """
+        Register a template, replacing any existing template with the same name.
+
+        Args:
+            name: Template name
+            text: Template text with str.format placeholders
+            version: Template version
+
+        Returns:
+            The registered template
+        """
+        template = PromptTemplate(name, version, normalize_whitespace(text))
+        self._templates[name] = template
+        return template
+
+    def get(self, name: str) -> PromptTemplate:
+        return self._templates[name]
+
+    def render(self, name: str, **kwargs: Any) -> str:
+        return self._templates[name].render(**kwargs)
+
+    def versions(self) -> Dict[str, int]:
+        return {name: template.version for name, template in self._templates.items()}
+
+    def token_costs(self, models: Iterable[str]) -> Dict[str, Dict[str, int]]:
+        """
+        Count the fixed tokens each template adds to a request, per model.
+
+        Args:
+            models: Model names to count tokens for
+
+        Returns:
+            Mapping of "name@vN" to a mapping of model name to token count
+        """
+        models = list(models)
+        return {
+            f"{name}@v{template.version}": {
+                model: count_tokens(template.fixed_text(), model) for model in models
+            }
+            for name, template in self._templates.items()
+        }
+
+
+PROMPTS = PromptRegistry()
+
+PROMPTS.register(
+    "consultant_system",
+    """
+    You are a helpful assistant with expertise in coding.
+    Your task is to provide another language model with guidance on how to solve a GitHub issue by providing a clear and detailed solution.
+    You should have a codebase already which you can explore.
+    You don't need to download it, just explore it.
+    You have a number of tools at your disposal to help you create this guidance. Use these to explore the codebase.
+    DO NOT RUN ANYTHING WHICH CHANGES THE CODEBASE, ONLY USE THIS TO EXPLORE THE CODEBASE.
+    These tools are:
+    - run_bash_tool: to run commands in the terminal (output truncated to 5000 characters)
+    - open_file: to open a file
+    - search_dir: to search for a file in a directory
+    - search_file: to search for a search term in a file
+    - find_file: to find a file in the current directory
+    - scroll_down: to scroll down in the terminal
+    - scroll_up: to scroll up in the terminal
+    IMPORTANT REQUIREMENTS:
+    You MUST use at least {min_steps} reflection steps before providing a final answer
+    You will be given messages from other agents at the end of each round.
+    You should try to be as critical as possible of the messages you receive, and use your reflection loop to explore alternative solutions.
+    Try to reduce redundant exploration amongst all agents, by summarising what steps you've already taken, in your final answer.
+    Limit your final answer to 500 words, and explicitly mark it with FINAL ANSWER: at the beginning.
+    """,
+)
+
+PROMPTS.register("issue", "GitHub issue to solve: {issue}")
+
+PROMPTS.register(
+    "solver_request",
+    """
+    Can you solve the following GitHub issue?
+    {question}
+    Explain your reasoning. Your final answer should be a general description of the solution, and steps to take to fix the issue.
+    Provide your answer in the form of FINAL ANSWER: [your answer], at the end of your response.
+    """,
+)
+
+PROMPTS.register(
+    "consolidation",
+    """
+    ROUND {round} - New solutions from other agents:
+    {solutions}
+    Using the solutions from other agents as additional information, can you provide your solution to the GitHub issue? The original coding problem is {question}.
+    {history}
+    Using all available information, revise your solution. Your final answer should be an explanation of the solution, in the form of FINAL ANSWER: [your answer], at the end of your response.
+    """,
+)
+
+PROMPTS.register(
+    "final_answer_request",
+    "Please provide your FINAL ANSWER now, starting with 'FINAL ANSWER:'",
+)
+
+PROMPTS.register(
+    "blackboard_digest",
+    """
+    Facts other agents have discovered since your last step (no need to rediscover these):
+    {digest}
+    """,
+)
+
+PROMPTS.register(
+    "text_tool_protocol",
+    """
+    To call a tool, reply with one block per call in exactly this format, and write nothing after the blocks:
+    <tool_call>{{"name": "<tool name>", "arguments": {{<arguments as a JSON object>}}}}</tool_call>
+    Tool results are sent back to you in <tool_result> blocks. The tools you can call are:
+    {tools}
+    """,
+)
+
+PROMPTS.register(
+    "repository_context",
+    """
+    Context gathered from the repository before the discussion started:
+    {context}
+    """,
+)
+
+PROMPTS.register(
+    "synthesis",
+    """
+    Several agents independently proposed solutions to a GitHub issue. Merge them into a single plan for the developer who will implement the fix.
+    - Rank the candidate fixes from most to least likely to be correct, and say how many agents support each.
+    - Keep every file path, function name and line number that the fix depends on.
+    - Keep disagreements between agents explicit, rather than picking one silently.
+    - Leave out exploration history and repeated explanations.
+    Use at most {max_words} words.
+    {solutions}
+    """,
+)
+
+PROMPTS.register(
+    "artifacts_request",
+    """
+    After your final answer, add a machine-readable summary of it for the developer's tools, starting with ARTIFACTS: on its own line, followed by a single JSON object and nothing else:
+    ARTIFACTS:
+    {{"locations": [{{"path": "<file path>", "start_line": <int>, "end_line": <int>, "symbol": "<function or class>"}}], "patches": [{{"path": "<file path>", "diff": "<unified diff hunk>"}}], "tests": ["<test id to run>"]}}
+    Only include locations you have actually looked at, and leave lists empty rather than guessing.
+    """,
+)
@@ -0,0 +1,240 @@
+import hashlib
+import json
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from inspect_ai.util import sandbox
+
+from .utils.tokens import count_tokens
+
+REPO_OUTLINE_SCRIPT_LOCAL = (
+    Path(__file__).parent / "sandbox_scripts" / "repo_outline.py"
+)
+REPO_OUTLINE_SCRIPT_SANDBOX = Path("/tmp/_repo_outline.py")
+
+# Symbols listed per file, for files that are and aren't relevant to the issue
+MAX_SYMBOLS_RELEVANT = 12
+MAX_SYMBOLS_OTHER = 4
+
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+# Words common in issue text that would match unrelated modules and functions
+_STOPWORDS = {
+    "and",
+    "for",
+    "from",
+    "not",
+    "the",
+    "this",
+    "that",
+    "with",
+    "when",
+    "should",
+    "would",
+    "error",
+    "import",
+    "return",
+    "none",
+    "true",
+    "false",
+    "self",
+    "test",
+    "tests",
+    "init",
+    "main",
+    "utils",
+}
+
+
+def issue_identifiers(issue: str) -> Set[str]:
+    """
+    Extract lowercased identifiers from issue text.
+
+    Args:
+        issue: The issue text
+
+    Returns:
+        Identifiers of at least three characters, excluding common words
+    """
+    return {
+        word.lower()
+        for word in _IDENTIFIER.findall(issue)
+        if len(word) >= 3 and word.lower() not in _STOPWORDS
+    }
+
+
+def _module_name(path: str) -> str:
+    return path[: -len(".py")].replace("/", ".") if path.endswith(".py") else path
+
+
+def _leaf(symbol: str) -> str:
+    return symbol.rsplit(".", 1)[-1].lower()
+
+
+def score_file(path: str, symbols: List[str], issue: str, identifiers: Set[str]) -> int:
+    """
+    Score how relevant a module is to an issue.
+
+    Args:
+        path: Path of the module, relative to the repository root
+        symbols: Symbols defined in the module
+        issue: The issue text
+        identifiers: Identifiers extracted from the issue
+
+    Returns:
+        Relevance score, 0 if nothing in the module is mentioned in the issue
+    """
+    score = 0
+    issue_lower = issue.lower()
+    if path.lower() in issue_lower or _module_name(path).lower() in issue_lower:
+        score += 10
+
+    *directories, filename = path.lower().split("/")
+    if filename[: -len(".py")] in identifiers:
+        score += 3
+    score += sum(1 for directory in directories if directory in identifiers)
+    score += 2 * sum(1 for symbol in symbols if _leaf(symbol) in identifiers)
+    return score
+
+
+def rank_files(outline: Dict[str, List[str]], issue: str) -> List[Tuple[str, int]]:
+    """
+    Rank the modules in a repository outline by relevance to an issue.
+
+    Args:
+        outline: Mapping of module path to the symbols it defines
+        issue: The issue text
+
+    Returns:
+        (path, score) pairs, highest score first, then by path
+    """
+    identifiers = issue_identifiers(issue)
+    scores = [
+        (path, score_file(path, symbols, issue, identifiers))
+        for path, symbols in outline.items()
+    ]
+    return sorted(scores, key=lambda item: (-item[1], item[0]))
+
+
+def render_repo_map(
+    outline: Dict[str, List[str]],
+    issue: str,
+    token_budget: int = 1500,
+    model: str = "gpt-4o",
+) -> str:
+    """
+    Render a token-budgeted repository map for an issue.
+
+    Lists the top-level directories, then the modules most relevant to the issue
+    with the symbols it mentions first, then the remaining modules, until the
+    token budget is used up.
+
+    Args:
+        outline: Mapping of module path to the symbols it defines
+        issue: The issue text
+        token_budget: Maximum number of tokens for the map
+        model: Model to count tokens for
+
+    Returns:
+        The repository map, or an empty string if the outline is empty
+    """
+    if not outline:
+        return ""
+
+    identifiers = issue_identifiers(issue)
+    directory_counts: Dict[str, int] = {}
+    for path in outline:
+        top = path.split("/", 1)[0] if "/" in path else "."
+        directory_counts[top] = directory_counts.get(top, 0) + 1
+    directories = ", ".join(
+        f"{directory}/ ({count})"
+        for directory, count in sorted(directory_counts.items())
+    )
+
+    lines = [f"Python modules per top-level directory: {directories}"]
+    tokens = count_tokens(lines[0], model)
+    for path, score in rank_files(outline, issue):
+        if score:
+            symbols = sorted(
+                outline[path], key=lambda symbol: _leaf(symbol) not in identifiers
+            )[:MAX_SYMBOLS_RELEVANT]
+        else:
+            symbols = [symbol for symbol in outline[path] if "." not in symbol]
+            symbols = symbols[:MAX_SYMBOLS_OTHER]
+        line = f"{path}: {', '.join(symbols)}" if symbols else path
+
+        line_tokens = count_tokens(line, model) + 1
+        if tokens + line_tokens > token_budget:
+            break
+        lines.append(line)
+        tokens += line_tokens
+
+    return "\n".join(lines)
+
+
+class RepoOutlineCache:
+    """Caches repository outlines on the host, keyed by repository and commit."""
+
+    def __init__(self, cache_dir: Path) -> None:
+        self._cache_dir = Path(cache_dir).expanduser()
+
+    def _path(self, repo: str, commit: str) -> Path:
+        repo_hash = hashlib.sha1(repo.encode("utf-8")).hexdigest()[:12]
+        return self._cache_dir / f"{repo_hash}_{commit}.json"
+
+    def get(self, repo: str, commit: str) -> Optional[Dict[str, List[str]]]:
+        path = self._path(repo, commit)
+        if not path.exists():
+            return None
+        try:
+            return json.loads(path.read_text())
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def set(self, repo: str, commit: str, outline: Dict[str, List[str]]) -> None:
+        self._cache_dir.mkdir(parents=True, exist_ok=True)
+        self._path(repo, commit).write_text(json.dumps(outline))
+
+
+async def _sandbox_output(command: List[str]) -> str:
+    result = await sandbox().exec(command)
+    return result.stdout.strip() if result.success else ""
+
+
+async def load_repo_outline(
+    cache: Optional[RepoOutlineCache], root: str = "."
+) -> Tuple[Dict[str, List[str]], bool]:
+    """
+    Load the outline of the repository in the sandbox, from the cache if possible.
+
+    Args:
+        cache: Host-side outline cache, or None to always build the outline
+        root: Repository root in the sandbox
+
+    Returns:
+        The outline and whether it came from the cache
+    """
+    repo = await _sandbox_output(
+        ["git", "-C", root, "config", "--get", "remote.origin.url"]
+    )
+    commit = await _sandbox_output(["git", "-C", root, "rev-parse", "HEAD"])
+    if cache is not None and commit:
+        outline = cache.get(repo, commit)
+        if outline is not None:
+            return outline, True
+
+    await sandbox().write_file(
+        REPO_OUTLINE_SCRIPT_SANDBOX.as_posix(),
+        REPO_OUTLINE_SCRIPT_LOCAL.read_text(),
+    )
+    result = await sandbox().exec(
+        ["python3", REPO_OUTLINE_SCRIPT_SANDBOX.as_posix(), root]
+    )
+    if not result.success:
+        raise RuntimeError(f"Failed to build repository outline: {result.stderr}")
+    outline = json.loads(result.stdout)["files"]
+
+    # Only cache outlines of a known commit, uncommitted trees may change
+    if cache is not None and commit:
+        cache.set(repo, commit, outline)
+    return outline, False
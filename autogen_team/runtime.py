@@ -1,3 +1,4 @@
+import asyncio
 from datetime import datetime
 from typing import Dict, List, Any, Awaitable, Callable, Coroutine
 import os
@@ -12,11 +13,34 @@ from autogen_core import (
 
 from .agents.consultant import CodeConsultant
 from .agents.aggregator import CodeConsultantAggregator
+from .data_models.blackboard import Blackboard
 from .data_models.messages import Question
 from .models.token_usage import TokenUsage
-from .models.client_factory import create_model_client
+from .models.client_factory import (
+    create_model_client,
+    needs_model_transport,
+    provider_base_url,
+)
+from .models.client_registry import HTTP_CLIENTS, PoolLimits
+from .models.rate_limiter import RATE_LIMITERS
+from .models.retry import RetryingChatCompletionClient
+from .models.context_window import ContextWindowChatCompletionClient
+from .models.batch import BatchingChatCompletionClient
+from .models.model_registry import UNSUPPORTED, model_spec
+from .models.delegating_client import find_wrapper
+from .models.prompt_caching import PromptCachingChatCompletionClient
+from .models.response_cache import CachedChatCompletionClient
+from .models.tracing import CallTracer
+from .localization import localize_issue, render_localization
+from .prompts import PROMPTS
+from .repo_map import RepoOutlineCache, load_repo_outline, render_repo_map
+from .solution_clustering import SolutionClusterer
+from .tool_executor import ToolExecutor
+from .utils.loop_detection import LoopDetector
+from .utils.reflection_budget import ReflectionBudget
 from .utils.logging import (
     get_agent_log_path,
+    log_message,
     log_missing_question,
     log_question_processing,
     log_agent_registration,
@@ -27,7 +51,18 @@ from .utils.logging import (
     log_debate_complete,
     log_collecting_token_usage,
     log_token_usage,
+    log_token_usage_breakdown,
+    log_batched_calls,
     log_token_usage_error,
+    log_team_steps_saved,
+    log_prompt_token_costs,
+    log_repo_map,
+    log_localization,
+    log_http_clients,
+    log_rate_limits,
+    log_model_call_retries,
+    log_context_trims,
+    log_call_traces,
     log_final_result_retrieval,
 )
 import json
@@ -41,6 +76,7 @@ from inspect_evals.swe_bench.autogen_team.tools import (
     search_dir_tool,
     search_file_tool,
     find_tool,
+    run_tests_tool,
 )
 
 
@@ -62,7 +98,49 @@ async def setup_debate_team() -> Callable[[Dict[str, Any]], Awaitable[Dict[str,
         "log_base_path", "/root/inspect_evals/src/inspect_evals/swe_bench"
     )
     max_reflection_steps = config.get("max_reflection_steps", 10)
+    use_blackboard = config.get("use_blackboard", False)
+    blackboard_digest_facts = config.get("blackboard_digest_facts", 20)
+    adaptive_reflection = config.get("adaptive_reflection")
+    loop_detection = config.get("loop_detection")
+    tool_concurrency = config.get("tool_concurrency")
+    dynamic_tools_config = config.get("dynamic_tools")
+    dynamic_tools = (
+        isinstance(dynamic_tools_config, dict) or dynamic_tools_config is True
+    )
+    prune_tools_when_remaining = (
+        dynamic_tools_config.get("prune_when_remaining")
+        if isinstance(dynamic_tools_config, dict)
+        else None
+    )
     agent_configs = config.get("agents", {})
+    repo_map_config = config.get("repo_map")
+    localization_config = config.get("localization")
+    use_run_tests_tool = config.get("run_tests_tool", False)
+    structured_artifacts = config.get("structured_artifacts", False)
+    aggregation_config = config.get("aggregation") or {}
+    quorum = aggregation_config.get("quorum")
+    early_agreement = aggregation_config.get("early_agreement")
+    deadline_seconds = aggregation_config.get("deadline_seconds")
+    follow_up_grace_seconds = aggregation_config.get("follow_up_grace_seconds", 0)
+    stop_grace_seconds = aggregation_config.get("stop_grace_seconds", 5)
+    synthesis_config = aggregation_config.get("synthesis")
+    http_pool_config = config.get("http_pool")
+    rate_limits = config.get("rate_limits")
+    response_cache_config = config.get("response_cache")
+    batch_config = config.get("batch")
+    call_tracing = config.get("call_tracing", False)
+    pool_limits = (
+        PoolLimits.from_config(http_pool_config)
+        if isinstance(http_pool_config, dict)
+        else PoolLimits()
+    )
+    repo_outline_cache = (
+        RepoOutlineCache(
+            repo_map_config.get("cache_dir", "~/.cache/autogen_team/repo_outlines")
+        )
+        if isinstance(repo_map_config, dict)
+        else None
+    )
 
     async def run_team(sample: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -96,40 +174,264 @@ async def setup_debate_team() -> Callable[[Dict[str, Any]], Awaitable[Dict[str,
             return {"output": "No question provided in the input"}
 
         log_question_processing(run_team_log_path, question_text)
+        log_prompt_token_costs(
+            run_team_log_path,
+            PROMPTS.token_costs(
+                {agent["model"] for agent in agent_configs.values() if "model" in agent}
+            ),
+        )
 
         # Setup tools and agents
         tools = _setup_tools()
+        blackboard = (
+            Blackboard(max_digest_facts=blackboard_digest_facts)
+            if use_blackboard
+            else None
+        )
+        # One executor per sandbox, shared by all consultants
+        tool_executor = (
+            ToolExecutor(tools, max_concurrency=tool_concurrency)
+            if tool_concurrency
+            else None
+        )
 
-        # Register agents with the runtime
-        await _register_agents(
-            runtime,
-            tools,
-            agent_configs,
-            log_base_path,
-            experiment_name,
-            run_team_log_path,
+        # Shared HTTP clients acquired by this run's model clients
+        http_clients: List[Any] = []
+        # Model clients with an HTTP client of their own, closed when the run ends
+        model_clients: List[Any] = []
+        # One trace file per run, next to the team orchestration log
+        tracer = (
+            CallTracer(run_team_log_path.with_suffix(".calls.jsonl"))
+            if call_tracing
+            else None
         )
+        try:
+            # Register agents with the runtime
+            await _register_agents(
+                runtime,
+                tools,
+                agent_configs,
+                log_base_path,
+                experiment_name,
+                run_team_log_path,
+                blackboard,
+                tool_executor,
+                http_clients,
+                model_clients,
+                tracer,
+            )
 
-        # Set up subscriptions
-        await _setup_subscriptions(runtime, run_team_log_path)
+            # Set up subscriptions
+            await _setup_subscriptions(runtime, run_team_log_path)
+
+            # Gather repository context shared by all consultants
+            context = await _build_repo_context(question_text, run_team_log_path)
+
+            # Run the debate
+            print("run debate started")
+            await _run_debate(runtime, question_text, context, run_team_log_path)
+            print("run debate finished")
+        finally:
+            # Model calls are done, hand the connections back to the registry,
+            # and close the connections the registry doesn't own. Closing a
+            # client on a shared HTTP client would close that for everyone
+            for http_client in http_clients:
+                HTTP_CLIENTS.release(http_client)
+            for model_client in model_clients:
+                try:
+                    await model_client.close()
+                except Exception as e:
+                    print(f"Error closing model client: {type(e).__name__}: {str(e)}")
+            if http_pool_config:
+                log_http_clients(
+                    run_team_log_path, HTTP_CLIENTS.created, HTTP_CLIENTS.reused
+                )
+            if rate_limits is not None:
+                log_rate_limits(run_team_log_path, RATE_LIMITERS.stats())
+            if tracer is not None:
+                tracer.close()
+                log_call_traces(run_team_log_path, tracer.path, tracer.summary())
 
-        # Run the debate
-        print("run debate started")
-        await _run_debate(runtime, question_text, run_team_log_path)
-        print("run debate finished")
         # Collect token usage statistics
         team_token_usage = await _collect_token_usage(
             runtime, team_token_usage, run_team_log_path
         )
+        await _collect_steps_saved(runtime, run_team_log_path)
+        await _collect_model_call_retries(runtime, run_team_log_path)
+        await _collect_context_trims(runtime, run_team_log_path)
 
         # Get the final answer
         result = await _get_aggregator_result(runtime, run_team_log_path)
 
+        if structured_artifacts:
+            aggregator = await runtime._get_agent(
+                AgentId("CodeConsultantAggregator", "default")
+            )
+            return {"output": result, "artifacts": aggregator.artifacts}
         return {"output": result}
 
+    async def _build_repo_context(question_text: str, log_path: Path) -> str:
+        """Build the repository context for the first-round prompt, if configured."""
+        sections = await asyncio.gather(
+            _build_repo_map(question_text, log_path),
+            _localize_issue(question_text, log_path),
+        )
+        return "\n\n".join(section for section in sections if section)
+
+    async def _build_repo_map(question_text: str, log_path: Path) -> str:
+        """Build the repository map, if configured."""
+        if not isinstance(repo_map_config, dict):
+            return ""
+
+        try:
+            outline, from_cache = await load_repo_outline(
+                repo_outline_cache, root=repo_map_config.get("root", ".")
+            )
+            repo_map = render_repo_map(
+                outline,
+                question_text,
+                token_budget=repo_map_config.get("token_budget", 1500),
+            )
+            log_repo_map(log_path, len(outline), from_cache, repo_map)
+            return repo_map
+        except Exception as e:
+            print(f"Error building repository map: {type(e).__name__}: {str(e)}")
+            log_message(
+                log_path, f"Error building repository map: {type(e).__name__}: {str(e)}"
+            )
+            return ""
+
+    async def _localize_issue(question_text: str, log_path: Path) -> str:
+        """Pre-fetch the code regions most likely related to the issue, if configured."""
+        if not isinstance(localization_config, dict):
+            return ""
+
+        try:
+            files = await localize_issue(
+                question_text,
+                root=localization_config.get("root", "."),
+                top_k=localization_config.get("top_k", 5),
+                context_lines=localization_config.get("context_lines", 8),
+                max_regions=localization_config.get("max_regions", 2),
+            )
+            log_localization(log_path, files)
+            return render_localization(
+                files, token_budget=localization_config.get("token_budget", 2000)
+            )
+        except Exception as e:
+            print(f"Error localizing issue: {type(e).__name__}: {str(e)}")
+            log_message(
+                log_path, f"Error localizing issue: {type(e).__name__}: {str(e)}"
+            )
+            return ""
+
+    def _create_reflection_budget() -> ReflectionBudget:
+        """Create a reflection budget for one consultant, adaptive if configured."""
+        if not adaptive_reflection:
+            return ReflectionBudget(max_reflection_steps)
+
+        return ReflectionBudget(
+            max_reflection_steps,
+            min_steps=adaptive_reflection.get("min_steps", 5),
+            max_steps=adaptive_reflection.get("max_steps", max_reflection_steps),
+            adaptive=True,
+            patience=adaptive_reflection.get("patience", 3),
+            extension=adaptive_reflection.get("extension", 5),
+            stability_threshold=adaptive_reflection.get("stability_threshold", 0.8),
+        )
+
+    def _create_solution_clusterer() -> SolutionClusterer | None:
+        """Create a solution clusterer for the aggregator, if configured."""
+        if not aggregation_config.get("cluster_solutions"):
+            return None
+
+        return SolutionClusterer(
+            similarity_threshold=aggregation_config.get("similarity_threshold", 0.5),
+            reference_weight=aggregation_config.get("reference_weight", 0.5),
+            max_details=aggregation_config.get("max_details", 5),
+        )
+
+    def _create_loop_detector() -> LoopDetector | None:
+        """Create a loop detector for one consultant, if configured."""
+        if not loop_detection:
+            return None
+
+        return LoopDetector(
+            max_loop_hits=loop_detection.get("max_loop_hits", 3),
+            max_cycle_length=loop_detection.get("max_cycle_length", 3),
+        )
+
+    def _create_model_client(
+        model_config: Dict[str, Any],
+        http_clients: List[Any],
+        model_clients: List[Any],
+        batch: Dict[str, Any] | None = None,
+        tracer: CallTracer | None = None,
+        agent: str | None = None,
+    ) -> Any:
+        """
+        Create a model client, on a shared HTTP client if http_pool is set or
+        the client needs the model transports. When the debate ends, run_team
+        releases the shared clients and closes the model clients that have an
+        HTTP client of their own.
+        """
+        if not http_pool_config and not needs_model_transport(
+            model_config, batch, tracer
+        ):
+            client = create_model_client(
+                model_config,
+                rate_limits=rate_limits,
+                response_cache=response_cache_config,
+                batch=batch,
+                tracer=tracer,
+                agent=agent,
+            )
+            model_clients.append(client)
+            return client
+        http_client = HTTP_CLIENTS.acquire(
+            model_config.get("provider", "openai"),
+            provider_base_url(model_config),
+            pool_limits,
+        )
+        http_clients.append(http_client)
+        return create_model_client(
+            model_config,
+            http_client=http_client,
+            rate_limits=rate_limits,
+            response_cache=response_cache_config,
+            batch=batch,
+            tracer=tracer,
+            agent=agent,
+        )
+
+    def _tool_protocol(agent_config: Dict[str, Any]) -> str:
+        """The agent's tool protocol, text for models that can't call functions."""
+        if "tool_protocol" in agent_config:
+            return agent_config["tool_protocol"]
+        spec = model_spec(agent_config.get("model", "gpt-4o-mini"), agent_config)
+        return "text" if spec.function_calling == UNSUPPORTED else "native"
+
+    def _model_usages(client: Any, model_config: Dict[str, Any]) -> List[Any]:
+        """Token usage of a model client per model, fallbacks included."""
+        model = model_config.get("model", "gpt-4o-mini")
+        retrying_client = find_wrapper(client, RetryingChatCompletionClient)
+        if retrying_client is None:
+            return [(model, client.total_usage())]
+        models = [
+            model,
+            *(
+                fallback.get("model", model)
+                for fallback in model_config.get("fallbacks", [])
+            ),
+        ]
+        return [
+            (fallback_model, fallback_client.total_usage())
+            for fallback_model, fallback_client in zip(models, retrying_client._clients)
+        ]
+
     def _setup_tools() -> List[Any]:
         """Set up the tools needed by the consultant agents."""
-        return [
+        tools = [
             run_bash_tool,
             open_tool,
             scroll_down_tool,
@@ -138,6 +440,9 @@ async def setup_debate_team() -> Callable[[Dict[str, Any]], Awaitable[Dict[str,
             search_file_tool,
             find_tool,
         ]
+        if use_run_tests_tool:
+            tools.append(run_tests_tool)
+        return tools
 
     async def _register_agents(
         runtime: SingleThreadedAgentRuntime,
@@ -146,6 +451,11 @@ async def setup_debate_team() -> Callable[[Dict[str, Any]], Awaitable[Dict[str,
         log_base_path: str,
         experiment_name: str,
         run_team_log_path: Path,
+        blackboard: Blackboard | None,
+        tool_executor: ToolExecutor | None,
+        http_clients: List[Any],
+        model_clients: List[Any],
+        tracer: CallTracer | None,
     ) -> None:
         """Register all agent instances with the runtime."""
         log_agent_registration(run_team_log_path)
@@ -155,7 +465,17 @@ async def setup_debate_team() -> Callable[[Dict[str, Any]], Awaitable[Dict[str,
             runtime,
             "CodeConsultantA",
             lambda: CodeConsultant(
-                model_client=create_model_client(agent_configs["agent_A"]),
+                model_client=_create_model_client(
+                    agent_configs["agent_A"],
+                    http_clients,
+                    model_clients,
+                    batch=batch_config,
+                    tracer=tracer,
+                    agent="CodeConsultantA",
+                ),
+                stream=agent_configs["agent_A"].get("stream", False),
+                tool_protocol=_tool_protocol(agent_configs["agent_A"]),
+                structured_artifacts=structured_artifacts,
                 topic_type="CodeConsultantA",
                 num_neighbors=2,
                 max_round=3,
@@ -163,6 +483,12 @@ async def setup_debate_team() -> Callable[[Dict[str, Any]], Awaitable[Dict[str,
                 max_reflection_steps=max_reflection_steps,
                 log_base_path=log_base_path,
                 experiment_name=experiment_name,
+                blackboard=blackboard,
+                reflection_budget=_create_reflection_budget(),
+                loop_detector=_create_loop_detector(),
+                tool_executor=tool_executor,
+                dynamic_tools=dynamic_tools,
+                prune_tools_when_remaining=prune_tools_when_remaining,
             ),
         )
 
@@ -170,7 +496,17 @@ async def setup_debate_team() -> Callable[[Dict[str, Any]], Awaitable[Dict[str,
             runtime,
             "CodeConsultantB",
             lambda: CodeConsultant(
-                model_client=create_model_client(agent_configs["agent_B"]),
+                model_client=_create_model_client(
+                    agent_configs["agent_B"],
+                    http_clients,
+                    model_clients,
+                    batch=batch_config,
+                    tracer=tracer,
+                    agent="CodeConsultantB",
+                ),
+                stream=agent_configs["agent_B"].get("stream", False),
+                tool_protocol=_tool_protocol(agent_configs["agent_B"]),
+                structured_artifacts=structured_artifacts,
                 topic_type="CodeConsultantB",
                 num_neighbors=2,
                 max_round=3,
@@ -178,6 +514,12 @@ async def setup_debate_team() -> Callable[[Dict[str, Any]], Awaitable[Dict[str,
                 max_reflection_steps=max_reflection_steps,
                 log_base_path=log_base_path,
                 experiment_name=experiment_name,
+                blackboard=blackboard,
+                reflection_budget=_create_reflection_budget(),
+                loop_detector=_create_loop_detector(),
+                tool_executor=tool_executor,
+                dynamic_tools=dynamic_tools,
+                prune_tools_when_remaining=prune_tools_when_remaining,
             ),
         )
 
@@ -185,7 +527,17 @@ async def setup_debate_team() -> Callable[[Dict[str, Any]], Awaitable[Dict[str,
             runtime,
             "CodeConsultantC",
             lambda: CodeConsultant(
-                model_client=create_model_client(agent_configs["agent_C"]),
+                model_client=_create_model_client(
+                    agent_configs["agent_C"],
+                    http_clients,
+                    model_clients,
+                    batch=batch_config,
+                    tracer=tracer,
+                    agent="CodeConsultantC",
+                ),
+                stream=agent_configs["agent_C"].get("stream", False),
+                tool_protocol=_tool_protocol(agent_configs["agent_C"]),
+                structured_artifacts=structured_artifacts,
                 topic_type="CodeConsultantC",
                 num_neighbors=2,
                 max_round=3,
@@ -193,6 +545,12 @@ async def setup_debate_team() -> Callable[[Dict[str, Any]], Awaitable[Dict[str,
                 max_reflection_steps=max_reflection_steps,
                 log_base_path=log_base_path,
                 experiment_name=experiment_name,
+                blackboard=blackboard,
+                reflection_budget=_create_reflection_budget(),
+                loop_detector=_create_loop_detector(),
+                tool_executor=tool_executor,
+                dynamic_tools=dynamic_tools,
+                prune_tools_when_remaining=prune_tools_when_remaining,
             ),
         )
 
@@ -200,7 +558,17 @@ async def setup_debate_team() -> Callable[[Dict[str, Any]], Awaitable[Dict[str,
             runtime,
             "CodeConsultantD",
             lambda: CodeConsultant(
-                model_client=create_model_client(agent_configs["agent_D"]),
+                model_client=_create_model_client(
+                    agent_configs["agent_D"],
+                    http_clients,
+                    model_clients,
+                    batch=batch_config,
+                    tracer=tracer,
+                    agent="CodeConsultantD",
+                ),
+                stream=agent_configs["agent_D"].get("stream", False),
+                tool_protocol=_tool_protocol(agent_configs["agent_D"]),
+                structured_artifacts=structured_artifacts,
                 topic_type="CodeConsultantD",
                 num_neighbors=2,
                 max_round=3,
@@ -208,6 +576,12 @@ async def setup_debate_team() -> Callable[[Dict[str, Any]], Awaitable[Dict[str,
                 max_reflection_steps=max_reflection_steps,
                 log_base_path=log_base_path,
                 experiment_name=experiment_name,
+                blackboard=blackboard,
+                reflection_budget=_create_reflection_budget(),
+                loop_detector=_create_loop_detector(),
+                tool_executor=tool_executor,
+                dynamic_tools=dynamic_tools,
+                prune_tools_when_remaining=prune_tools_when_remaining,
             ),
         )
 
@@ -219,6 +593,21 @@ async def setup_debate_team() -> Callable[[Dict[str, Any]], Awaitable[Dict[str,
                 num_solvers=4,
                 log_base_path=log_base_path,
                 experiment_name=experiment_name,
+                clusterer=_create_solution_clusterer(),
+                quorum=quorum,
+                early_agreement=early_agreement,
+                synthesis_client=(
+                    _create_model_client(
+                        synthesis_config,
+                        http_clients,
+                        model_clients,
+                        tracer=tracer,
+                        agent="CodeConsultantAggregator",
+                    )
+                    if synthesis_config
+                    else None
+                ),
+                synthesis_token_budget=(synthesis_config or {}).get("max_tokens", 800),
             ),
         )
 
@@ -261,7 +650,10 @@ async def setup_debate_team() -> Callable[[Dict[str, Any]], Awaitable[Dict[str,
         )
 
     async def _run_debate(
-        runtime: SingleThreadedAgentRuntime, question_text: str, log_path: Path
+        runtime: SingleThreadedAgentRuntime,
+        question_text: str,
+        context: str,
+        log_path: Path,
     ) -> None:
         """Run the debate by starting the runtime and publishing the question."""
         log_debate_starting(log_path)
@@ -270,16 +662,74 @@ async def setup_debate_team() -> Callable[[Dict[str, Any]], Awaitable[Dict[str,
         runtime.start()
 
         # Publish the initial question
-        await runtime.publish_message(Question(content=question_text), DefaultTopicId())
+        await runtime.publish_message(
+            Question(content=question_text, context=context), DefaultTopicId()
+        )
 
         log_question_published(log_path)
 
         # Wait for processing to complete
         log_waiting_for_idle(log_path)
 
-        await runtime.stop_when_idle()
+        if not (quorum or early_agreement or deadline_seconds):
+            await runtime.stop_when_idle()
+            log_debate_complete(log_path)
+            return
 
-        log_debate_complete(log_path)
+        # Finish when the runtime is idle, the aggregator has published its
+        # answer, or the deadline passes, whichever comes first
+        aggregator = await runtime._get_agent(
+            AgentId("CodeConsultantAggregator", "default")
+        )
+        idle = asyncio.ensure_future(runtime.stop_when_idle())
+        finalized = asyncio.ensure_future(aggregator.finalized.wait())
+        await asyncio.wait(
+            [idle, finalized],
+            timeout=deadline_seconds,
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+        if not idle.done():
+            if not finalized.done():
+                log_message(log_path, f"Deadline of {deadline_seconds}s reached")
+                await aggregator.finalize("deadline")
+                # Returns early if a synthesis was already in flight, wait for it
+                await aggregator.finalized.wait()
+            elif follow_up_grace_seconds:
+                # Give the remaining consultants a chance to add follow-ups
+                await asyncio.wait([idle], timeout=follow_up_grace_seconds)
+        finalized.cancel()
+
+        if idle.done():
+            log_debate_complete(log_path)
+            return
+
+        # Stop the remaining consultants and the runtime without waiting for idle
+        idle.cancel()
+        for agent_type in [
+            "CodeConsultantA",
+            "CodeConsultantB",
+            "CodeConsultantC",
+            "CodeConsultantD",
+        ]:
+            agent = await runtime._get_agent(AgentId(agent_type, "default"))
+            if isinstance(agent, CodeConsultant):
+                agent.request_stop()
+        await runtime.stop()
+
+        # Handlers still running have a model or tool call in flight. Give them
+        # a moment to reach the next step, then cancel them, so nothing uses the
+        # model clients once usage is collected and the HTTP clients released
+        handlers = set(runtime._background_tasks)
+        if handlers:
+            _, pending = await asyncio.wait(handlers, timeout=stop_grace_seconds)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            if pending:
+                log_message(
+                    log_path, f"Cancelled {len(pending)} unfinished consultant steps"
+                )
+        log_message(log_path, "Runtime stopped after the team answer was finalized")
 
     async def _collect_token_usage(
         runtime: SingleThreadedAgentRuntime,
@@ -290,28 +740,72 @@ async def setup_debate_team() -> Callable[[Dict[str, Any]], Awaitable[Dict[str,
         log_collecting_token_usage(log_path)
 
         try:
-            # Get references to all consultant agents
-            consultantA = await runtime._get_agent(
-                AgentId("CodeConsultantA", "default")
-            )
-            consultantB = await runtime._get_agent(
-                AgentId("CodeConsultantB", "default")
-            )
-            consultantC = await runtime._get_agent(
-                AgentId("CodeConsultantC", "default")
-            )
-            consultantD = await runtime._get_agent(
-                AgentId("CodeConsultantD", "default")
+            # Collect token usage from each agent, per model
+            batched_calls = {}
+            for agent_type, agent_key in [
+                ("CodeConsultantA", "agent_A"),
+                ("CodeConsultantB", "agent_B"),
+                ("CodeConsultantC", "agent_C"),
+                ("CodeConsultantD", "agent_D"),
+            ]:
+                agent = await runtime._get_agent(AgentId(agent_type, "default"))
+                if not (
+                    isinstance(agent, CodeConsultant)
+                    and hasattr(agent, "_model_client")
+                ):
+                    continue
+                model_config = agent_configs[agent_key]
+                model = model_config.get("model", "gpt-4o-mini")
+                for usage_model, usage in _model_usages(
+                    agent._model_client, model_config
+                ):
+                    team_token_usage.update(usage, agent_type, usage_model)
+                # Estimates for cut-off streams and cached prompt tokens are
+                # put on the primary model
+                team_token_usage.update(agent.estimated_usage, agent_type, model)
+                cached_client = find_wrapper(
+                    agent._model_client, CachedChatCompletionClient
+                )
+                if cached_client is not None:
+                    team_token_usage.update_cache(
+                        cached_client.hits,
+                        cached_client.misses,
+                        cached_client.saved_tokens,
+                    )
+                prompt_caching_client = find_wrapper(
+                    agent._model_client, PromptCachingChatCompletionClient
+                )
+                if prompt_caching_client is not None:
+                    team_token_usage.update_prompt_cache(
+                        prompt_caching_client.stats.cached_tokens, agent_type, model
+                    )
+                batching_client = find_wrapper(
+                    agent._model_client, BatchingChatCompletionClient
+                )
+                if batching_client is not None:
+                    team_token_usage.update_batched(
+                        batching_client.batched_usage, agent_type, model
+                    )
+                    batched_calls[agent_type] = (
+                        batching_client.batched,
+                        batching_client.calls,
+                    )
+
+            aggregator = await runtime._get_agent(
+                AgentId("CodeConsultantAggregator", "default")
             )
-
-            # Collect token usage from each agent
-            for agent in [consultantA, consultantB, consultantC, consultantD]:
-                if isinstance(agent, CodeConsultant) and hasattr(
-                    agent, "_model_client"
+            if getattr(aggregator, "_synthesis_client", None) is not None:
+                for usage_model, usage in _model_usages(
+                    aggregator._synthesis_client, synthesis_config
                 ):
-                    team_token_usage.update(agent._model_client.total_usage())
+                    team_token_usage.update(
+                        usage, "CodeConsultantAggregator", usage_model
+                    )
 
             log_token_usage(log_path, team_token_usage)
+            log_token_usage_breakdown(log_path, team_token_usage)
+            if batched_calls:
+                log_batched_calls(log_path, batched_calls)
 
         except Exception as e:
             print(f"Error during token usage collection: {type(e).__name__}: {str(e)}")
@@ -319,6 +813,84 @@ async def setup_debate_team() -> Callable[[Dict[str, Any]], Awaitable[Dict[str,
 
         return team_token_usage
 
+    async def _collect_steps_saved(
+        runtime: SingleThreadedAgentRuntime, log_path: Path
+    ) -> None:
+        """Log the reflection steps each consultant saved on this sample."""
+        try:
+            steps_saved = {}
+            for agent_type in [
+                "CodeConsultantA",
+                "CodeConsultantB",
+                "CodeConsultantC",
+                "CodeConsultantD",
+            ]:
+                agent = await runtime._get_agent(AgentId(agent_type, "default"))
+                if isinstance(agent, CodeConsultant):
+                    steps_saved[agent_type] = agent._budget.total_steps_saved
+
+            log_team_steps_saved(log_path, steps_saved)
+
+        except Exception as e:
+            print(f"Error during steps saved collection: {type(e).__name__}: {str(e)}")
+
+    async def _collect_model_call_retries(
+        runtime: SingleThreadedAgentRuntime, log_path: Path
+    ) -> None:
+        """Log the model call retries and failovers of each consultant."""
+        try:
+            retries = {}
+            for agent_type in [
+                "CodeConsultantA",
+                "CodeConsultantB",
+                "CodeConsultantC",
+                "CodeConsultantD",
+            ]:
+                agent = await runtime._get_agent(AgentId(agent_type, "default"))
+                if not isinstance(agent, CodeConsultant):
+                    continue
+                retrying_client = find_wrapper(
+                    agent._model_client, RetryingChatCompletionClient
+                )
+                if retrying_client is not None:
+                    retries[agent_type] = (
+                        retrying_client.retries,
+                        retrying_client.failovers,
+                    )
+
+            if retries:
+                log_model_call_retries(log_path, retries)
+
+        except Exception as e:
+            print(f"Error during retry collection: {type(e).__name__}: {str(e)}")
+
+    async def _collect_context_trims(
+        runtime: SingleThreadedAgentRuntime, log_path: Path
+    ) -> None:
+        """Log the model calls of each consultant trimmed to fit the context window."""
+        try:
+            trims = {}
+            for agent_type in [
+                "CodeConsultantA",
+                "CodeConsultantB",
+                "CodeConsultantC",
+                "CodeConsultantD",
+            ]:
+                agent = await runtime._get_agent(AgentId(agent_type, "default"))
+                if not isinstance(agent, CodeConsultant):
+                    continue
+                context_client = find_wrapper(
+                    agent._model_client, ContextWindowChatCompletionClient
+                )
+                if context_client is not None and context_client.trims:
+                    trims[agent_type] = context_client.trims
+
+            if trims:
+                log_context_trims(log_path, trims)
+
+        except Exception as e:
+            print(f"Error during context trim collection: {type(e).__name__}: {str(e)}")
+
     async def _get_aggregator_result(
         runtime: SingleThreadedAgentRuntime, log_path: Path
     ) -> str:
@@ -335,6 +907,14 @@ async def setup_debate_team() -> Callable[[Dict[str, Any]], Awaitable[Dict[str,
             else "No answer found"
         )
 
+        follow_up_answers = getattr(aggregator, "follow_up_answers", [])
+        if follow_up_answers:
+            result += (
+                "\n\n## Solutions received after the answer above was published:\n\n"
+            )
+            for i, answer in enumerate(follow_up_answers, 1):
+                result += f"### Late solution {i}:\n{answer}\n\n"
+
         log_final_result_retrieval(log_path, len(result))
 
         return result
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# mypy: ignore-errors
+
+"""Find the code regions most likely related to an issue, and print them as JSON
+
+Runs inside the sandbox, with whichever Python the image provides, so it only
+uses the standard library and avoids newer syntax.
+
+Usage:
+    python localize.py <issue_file> <repo_root> <top_k> <context_lines> <max_regions>
+
+Files are scored with BM25 over identifier tokens, where identifiers are also
+split into their snake_case and CamelCase parts. Files appearing in traceback
+frames or mentioned by path in the issue are ranked first. For each of the
+top_k files, up to max_regions windows of context_lines lines either side of
+the traceback lines or the lines matching the most issue terms are returned.
+
+Prints {"files": [{"path", "score", "regions": [{"start", "end", "text"}]}]}
+"""
+
+import json
+import math
+import os
+import re
+import subprocess
+import sys
+
+K1 = 1.2
+B = 0.75
+SKIP_DIRS = {".git", ".tox", "node_modules", "build", "dist", "__pycache__"}
+STOPWORDS = {
+    "and",
+    "are",
+    "but",
+    "for",
+    "from",
+    "has",
+    "have",
+    "not",
+    "the",
+    "this",
+    "that",
+    "was",
+    "with",
+    "when",
+    "self",
+    "return",
+    "import",
+    "none",
+    "true",
+    "false",
+}
+
+IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+CAMEL_PART = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+TRACEBACK_FRAME = re.compile(r'File "([^"]+\.py)", line (\d+)')
+PATH_MENTION = re.compile(r"([\w./-]+\.py)(?::(\d+))?")
+
+
+def tokenize(text):
+    """Lowercased identifiers and their snake_case and CamelCase parts."""
+    tokens = []
+    for word in IDENTIFIER.findall(text):
+        parts = [word]
+        for piece in word.split("_"):
+            parts.extend(CAMEL_PART.findall(piece))
+        for part in set(parts):
+            part = part.lower()
+            if len(part) >= 3 and part not in STOPWORDS:
+                tokens.append(part)
+    return tokens
+
+
+def list_python_files(root):
+    """List tracked Python files, falling back to walking the tree."""
+    try:
+        output = subprocess.check_output(
+            ["git", "ls-files", "*.py"], cwd=root, stderr=subprocess.DEVNULL
+        )
+        files = output.decode("utf-8", "replace").splitlines()
+        if files:
+            return files
+    except (OSError, subprocess.CalledProcessError):
+        pass
+
+    files = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [name for name in dirnames if name not in SKIP_DIRS]
+        for filename in filenames:
+            if filename.endswith(".py"):
+                files.append(os.path.relpath(os.path.join(dirpath, filename), root))
+    return files
+
+
+def match_repo_file(path, files_by_suffix):
+    """Match a path from the issue, possibly absolute, to a repository file."""
+    parts = path.replace("\\", "/").split("/")
+    for start in range(len(parts)):
+        match = files_by_suffix.get("/".join(parts[start:]))
+        if match:
+            return match
+    return None
+
+
+def mentioned_lines(issue, files):
+    """Repository files referenced by traceback frames or paths, with line numbers."""
+    files_by_suffix = {}
+    for path in files:
+        parts = path.split("/")
+        for start in range(len(parts)):
+            files_by_suffix.setdefault("/".join(parts[start:]), path)
+
+    mentions = {}
+    for path, line in TRACEBACK_FRAME.findall(issue):
+        match = match_repo_file(path, files_by_suffix)
+        if match:
+            mentions.setdefault(match, []).append(int(line))
+    for path, line in PATH_MENTION.findall(issue):
+        # Bare file names are too ambiguous, require a directory
+        if "/" not in path:
+            continue
+        match = match_repo_file(path, files_by_suffix)
+        if match:
+            lines = mentions.setdefault(match, [])
+            if line:
+                lines.append(int(line))
+    return mentions
+
+
+def best_regions(lines, query_weights, frame_lines, context_lines, max_regions):
+    """Pick non-overlapping windows around frame lines or the best-matching lines."""
+    if frame_lines:
+        centers = sorted(set(frame_lines), reverse=True)
+    else:
+        scored = []
+        for index, line in enumerate(lines):
+            score = sum(query_weights.get(token, 0.0) for token in set(tokenize(line)))
+            if score > 0:
+                scored.append((score, index + 1))
+        centers = [number for _, number in sorted(scored, reverse=True)]
+
+    regions = []
+    for center in centers:
+        if len(regions) >= max_regions:
+            break
+        start = max(1, center - context_lines)
+        end = min(len(lines), center + context_lines)
+        if any(start <= r_end and end >= r_start for r_start, r_end in regions):
+            continue
+        regions.append((start, end))
+
+    return [
+        {
+            "start": start,
+            "end": end,
+            "text": "\n".join(
+                "%d:%s" % (number, lines[number - 1].rstrip())
+                for number in range(start, end + 1)
+            ),
+        }
+        for start, end in sorted(regions)
+    ]
+
+
+def main():
+    issue_path, root = sys.argv[1], sys.argv[2]
+    top_k, context_lines, max_regions = (int(arg) for arg in sys.argv[3:6])
+    with open(issue_path, encoding="utf-8", errors="replace") as f:
+        issue = f.read()
+
+    files = list_python_files(root)
+    documents = {}
+    for path in files:
+        try:
+            with open(
+                os.path.join(root, path), encoding="utf-8", errors="replace"
+            ) as f:
+                content = f.read()
+        except OSError:
+            continue
+        # Count path tokens twice, module names are strong evidence
+        tokens = tokenize(content) + 2 * tokenize(path.replace("/", " "))
+        counts = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        documents[path] = (counts, len(tokens), content)
+
+    query = set(tokenize(issue))
+    if not documents:
+        json.dump({"files": []}, sys.stdout)
+        return
+
+    document_frequency = {}
+    for counts, _, _ in documents.values():
+        for token in query:
+            if token in counts:
+                document_frequency[token] = document_frequency.get(token, 0) + 1
+    total = len(documents)
+    average_length = sum(length for _, length, _ in documents.values()) / total
+    idf = {
+        token: math.log(1 + (total - df + 0.5) / (df + 0.5))
+        for token, df in document_frequency.items()
+    }
+
+    scores = {}
+    for path, (counts, length, _) in documents.items():
+        score = 0.0
+        for token, weight in idf.items():
+            frequency = counts.get(token, 0)
+            if frequency:
+                score += (
+                    weight
+                    * frequency
+                    * (K1 + 1)
+                    / (frequency + K1 * (1 - B + B * length / average_length))
+                )
+        if score > 0:
+            scores[path] = score
+
+    # Files named in tracebacks or by path go first
+    mentions = mentioned_lines(issue, list(documents))
+    top_score = max(scores.values()) if scores else 0.0
+    for path in mentions:
+        scores[path] = scores.get(path, 0.0) + top_score + 1.0
+
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:top_k]
+    results = []
+    for path, score in ranked:
+        lines = documents[path][2].splitlines()
+        results.append(
+            {
+                "path": path,
+                "score": round(score, 3),
+                "regions": best_regions(
+                    lines, idf, mentions.get(path, []), context_lines, max_regions
+                ),
+            }
+        )
+    json.dump({"files": results}, sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
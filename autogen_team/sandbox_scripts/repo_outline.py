@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# mypy: ignore-errors
+
+"""Print an outline of the Python modules in a repository as JSON
+
+Runs inside the sandbox, with whichever Python the image provides, so it only
+uses the standard library and avoids newer syntax.
+
+Usage:
+    python repo_outline.py <repo_root>
+
+Prints {"files": {<path>: [<symbol>, ...]}} where symbols are the top-level
+classes and functions of each module, plus public methods as Class.method.
+Files that fail to parse are listed with no symbols.
+"""
+
+import ast
+import json
+import os
+import subprocess
+import sys
+
+SKIP_DIRS = {".git", ".tox", "node_modules", "build", "dist", "__pycache__"}
+
+
+def list_python_files(root):
+    """List tracked Python files, falling back to walking the tree."""
+    try:
+        output = subprocess.check_output(
+            ["git", "ls-files", "*.py"], cwd=root, stderr=subprocess.DEVNULL
+        )
+        files = output.decode("utf-8", "replace").splitlines()
+        if files:
+            return sorted(files)
+    except (OSError, subprocess.CalledProcessError):
+        pass
+
+    files = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [name for name in dirnames if name not in SKIP_DIRS]
+        for filename in filenames:
+            if filename.endswith(".py"):
+                path = os.path.join(dirpath, filename)
+                files.append(os.path.relpath(path, root))
+    return sorted(files)
+
+
+def module_symbols(path):
+    """Top-level classes, functions and public methods of a module."""
+    with open(path, "rb") as f:
+        tree = ast.parse(f.read(), filename=path)
+
+    symbols = []
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            symbols.append(node.name)
+        elif isinstance(node, ast.ClassDef):
+            symbols.append(node.name)
+            for item in node.body:
+                if isinstance(
+                    item, (ast.FunctionDef, ast.AsyncFunctionDef)
+                ) and not item.name.startswith("_"):
+                    symbols.append(node.name + "." + item.name)
+    return symbols
+
+
+def main():
+    root = sys.argv[1] if len(sys.argv) > 1 else "."
+    outline = {}
+    for relpath in list_python_files(root):
+        try:
+            outline[relpath] = module_symbols(os.path.join(root, relpath))
+        except (SyntaxError, ValueError, OSError):
+            outline[relpath] = []
+    json.dump({"files": outline}, sys.stdout, separators=(",", ":"))
+
+
+if __name__ == "__main__":
+    main()
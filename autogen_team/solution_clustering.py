@@ -0,0 +1,264 @@
+import hashlib
+import random
+import re
+from dataclasses import dataclass, field
+from typing import FrozenSet, List, Optional, Set
+
+_WORD = re.compile(r"[A-Za-z0-9_]+")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+_FILE_PATH = re.compile(r"[\w./-]+\.py\b")
+_LINE_RANGE = re.compile(
+    r"\blines?\s+(\d+)(?:\s*(?:-|to)\s*(\d+))?|\.py:(\d+)", re.IGNORECASE
+)
+# Code-like names: backticked names, calls, and dotted or snake/Camel case names
+_SYMBOL = re.compile(
+    r"`([A-Za-z_][\w.]*)`|\b([A-Za-z_]\w*)\(|\b([A-Za-z_]\w*(?:\.[A-Za-z_]\w*)+|_*[a-z]+_\w+|[A-Z][a-z]+[A-Z]\w*)\b"
+)
+
+# Line numbers within this distance of each other count as the same location
+LINE_BUCKET_SIZE = 50
+
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+@dataclass(frozen=True)
+class SolutionReferences:
+    """Code locations a solution refers to."""
+
+    files: FrozenSet[str]
+    symbols: FrozenSet[str]
+    lines: FrozenSet[int]
+
+    def all(self) -> FrozenSet[str]:
+        """Files, symbols and line buckets, for comparing solutions."""
+        line_buckets = {f"line {line // LINE_BUCKET_SIZE}" for line in self.lines}
+        return self.files | self.symbols | line_buckets
+
+
+def extract_references(text: str) -> SolutionReferences:
+    """
+    Extract the files, symbols and line numbers a solution mentions.
+
+    Args:
+        text: Solution text
+
+    Returns:
+        The references found in the text
+    """
+    files = {path.lstrip("./") for path in _FILE_PATH.findall(text)}
+    symbols = set()
+    for match in _SYMBOL.finditer(text):
+        symbol = next(group for group in match.groups() if group)
+        if not symbol.endswith(".py"):
+            symbols.add(symbol.rsplit(".", 1)[-1])
+    lines = set()
+    for start, end, path_line in _LINE_RANGE.findall(text):
+        if path_line:
+            lines.add(int(path_line))
+        elif start:
+            lines.update(range(int(start), int(end or start) + 1))
+    return SolutionReferences(frozenset(files), frozenset(symbols), frozenset(lines))
+
+
+def _jaccard(a: Set[str] | FrozenSet[str], b: Set[str] | FrozenSet[str]) -> float:
+    if not a and not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def shingles(text: str, size: int = 3) -> Set[str]:
+    """Word shingles of a text, lowercased."""
+    words = [word.lower() for word in _WORD.findall(text)]
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+class MinHasher:
+    """MinHash signatures for estimating the Jaccard similarity of shingle sets."""
+
+    def __init__(self, num_permutations: int = 64, seed: int = 1) -> None:
+        rng = random.Random(seed)
+        self._permutations = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+            for _ in range(num_permutations)
+        ]
+
+    def signature(self, shingle_set: Set[str]) -> List[int]:
+        hashes = [
+            int.from_bytes(
+                hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big"
+            )
+            for shingle in shingle_set
+        ]
+        if not hashes:
+            return [_MERSENNE_PRIME] * len(self._permutations)
+        return [
+            min((a * value + b) % _MERSENNE_PRIME for value in hashes)
+            for a, b in self._permutations
+        ]
+
+    @staticmethod
+    def similarity(signature_a: List[int], signature_b: List[int]) -> float:
+        matches = sum(1 for a, b in zip(signature_a, signature_b) if a == b)
+        return matches / len(signature_a)
+
+
+@dataclass
+class Solution:
+    index: int
+    text: str
+    references: SolutionReferences
+    signature: List[int]
+
+
+@dataclass
+class SolutionCluster:
+    members: List[Solution] = field(default_factory=list)
+    representative: Optional[Solution] = None
+
+    @property
+    def votes(self) -> int:
+        return len(self.members)
+
+
+class SolutionClusterer:
+    """
+    Groups near-duplicate solutions, without calling a model.
+
+    Two solutions are similar when they refer to the same files and symbols and
+    their text overlaps, estimated with MinHash over word shingles. Solutions
+    join the first cluster with a member at least similarity_threshold similar
+    (single linkage), and each cluster is represented by the member most similar
+    to the rest of its cluster.
+    """
+
+    def __init__(
+        self,
+        similarity_threshold: float = 0.5,
+        reference_weight: float = 0.5,
+        max_details: int = 5,
+        num_permutations: int = 64,
+    ) -> None:
+        self._similarity_threshold = similarity_threshold
+        self._reference_weight = reference_weight
+        self._max_details = max_details
+        self._hasher = MinHasher(num_permutations)
+
+    def similarity(self, a: Solution, b: Solution) -> float:
+        """Weighted text and reference similarity of two solutions."""
+        text_similarity = MinHasher.similarity(a.signature, b.signature)
+        if not a.references.all() and not b.references.all():
+            return text_similarity
+        reference_similarity = _jaccard(a.references.all(), b.references.all())
+        return (
+            self._reference_weight * reference_similarity
+            + (1 - self._reference_weight) * text_similarity
+        )
+
+    def cluster(self, answers: List[str]) -> List[SolutionCluster]:
+        """
+        Cluster solutions, largest cluster first.
+
+        Args:
+            answers: Solution texts, in the order they were received
+
+        Returns:
+            Clusters with their representative set
+        """
+        solutions = [
+            Solution(
+                index,
+                answer,
+                extract_references(answer),
+                self._hasher.signature(shingles(answer)),
+            )
+            for index, answer in enumerate(answers, 1)
+        ]
+
+        clusters: List[SolutionCluster] = []
+        for solution in solutions:
+            for cluster in clusters:
+                if any(
+                    self.similarity(solution, member) >= self._similarity_threshold
+                    for member in cluster.members
+                ):
+                    cluster.members.append(solution)
+                    break
+            else:
+                clusters.append(SolutionCluster(members=[solution]))
+
+        for cluster in clusters:
+            cluster.representative = max(
+                cluster.members,
+                key=lambda candidate: sum(
+                    self.similarity(candidate, other)
+                    for other in cluster.members
+                    if other is not candidate
+                ),
+            )
+        # Stable sort, so ties keep the order solutions were received in
+        return sorted(clusters, key=lambda cluster: -cluster.votes)
+
+    def distinguishing_details(
+        self, solution: Solution, representative: Solution
+    ) -> List[str]:
+        """Sentences of a solution with no close match in the representative."""
+        # Compare sentences by their words, shingles are too strict for paraphrases
+        representative_sentences = [
+            shingles(sentence, size=1)
+            for sentence in _SENTENCE_END.split(representative.text)
+            if sentence.strip()
+        ]
+        details = []
+        for sentence in _SENTENCE_END.split(solution.text):
+            sentence = sentence.strip().removeprefix("FINAL ANSWER:").strip()
+            sentence_shingles = shingles(sentence, size=1)
+            if len(sentence_shingles) < 3:
+                continue
+            if all(
+                _jaccard(sentence_shingles, other) < self._similarity_threshold
+                for other in representative_sentences
+            ):
+                details.append(sentence)
+            if len(details) >= self._max_details:
+                break
+        return details
+
+    def render(self, clusters: List[SolutionCluster], num_solutions: int) -> str:
+        """
+        Render clusters for the outer agent: one representative per cluster, with
+        its vote count and the details only the other members mention.
+
+        Args:
+            clusters: Clusters returned by cluster()
+            num_solutions: Total number of solutions clustered
+
+        Returns:
+            The aggregated response
+        """
+        response = (
+            f"## Solutions from the solver agents, grouped into {len(clusters)} "
+            f"distinct approaches:\n\n"
+        )
+        for i, cluster in enumerate(clusters, 1):
+            representative = cluster.representative
+            response += (
+                f"### Approach {i} ({cluster.votes} of {num_solutions} agents):\n"
+                f"{representative.text}\n\n"
+            )
+            for member in cluster.members:
+                if member is representative:
+                    continue
+                details = self.distinguishing_details(member, representative)
+                extra_references = sorted(
+                    member.references.files - representative.references.files
+                )
+                if not details and not extra_references:
+                    continue
+                response += f"Additional details from solution {member.index}:\n"
+                if extra_references:
+                    response += f"- Also refers to: {', '.join(extra_references)}\n"
+                response += "".join(f"- {detail}\n" for detail in details)
+                response += "\n"
+        return response
@@ -0,0 +1,264 @@
+import asyncio
+import json
+import re
+import shlex
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar, Union
+
+from autogen_core import FunctionCall
+from autogen_core.tools import BaseTool
+
+T = TypeVar("T")
+
+# Commands that only read from the sandbox, and so can run concurrently
+READ_ONLY_BASH_COMMANDS = {
+    "cat",
+    "cut",
+    "diff",
+    "du",
+    "echo",
+    "egrep",
+    "fgrep",
+    "file",
+    "find",
+    "grep",
+    "head",
+    "ls",
+    "nl",
+    "pwd",
+    "rg",
+    "sort",
+    "stat",
+    "tail",
+    "tree",
+    "uniq",
+    "wc",
+    "which",
+}
+READ_ONLY_GIT_SUBCOMMANDS = {
+    "blame",
+    "diff",
+    "grep",
+    "log",
+    "ls-files",
+    "rev-parse",
+    "show",
+    "status",
+}
+# Newlines separate commands like ; does
+_SEGMENT_SEPARATOR = re.compile(r"\|\||&&|[|;\r\n]")
+# Other control characters, which no read-only command needs
+_CONTROL_CHARACTERS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]")
+_UNSAFE_FIND_ACTIONS = {
+    "-delete",
+    "-exec",
+    "-execdir",
+    "-fls",
+    "-fprint",
+    "-fprint0",
+    "-fprintf",
+    "-ok",
+    "-okdir",
+}
+# sed commands that write files or run the pattern space as a command
+_SED_WRITE_COMMANDS = re.compile(r"[wWe]")
+# Regex addresses and the pattern of s commands, which can contain any letter
+_SED_REGEX = re.compile(r"/(?:[^/\\]|\\.)*/")
+
+
+def _writes_output_file(words: List[str], short_option: str) -> bool:
+    """Check for an output file option, e.g. sort -o and --output=."""
+    for word in words:
+        if word == "--":
+            break
+        if word.startswith("--output"):
+            return True
+        if word.startswith("-") and not word.startswith("--") and short_option in word:
+            return True
+    return False
+
+
+def _sed_scripts(words: List[str]) -> Optional[List[str]]:
+    """The scripts of a sed command, or None if they can't be determined."""
+    scripts = []
+    operands = []
+    i = 1
+    while i < len(words):
+        word = words[i]
+        i += 1
+        if word.startswith("--expression="):
+            scripts.append(word.split("=", 1)[1])
+        elif word == "--expression":
+            if i == len(words):
+                return None
+            scripts.append(words[i])
+            i += 1
+        elif word.startswith("--file") or word.startswith("--in-place"):
+            return None
+        elif word.startswith("-") and not word.startswith("--") and len(word) > 1:
+            for j, flag in enumerate(word[1:], start=1):
+                if flag in "fi":
+                    return None
+                if flag in "el":
+                    # The rest of the word, or the next word, is the argument
+                    argument = word[j + 1 :]
+                    if not argument:
+                        if i == len(words):
+                            return None
+                        argument = words[i]
+                        i += 1
+                    if flag == "e":
+                        scripts.append(argument)
+                    break
+        else:
+            operands.append(word)
+    if not scripts and operands:
+        scripts.append(operands[0])
+    return scripts
+
+
+def is_read_only_bash_command(command: str) -> bool:
+    """
+    Conservatively check whether a bash command only reads from the sandbox.
+
+    Args:
+        command: The bash command line
+
+    Returns:
+        True if every command in the pipeline is a known read-only command with
+        no redirection, substitution or directory change
+    """
+    # Discard output redirections to /dev/null, reject any other redirection
+    command = re.sub(r"[12]?>\s*/dev/null|2>&1", "", command)
+    if any(token in command for token in (">", "<", "`", "$(")):
+        return False
+    if _CONTROL_CHARACTERS.search(command):
+        return False
+    # Reject background jobs, but not the && operator
+    if re.search(r"(?<!&)&(?!&)", command):
+        return False
+
+    for segment in _SEGMENT_SEPARATOR.split(command):
+        try:
+            words = shlex.split(segment)
+        except ValueError:
+            return False
+        if not words:
+            continue
+
+        program = words[0]
+        if program == "git":
+            if len(words) < 2 or words[1] not in READ_ONLY_GIT_SUBCOMMANDS:
+                return False
+            if _writes_output_file(words[2:], "O"):
+                return False
+        elif program == "sed":
+            if "-n" not in words:
+                return False
+            scripts = _sed_scripts(words)
+            if scripts is None or any(
+                _SED_WRITE_COMMANDS.search(_SED_REGEX.sub("", script))
+                for script in scripts
+            ):
+                return False
+        elif program in ("sort", "tree"):
+            if _writes_output_file(words[1:], "o") or any(
+                word.startswith("--compress-program") for word in words
+            ):
+                return False
+        elif program == "uniq":
+            # uniq [OPTION]... [INPUT [OUTPUT]]
+            operands = [word for word in words[1:] if not word.startswith("-")]
+            if len(operands) > 1:
+                return False
+        elif program == "find":
+            if _UNSAFE_FIND_ACTIONS & set(words):
+                return False
+        elif program not in READ_ONLY_BASH_COMMANDS:
+            return False
+    return True
+
+
+class ToolExecutor:
+    """
+    Runs the tool calls from one model response, concurrently where it is safe.
+
+    Tool adapters mark themselves as read-only (`read_only = True`, or
+    `is_read_only_call(args)` for tools like bash where it depends on the call).
+    Consecutive read-only calls run concurrently. Any other call is stateful, for
+    example open_file and scroll_* which move CURRENT_FILE/CURRENT_LINE, and runs
+    on its own once the calls before it have finished. Results are returned in
+    call order.
+
+    One executor is shared by all consultants working in the same sandbox, and
+    its semaphore limits how many tool calls run there at once.
+    """
+
+    def __init__(
+        self, tools: List[BaseTool[Any, Any]], max_concurrency: int = 4
+    ) -> None:
+        self._tools: Dict[str, BaseTool[Any, Any]] = {tool.name: tool for tool in tools}
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    def is_read_only(self, tool_call: Union[str, FunctionCall]) -> bool:
+        """Check whether a tool call can run concurrently with other reads."""
+        if not isinstance(tool_call, FunctionCall):
+            return False
+        tool = self._tools.get(tool_call.name)
+        if tool is None:
+            return False
+
+        is_read_only_call = getattr(tool, "is_read_only_call", None)
+        if is_read_only_call is None:
+            return bool(getattr(tool, "read_only", False))
+        try:
+            args = json.loads(tool_call.arguments) if tool_call.arguments else {}
+        except json.JSONDecodeError:
+            return False
+        return bool(is_read_only_call(args))
+
+    async def _run_limited(self, run: Callable[[], Awaitable[T]]) -> T:
+        async with self._semaphore:
+            return await run()
+
+    async def run_all(
+        self,
+        tool_calls: List[Union[str, FunctionCall]],
+        execute: Callable[[Union[str, FunctionCall]], Awaitable[T]],
+    ) -> List[T]:
+        """
+        Execute tool calls, running consecutive read-only calls concurrently.
+
+        Args:
+            tool_calls: Tool calls in the order the model returned them
+            execute: Coroutine function executing a single tool call
+
+        Returns:
+            Results in the same order as tool_calls
+        """
+        results: List[T] = []
+        read_batch: List[Union[str, FunctionCall]] = []
+
+        async def flush_reads() -> None:
+            if not read_batch:
+                return
+            results.extend(
+                await asyncio.gather(
+                    *(
+                        self._run_limited(lambda call=call: execute(call))
+                        for call in read_batch
+                    )
+                )
+            )
+            read_batch.clear()
+
+        for tool_call in tool_calls:
+            if self.is_read_only(tool_call):
+                read_batch.append(tool_call)
+                continue
+            await flush_reads()
+            results.append(
+                await self._run_limited(lambda call=tool_call: execute(call))
+            )
+        await flush_reads()
+
+        return results
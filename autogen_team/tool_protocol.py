@@ -0,0 +1,163 @@
+import json
+import re
+from typing import List, Sequence, Union
+
+from autogen_core import FunctionCall
+from autogen_core.models import (
+    CreateResult,
+    FunctionExecutionResult,
+    LLMMessage,
+    SystemMessage,
+)
+from autogen_core.tools import ToolSchema
+
+from .prompts import PROMPTS
+
+# How a consultant's model calls tools: through the provider's function calling
+# API, or through tool calls written in its text response
+TOOL_PROTOCOLS = {"native", "text"}
+
+_TOOL_CALL_BLOCK = re.compile(r"<tool_call>(.*?)</tool_call>", re.DOTALL)
+
+# Name of the calls standing in for <tool_call> blocks that failed to parse,
+# with the text of the block as arguments
+INVALID_TOOL_CALL = "invalid_tool_call"
+
+
+def render_tool_instructions(tools: Sequence[ToolSchema]) -> str:
+    """
+    Describe the available tools and the text tool call format for the prompt.
+
+    Args:
+        tools: Schemas of the tools the model may call
+
+    Returns:
+        Instructions to add to the system message
+    """
+    tool_lines = []
+    for tool in tools:
+        parameters = json.dumps(tool.get("parameters", {}), separators=(",", ":"))
+        tool_lines.append(
+            f"- {tool['name']}: {tool.get('description', '')} Arguments: {parameters}"
+        )
+    return PROMPTS.render("text_tool_protocol", tools="\n".join(tool_lines))
+
+
+def with_tool_instructions(
+    messages: List[LLMMessage], tools: Sequence[ToolSchema]
+) -> List[LLMMessage]:
+    """
+    Add the text tool call instructions to the system message of a request.
+
+    The messages passed in are not modified, so the instructions always match
+    the tools sent with the current call.
+
+    Args:
+        messages: Messages for the request, starting with the system message
+        tools: Schemas of the tools the model may call
+
+    Returns:
+        Messages to send instead
+    """
+    if not tools:
+        return messages
+    instructions = render_tool_instructions(tools)
+    if messages and isinstance(messages[0], SystemMessage):
+        system = SystemMessage(content=f"{messages[0].content}\n\n{instructions}")
+        return [system, *messages[1:]]
+    return [SystemMessage(content=instructions), *messages]
+
+
+def parse_tool_calls(text: str) -> List[FunctionCall]:
+    """
+    Parse the <tool_call> blocks in a model response.
+
+    Each block must hold a JSON object with a "name" string and an "arguments"
+    object. Blocks that don't become INVALID_TOOL_CALL calls, so they are
+    reported back to the model as invalid tool calls rather than dropped.
+
+    Args:
+        text: Text content of the model response
+
+    Returns:
+        Parsed tool calls, in the order they appear
+    """
+    tool_calls: List[FunctionCall] = []
+    for index, block in enumerate(_TOOL_CALL_BLOCK.findall(text)):
+        call_id = f"text_call_{index}"
+        try:
+            call = json.loads(block)
+        except json.JSONDecodeError:
+            call = None
+        if (
+            not isinstance(call, dict)
+            or not isinstance(call.get("name"), str)
+            or not isinstance(call.get("arguments", {}), dict)
+        ):
+            tool_calls.append(
+                FunctionCall(
+                    id=call_id, name=INVALID_TOOL_CALL, arguments=block.strip()
+                )
+            )
+            continue
+        tool_calls.append(
+            FunctionCall(
+                id=call_id,
+                name=call["name"],
+                arguments=json.dumps(call.get("arguments", {})),
+            )
+        )
+    return tool_calls
+
+
+def parse_tool_call_response(response: CreateResult) -> CreateResult:
+    """
+    Turn a text response with <tool_call> blocks into a tool call response.
+
+    Args:
+        response: Model response to a request made with text tool instructions
+
+    Returns:
+        A response with the parsed tool calls as content, or the original
+        response if it contains no tool calls
+    """
+    if not isinstance(response.content, str):
+        return response
+    tool_calls = parse_tool_calls(response.content)
+    if not tool_calls:
+        return response
+    return CreateResult(
+        finish_reason="function_calls",
+        content=tool_calls,
+        usage=response.usage,
+        cached=response.cached,
+        logprobs=response.logprobs,
+    )
+
+
+def format_tool_calls(tool_calls: Sequence[Union[str, FunctionCall]]) -> str:
+    """Write parsed tool calls back in the text format, for the message history."""
+    blocks = []
+    for tool_call in tool_calls:
+        if isinstance(tool_call, str):
+            blocks.append(f"<tool_call>{tool_call}</tool_call>")
+        elif tool_call.name == INVALID_TOOL_CALL:
+            blocks.append(f"<tool_call>{tool_call.arguments}</tool_call>")
+        else:
+            call = {
+                "name": tool_call.name,
+                "arguments": json.loads(tool_call.arguments),
+            }
+            blocks.append(f"<tool_call>{json.dumps(call)}</tool_call>")
+    return "\n".join(blocks)
+
+
+def format_tool_results(results: Sequence[FunctionExecutionResult]) -> str:
+    """Format tool results as text, for models without native tool calling."""
+    blocks = []
+    for result in results:
+        status = ' error="true"' if result.is_error else ""
+        blocks.append(
+            f'<tool_result name="{result.name}"{status}>\n{result.content}\n</tool_result>'
+        )
+    return "\n".join(blocks)
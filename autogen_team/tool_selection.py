@@ -0,0 +1,103 @@
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Sequence, Set
+
+from autogen_core import FunctionCall
+from autogen_core.models import AssistantMessage, LLMMessage
+from autogen_core.tools import BaseTool, ToolSchema
+
+# Tools that only make sense once the agent has opened a file itself
+FILE_WINDOW_TOOLS = {"scroll_down", "scroll_up"}
+
+
+class ToolSchemaSelector:
+    """
+    Chooses which tool schemas to send with each model call.
+
+    Schemas are serialised once per tool set and cached, rather than rebuilt from
+    the pydantic argument models on every call. With dynamic=False the full tool
+    set is sent on every call, as before. With dynamic=True:
+        - exploration steps get the full tool set, except scroll_* until the
+          agent has opened a file
+        - once at most prune_when_remaining steps are left, only tools the agent
+          has already used (plus always_keep) are sent
+        - final answer and synthesis calls get no tools, or only the tools called
+          earlier in the conversation, since some providers reject tool calls in
+          the history without matching definitions
+    """
+
+    def __init__(
+        self,
+        tools: Sequence[BaseTool[Any, Any]],
+        dynamic: bool = False,
+        prune_when_remaining: Optional[int] = None,
+        always_keep: Iterable[str] = ("run_bash_command",),
+    ) -> None:
+        self._tools = list(tools)
+        self._dynamic = dynamic
+        self._prune_when_remaining = prune_when_remaining
+        self._always_keep = set(always_keep)
+        self._cache: Dict[FrozenSet[str], List[ToolSchema]] = {}
+
+    def schemas(self, names: Iterable[str]) -> List[ToolSchema]:
+        """
+        Get the schemas for a set of tools, in tool order, from the cache.
+
+        Args:
+            names: Names of the tools to include
+
+        Returns:
+            List of tool schemas
+        """
+        key = frozenset(names)
+        if key not in self._cache:
+            self._cache[key] = [tool.schema for tool in self._tools if tool.name in key]
+        return self._cache[key]
+
+    def for_exploration(
+        self, used_tools: Set[str], remaining_steps: int
+    ) -> List[ToolSchema]:
+        """
+        Select tool schemas for a reflection step.
+
+        Args:
+            used_tools: Names of the tools the agent has called so far
+            remaining_steps: Reflection steps left after this one
+
+        Returns:
+            List of tool schemas to send
+        """
+        names = {tool.name for tool in self._tools}
+        if not self._dynamic:
+            return self.schemas(names)
+
+        if "open_file" not in used_tools:
+            names -= FILE_WINDOW_TOOLS
+        if (
+            self._prune_when_remaining is not None
+            and remaining_steps <= self._prune_when_remaining
+            and used_tools
+        ):
+            names &= used_tools | self._always_keep
+        return self.schemas(names)
+
+    def for_final_answer(self, messages: Sequence[LLMMessage]) -> List[ToolSchema]:
+        """
+        Select tool schemas for a call that should only produce text.
+
+        Args:
+            messages: Messages being sent with the call
+
+        Returns:
+            List of tool schemas to send
+        """
+        if not self._dynamic:
+            return self.schemas(tool.name for tool in self._tools)
+
+        called_tools = {
+            call.name
+            for message in messages
+            if isinstance(message, AssistantMessage)
+            and isinstance(message.content, list)
+            for call in message.content
+            if isinstance(call, FunctionCall)
+        }
+        return self.schemas(called_tools)
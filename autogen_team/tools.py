@@ -1,7 +1,10 @@
+import re
 from typing import (
     Any,
     Callable,
     Coroutine,
+    Dict,
+    List,
     Optional,
     cast,
 )
@@ -18,12 +21,16 @@ from inspect_evals.swe_bench.swe_agent_tools import (
     edit_file,
     find_file,
     open_file,
+    run_tests,
     scroll_down,
     scroll_up,
     search_dir,
     search_file,
 )
 
+from .data_models.blackboard import Fact
+from .tool_executor import is_read_only_bash_command
+
 
 class RunBashCommandArgs(BaseModel):
     cmd: str
@@ -70,11 +77,135 @@ class SearchDirArgs(BaseModel):
     dir: str
 
 
+class RunTestsArgs(BaseModel):
+    tests: str
+
+
 class SearchFileArgs(BaseModel):
     search_term: str
     file: str
 
 
+# Fact extraction from tool results, used to fill the team blackboard
+
+_FILE_HEADER_PATTERN = re.compile(r"^\[File: (.+) \(\d+ lines total\)\]$", re.MULTILINE)
+_WINDOW_LINE_PATTERN = re.compile(r"^(\d+):(.*)$", re.MULTILINE)
+_DEFINITION_PATTERN = re.compile(r"^\s*(?:async\s+def|def|class)\s+(\w+)")
+_MATCHES_HEADER_PATTERN = re.compile(
+    r'^Found \d+ matches for "(.*)" in (.+):$', re.MULTILINE
+)
+_GREP_LINE_PATTERN = re.compile(r"^([\w./-]+\.py):(\d+):(.*)$", re.MULTILINE)
+_MAX_PATHS_PER_FACT = 8
+
+
+def _summarise_paths(paths: List[str]) -> str:
+    """Join paths into a short comma-separated list."""
+    shown = ", ".join(paths[:_MAX_PATHS_PER_FACT])
+    if len(paths) > _MAX_PATHS_PER_FACT:
+        shown += f" (+{len(paths) - _MAX_PATHS_PER_FACT} more)"
+    return shown
+
+
+def _facts_from_file_window(result: str) -> List[Fact]:
+    """Extract the viewed line range and any definitions from an editor window."""
+    header = _FILE_HEADER_PATTERN.search(result)
+    if not header:
+        return []
+    path = header.group(1)
+    window = _WINDOW_LINE_PATTERN.findall(result)
+    if not window:
+        return []
+
+    facts = [Fact("viewed", path, f"{window[0][0]}-{window[-1][0]}")]
+    for line_number, content in window:
+        definition = _DEFINITION_PATTERN.match(content)
+        if definition:
+            facts.append(Fact("symbol", definition.group(1), f"{path}:{line_number}"))
+    return facts
+
+
+def _facts_from_search_dir(result: str) -> List[Fact]:
+    """Extract the matching files from search_dir output."""
+    header = _MATCHES_HEADER_PATTERN.search(result)
+    if not header:
+        return []
+    paths = [
+        line.rsplit(" (", 1)[0]
+        for line in result[header.end() :].splitlines()
+        if line.endswith(" matches)")
+    ]
+    if not paths:
+        return []
+    return [Fact("search", header.group(1), _summarise_paths(paths))]
+
+
+def _facts_from_search_file(result: str) -> List[Fact]:
+    """Extract the matching lines and any definitions from search_file output."""
+    header = _MATCHES_HEADER_PATTERN.search(result)
+    if not header:
+        return []
+    path = header.group(2)
+    line_numbers = []
+    facts = []
+    for line in result[header.end() :].splitlines():
+        if not line.startswith("Line "):
+            continue
+        line_number, _, content = line[len("Line ") :].partition(":")
+        line_numbers.append(line_number)
+        definition = _DEFINITION_PATTERN.match(content)
+        if definition:
+            facts.append(Fact("symbol", definition.group(1), f"{path}:{line_number}"))
+    if not line_numbers:
+        return facts
+    detail = f"{path} lines {_summarise_paths(line_numbers)}"
+    return [Fact("search", header.group(1), detail)] + facts
+
+
+def _facts_from_find_file(result: str) -> List[Fact]:
+    """Extract the matching paths from find_file output."""
+    header = _MATCHES_HEADER_PATTERN.search(result)
+    if not header:
+        return []
+    paths = [line for line in result[header.end() :].splitlines() if line.strip()]
+    if not paths:
+        return []
+    return [Fact("found", header.group(1), _summarise_paths(paths))]
+
+
+def _facts_from_grep_output(result: str) -> List[Fact]:
+    """Extract definitions from `grep -n` style bash output."""
+    facts = []
+    for path, line_number, content in _GREP_LINE_PATTERN.findall(result):
+        definition = _DEFINITION_PATTERN.match(content)
+        if definition:
+            facts.append(Fact("symbol", definition.group(1), f"{path}:{line_number}"))
+    return facts
+
+
+def extract_tool_facts(
+    tool: BaseTool[Any, Any], args: Dict[str, Any], result: str
+) -> List[Fact]:
+    """
+    Extract blackboard facts from a tool result, if the tool adapter supports it.
+
+    Args:
+        tool: The tool adapter that produced the result
+        args: Arguments the tool was called with
+        result: The tool result as a string
+
+    Returns:
+        List of facts found in the result
+    """
+    extract_facts = getattr(tool, "extract_facts", None)
+    if extract_facts is None:
+        return []
+    try:
+        return extract_facts(args, result)
+    except Exception as e:
+        print(f"Error extracting facts from {tool.name} result: {str(e)}")
+        return []
+
+
 class RunBashCommandTool(BaseTool[RunBashCommandArgs, ToolResponse]):
     """
     Adapter allowing an Autogen agent to call the Inspect `bash()` tool.
@@ -82,6 +213,7 @@ class RunBashCommandTool(BaseTool[RunBashCommandArgs, ToolResponse]):
 
     name = "run_bash_command"
     description = "Runs a bash command and returns the output."
+    read_only = False
 
     def __init__(
         self, run_bash_command_inspect_impl: Callable[..., Coroutine[Any, Any, str]]
@@ -116,6 +248,12 @@ class RunBashCommandTool(BaseTool[RunBashCommandArgs, ToolResponse]):
 
         return ToolResponse(output=str(result))
 
+    def extract_facts(self, args: Dict[str, Any], result: str) -> List[Fact]:
+        return _facts_from_grep_output(result)
+
+    def is_read_only_call(self, args: Dict[str, Any]) -> bool:
+        return is_read_only_bash_command(str(args.get("cmd", "")))
+
 
 class CreateNewFileTool(BaseTool[CreateNewFileArgs, ToolResponse]):
     """
@@ -123,6 +261,7 @@ class CreateNewFileTool(BaseTool[CreateNewFileArgs, ToolResponse]):
     """
 
     name = "create_new_file"
+    read_only = False
     description = "Creates and opens a new file at the given path in the editor."
 
     def __init__(
@@ -159,6 +298,7 @@ class EditFileTool(BaseTool[EditFileArgs, ToolResponse]):
     """
 
     name = "edit_file"
+    read_only = False
     description = (
         "Edits a file by replacing lines <start_line>:<end_line> "
         "with the given replacement_text. Checks for Python syntax "
@@ -201,6 +341,7 @@ class FindFileTool(BaseTool[FindFileArgs, ToolResponse]):
     """
 
     name = "find_file"
+    read_only = True
     description = (
         "Finds all files matching a given name in the specified directory. "
         'Use dir="$" to search the current directory.'
@@ -234,6 +375,9 @@ class FindFileTool(BaseTool[FindFileArgs, ToolResponse]):
         )
         return ToolResponse(output=str(result))
 
+    def extract_facts(self, args: Dict[str, Any], result: str) -> List[Fact]:
+        return _facts_from_find_file(result)
+
 
 # Open File Tool
 class OpenFileTool(BaseTool[OpenFileArgs, ToolResponse]):
@@ -242,6 +386,7 @@ class OpenFileTool(BaseTool[OpenFileArgs, ToolResponse]):
     """
 
     name = "open_file"
+    read_only = False
     description = "Opens a file at the given path. If line_number is provided, moves to that line."
 
     def __init__(
@@ -267,6 +412,9 @@ class OpenFileTool(BaseTool[OpenFileArgs, ToolResponse]):
         )
         return ToolResponse(output=str(result))
 
+    def extract_facts(self, args: Dict[str, Any], result: str) -> List[Fact]:
+        return _facts_from_file_window(result)
+
 
 # Scroll Down Tool
 class ScrollDownTool(BaseTool[ScrollArgs, ToolResponse]):
@@ -275,6 +423,7 @@ class ScrollDownTool(BaseTool[ScrollArgs, ToolResponse]):
     """
 
     name = "scroll_down"
+    read_only = False
     description = "Moves the window down in the current file."
 
     def __init__(
@@ -298,6 +447,9 @@ class ScrollDownTool(BaseTool[ScrollArgs, ToolResponse]):
         result = await self._scroll_down_impl()
         return ToolResponse(output=str(result))
 
+    def extract_facts(self, args: Dict[str, Any], result: str) -> List[Fact]:
+        return _facts_from_file_window(result)
+
 
 # Scroll Up Tool
 class ScrollUpTool(BaseTool[ScrollArgs, ToolResponse]):
@@ -306,6 +458,7 @@ class ScrollUpTool(BaseTool[ScrollArgs, ToolResponse]):
     """
 
     name = "scroll_up"
+    read_only = False
     description = "Moves the window up in the current file."
 
     def __init__(
@@ -329,6 +482,9 @@ class ScrollUpTool(BaseTool[ScrollArgs, ToolResponse]):
         result = await self._scroll_up_impl()
         return ToolResponse(output=str(result))
 
+    def extract_facts(self, args: Dict[str, Any], result: str) -> List[Fact]:
+        return _facts_from_file_window(result)
+
 
 # Search Dir Tool
 class SearchDirTool(BaseTool[SearchDirArgs, ToolResponse]):
@@ -337,6 +493,7 @@ class SearchDirTool(BaseTool[SearchDirArgs, ToolResponse]):
     """
 
     name = "search_dir"
+    read_only = True
     description = "Searches for a term in all files in a directory recursively. Use dir='$' for current directory."
 
     def __init__(
@@ -362,6 +519,9 @@ class SearchDirTool(BaseTool[SearchDirArgs, ToolResponse]):
         )
         return ToolResponse(output=str(result))
 
+    def extract_facts(self, args: Dict[str, Any], result: str) -> List[Fact]:
+        return _facts_from_search_dir(result)
+
 
 # Search File Tool
 class SearchFileTool(BaseTool[SearchFileArgs, ToolResponse]):
@@ -370,6 +530,7 @@ class SearchFileTool(BaseTool[SearchFileArgs, ToolResponse]):
     """
 
     name = "search_file"
+    read_only = True
     description = (
         "Searches for a term in a specific file. Use file='$' for current open file."
     )
@@ -397,6 +558,41 @@ class SearchFileTool(BaseTool[SearchFileArgs, ToolResponse]):
         )
         return ToolResponse(output=str(result))
 
+    def extract_facts(self, args: Dict[str, Any], result: str) -> List[Fact]:
+        return _facts_from_search_file(result)
+
+
+# Run Tests Tool
+class RunTestsTool(BaseTool[RunTestsArgs, ToolResponse]):
+    """
+    Adapter allowing an Autogen agent to call the `run_tests()` tool.
+    """
+
+    name = "run_tests"
+    read_only = False
+    description = "Runs specific tests (space-separated test ids or test files) and returns a pass/fail summary. Results are cached until the code changes. Never run the whole test suite."
+
+    def __init__(
+        self, run_tests_inspect_impl: Callable[..., Coroutine[Any, Any, str]]
+    ) -> None:
+        super().__init__(
+            name=self.name,
+            description=self.description,
+            args_type=RunTestsArgs,
+            return_type=ToolResponse,
+        )
+        self._run_tests_impl = run_tests_inspect_impl
+
+    async def run(
+        self, args: RunTestsArgs, cancellation_token: CancellationToken | None = None
+    ) -> ToolResponse:
+        if isinstance(args, dict):
+            parsed_args = RunTestsArgs(**args)
+        else:
+            parsed_args = args
+        result = await self._run_tests_impl(tests=parsed_args.tests)
+        return ToolResponse(output=str(result))
+
 
 # Tool instances
 
@@ -420,4 +616,7 @@ search_file_tool = SearchFileTool(
     cast(Callable[..., Coroutine[Any, Any, str]], search_file())
 )
 edit_tool = EditFileTool(cast(Callable[..., Coroutine[Any, Any, str]], edit_file()))
+run_tests_tool = RunTestsTool(
+    cast(Callable[..., Coroutine[Any, Any, str]], run_tests())
+)
 find_tool = FindFileTool(cast(Callable[..., Coroutine[Any, Any, str]], find_file()))
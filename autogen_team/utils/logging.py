@@ -2,7 +2,7 @@ from datetime import datetime
 from pathlib import Path
 import os
 import json
-from typing import Any, Dict, List, Union, Optional
+from typing import Any, Dict, List, Tuple, Union, Optional
 
 
 def get_agent_log_path(agent_id: str, log_base_path: str, experiment_name: str) -> Path:
@@ -161,6 +161,18 @@ def log_tool_execution(
         log_message(log_path, f"Error args: {error.args}")
 
 
+def log_loop_detected(log_path: Path, tool_name: str, details: str) -> None:
+    """
+    Log that a repeated tool call or cycle was detected.
+
+    Args:
+        log_path: Path to the log file
+        tool_name: Name of the tool involved
+        details: Description of the detection
+    """
+    log_message(log_path, f"Loop detected on tool {tool_name}: {details}")
+
+
 # Reflection Process Logging
 
 
@@ -193,6 +205,29 @@ def log_reflection_process(
             f.write(f"Could not serialize messages: {str(e)}\n\n\n\n")
 
 
+def log_stream_timing(
+    log_path: Path,
+    time_to_first_token: Optional[float],
+    total_time: float,
+    cut_off: bool,
+) -> None:
+    """
+    Log the timing of a streamed LLM call.
+
+    Args:
+        log_path: Path to the log file
+        time_to_first_token: Seconds until the first content chunk, if any arrived
+        total_time: Total seconds spent on the call
+        cut_off: Whether the stream was cancelled once the final answer was complete
+    """
+    ttft = f"{time_to_first_token:.2f}s" if time_to_first_token is not None else "n/a"
+    log_message(
+        log_path,
+        f"Streamed LLM call: time to first token {ttft}, total {total_time:.2f}s"
+        + (", cut off at final answer word limit" if cut_off else ""),
+    )
+
+
 def log_llm_response(log_path: Path, response: Any) -> None:
     """
     Log an LLM response.
@@ -229,6 +264,46 @@ def log_llm_response(log_path: Path, response: Any) -> None:
             f.write(f"Response content: {str(response)}\n\n\n\n")
 
 
+def log_blackboard_digest(log_path: Path, digest: str) -> None:
+    """
+    Log a blackboard digest injected into an agent's reflection.
+
+    Args:
+        log_path: Path to the log file
+        digest: Digest of facts from other agents
+    """
+    log_message(log_path, f"Injecting blackboard digest:\n{digest}")
+
+
+def log_reflection_budget_change(log_path: Path, step: int, change: str) -> None:
+    """
+    Log a change to an agent's reflection step budget.
+
+    Args:
+        log_path: Path to the log file
+        step: Zero-based step after which the budget changed
+        change: Description of the change
+    """
+    log_message(log_path, f"Reflection budget after step {step + 1}: {change}")
+
+
+def log_reflection_steps_saved(
+    log_path: Path, steps_used: int, steps_saved: int
+) -> None:
+    """
+    Log the number of reflection steps used and saved in a reflection.
+
+    Args:
+        log_path: Path to the log file
+        steps_used: Number of reflection steps taken
+        steps_saved: Steps saved relative to the configured budget
+    """
+    log_message(
+        log_path,
+        f"Reflection used {steps_used} steps ({steps_saved} steps saved)",
+    )
+
+
 # Runtime Logging
 
 
@@ -291,6 +366,150 @@ def log_token_usage(log_path: Path, usage: Any) -> None:
     log_message(log_path, f"Total token usage: {str(usage)}")
 
 
+def log_token_usage_breakdown(log_path: Path, usage: Any) -> None:
+    """
+    Log token usage and cost per agent and per model.
+
+    Args:
+        log_path: Path to the log file
+        usage: Team TokenUsage, with its by_agent and by_model breakdowns
+    """
+    lines = ["Token usage by agent:"]
+    lines += [
+        f"  {agent}: {agent_usage}" for agent, agent_usage in usage.by_agent.items()
+    ]
+    lines.append("Token usage by model:")
+    lines += [
+        f"  {model}: {model_usage}" for model, model_usage in usage.by_model.items()
+    ]
+    log_message(log_path, "\n".join(lines))
+
+
+def log_batched_calls(
+    log_path: Path, batched_calls: Dict[str, Tuple[int, int]]
+) -> None:
+    """
+    Log the model calls of each agent sent through the batch API on a sample.
+
+    Args:
+        log_path: Path to the log file
+        batched_calls: Number of batched calls and of all calls per agent
+    """
+    per_agent = ", ".join(
+        f"{agent}={batched}/{calls}"
+        for agent, (batched, calls) in batched_calls.items()
+    )
+    log_message(log_path, f"Batched model calls: {per_agent}")
+
+
+def log_prompt_token_costs(log_path: Path, costs: Dict[str, Dict[str, int]]) -> None:
+    """
+    Log the fixed token cost of each prompt template per model.
+
+    Args:
+        log_path: Path to the log file
+        costs: Mapping of template name and version to tokens per model
+    """
+    lines = [
+        f"{template}: "
+        + ", ".join(f"{model}={tokens}" for model, tokens in model_costs.items())
+        for template, model_costs in costs.items()
+    ]
+    log_message(log_path, "Prompt template token costs:\n" + "\n".join(lines))
+
+
+def log_repo_map(
+    log_path: Path, num_files: int, from_cache: bool, repo_map: str
+) -> None:
+    """
+    Log the repository map built for a sample.
+
+    Args:
+        log_path: Path to the log file
+        num_files: Number of modules in the repository outline
+        from_cache: Whether the outline was loaded from the host cache
+        repo_map: The rendered repository map
+    """
+    source = "cache" if from_cache else "sandbox"
+    log_message(
+        log_path,
+        f"Repository map from {source} ({num_files} modules):\n{repo_map}",
+    )
+
+
+def log_localization(log_path: Path, files: List[Dict[str, Any]]) -> None:
+    """
+    Log the files found by issue localization.
+
+    Args:
+        log_path: Path to the log file
+        files: Localized files with their scores and regions
+    """
+    lines = [
+        f"{file['path']} (score {file['score']}): "
+        + ", ".join(f"lines {r['start']}-{r['end']}" for r in file["regions"])
+        for file in files
+    ]
+    log_message(log_path, "Localized files:\n" + "\n".join(lines))
+
+
+def log_solution_clusters(log_path: Path, clusters: List[List[int]]) -> None:
+    """
+    Log how the solver solutions were clustered.
+
+    Args:
+        log_path: Path to the log file
+        clusters: Solution numbers in each cluster, largest cluster first
+    """
+    log_message(
+        log_path,
+        f"Clustered solutions into {len(clusters)} approaches: "
+        + "; ".join(", ".join(str(index) for index in cluster) for cluster in clusters),
+    )
+
+
+def log_follow_up_answer(log_path: Path, agent_id: str, source: str) -> None:
+    """
+    Log a final response that arrived after the final answer was published.
+
+    Args:
+        log_path: Path to the log file
+        agent_id: ID of the aggregator
+        source: ID of the agent that sent the response
+    """
+    log_message(
+        log_path,
+        f"Agent {agent_id} received a late response from {source}, kept as a follow-up",
+    )
+
+
+def log_synthesis(
+    log_path: Path,
+    input_tokens: int,
+    output_tokens: Optional[int],
+    fallback_reason: Optional[str] = None,
+) -> None:
+    """
+    Log the result of synthesizing the final answer.
+
+    Args:
+        log_path: Path to the log file
+        input_tokens: Tokens in the aggregated solutions
+        output_tokens: Tokens in the synthesized plan, or None if synthesis fell back
+        fallback_reason: Why the aggregated solutions were used instead
+    """
+    if output_tokens is None:
+        log_message(
+            log_path,
+            f"Synthesis failed ({fallback_reason}), using the {input_tokens} token aggregated response",
+        )
+        return
+    log_message(
+        log_path,
+        f"Synthesized {input_tokens} tokens of solutions into {output_tokens} tokens",
+    )
+
+
 def log_team_setup(log_path: Path, agent_count: int, agent_types: List[str]) -> None:
     """
     Log team setup information.
@@ -397,6 +616,15 @@ def log_collecting_token_usage(log_path: Path) -> None:
         )
 
 
+def log_team_steps_saved(log_path: Path, steps_saved: Dict[str, int]) -> None:
+    """Log the reflection steps saved by each agent, and in total, for a sample."""
+    per_agent = ", ".join(f"{agent}={saved}" for agent, saved in steps_saved.items())
+    with open(log_path, "a", encoding="utf-8") as f:
+        f.write(
+            f"{datetime.now().isoformat()}: Total reflection steps saved: {sum(steps_saved.values())} ({per_agent})\n\n\n\n"
+        )
+
+
 def log_token_usage_error(log_path: Path, error: Exception) -> None:
     """Log an error collecting token usage."""
     with open(log_path, "a", encoding="utf-8") as f:
@@ -411,3 +639,88 @@ def log_final_result_retrieval(log_path: Path, result_length: int) -> None:
         f.write(
             f"{datetime.now().isoformat()}: Final result retrieved from aggregator ({result_length} chars)\n\n\n\n"
         )
+
+
+def log_http_clients(log_path: Path, created: int, reused: int) -> None:
+    """
+    Log how many shared HTTP clients were created and reused so far.
+
+    Args:
+        log_path: Path to the log file
+        created: Number of HTTP clients created by the registry
+        reused: Number of times an existing HTTP client was handed out
+    """
+    log_message(log_path, f"Shared HTTP clients: {created} created, {reused} reused")
+
+
+def log_rate_limits(log_path: Path, stats: Dict[str, Dict[str, Any]]) -> None:
+    """
+    Log the state of the shared rate limiters.
+
+    Args:
+        log_path: Path to the log file
+        stats: Calls, 429s, time spent waiting and current concurrency limit
+            per provider and model
+    """
+    lines = [
+        f"{name}: {s['calls']} calls, {s['rate_limited']} rate limited, "
+        f"{s['wait_seconds']}s waiting, concurrency limit {s['concurrency_limit']}"
+        for name, s in stats.items()
+    ]
+    log_message(log_path, "Rate limiters:\n" + "\n".join(lines))
+
+
+def log_model_call_retries(log_path: Path, retries: Dict[str, Tuple[int, int]]) -> None:
+    """
+    Log the model call retries and failovers of each agent on a sample.
+
+    Args:
+        log_path: Path to the log file
+        retries: Number of retries and failovers per agent
+    """
+    per_agent = ", ".join(
+        f"{agent}={retried} retries/{failed_over} failovers"
+        for agent, (retried, failed_over) in retries.items()
+    )
+    log_message(log_path, f"Model call retries: {per_agent}")
+
+
+def log_context_trims(log_path: Path, trims: Dict[str, List[Any]]) -> None:
+    """
+    Log every model call that was trimmed to fit the context window on a sample.
+
+    Args:
+        log_path: Path to the log file
+        trims: Trimmed calls per agent, see models/context_window.py
+    """
+    lines = [
+        f"  {agent} call {index + 1}: {trim}"
+        for agent, agent_trims in trims.items()
+        for index, trim in enumerate(agent_trims)
+    ]
+    log_message(log_path, "Context window trims:\n" + "\n".join(lines))
+
+
+def log_call_traces(
+    log_path: Path, trace_path: Path, summary: Dict[str, Dict[str, Any]]
+) -> None:
+    """
+    Log a per-agent summary of the model API requests traced on a sample.
+
+    Args:
+        log_path: Path to the log file
+        trace_path: Path to the JSONL file with a line per request
+        summary: Request counts, latencies, sizes and upstream providers per
+            agent, see models/tracing.py
+    """
+    lines = [
+        f"  {agent}: {s['requests']} requests, {s['errors']} errors, "
+        f"median/p95 queue wait {s['queue_wait']}, time to first byte "
+        f"{s['ttfb']}, total {s['total']}, {s['request_bytes']} bytes sent, "
+        f"{s['response_bytes']} bytes received"
+        + (f", providers {s['providers']}" if s["providers"] else "")
+        for agent, s in summary.items()
+    ]
+    log_message(
+        log_path, f"Model API requests, traced to {trace_path}:\n" + "\n".join(lines)
+    )
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import posixpath
+from typing import Any, Dict, List, Optional, Tuple
+
+# Tools whose results only depend on their arguments, so a repeated call can be
+# answered from the cache without running it again
+CACHEABLE_TOOLS = {"search_dir", "search_file", "find_file"}
+
+# Arguments holding paths, normalised so "./src/" and "src" fingerprint the same
+PATH_ARGUMENTS = {"path", "dir", "file"}
+
+REPEAT_HINT = (
+    "NOTE: You already made this exact call in this reflection and got the same "
+    "result. Repeating it will not reveal anything new. Try a different search "
+    "term, file or line range, or give your FINAL ANSWER if you have enough "
+    "information."
+)
+NO_CHANGE_HINT = (
+    "NOTE: This returned exactly the same output as an earlier {tool} call, so "
+    "you are not making progress. Use search_file or open_file with a line number "
+    "to jump to what you are looking for instead."
+)
+CYCLE_HINT = (
+    "NOTE: Your last {length} tool calls repeat the {length} calls before them "
+    "with the same results. Break out of this cycle by trying something different."
+)
+
+
+def _normalise_arguments(arguments: str) -> Dict[str, Any]:
+    """Parse tool call arguments and normalise path-like values."""
+    try:
+        args = json.loads(arguments) if arguments else {}
+    except json.JSONDecodeError:
+        return {"_raw": arguments.strip()}
+    if not isinstance(args, dict):
+        return {"_raw": args}
+
+    normalised = {}
+    for key, value in args.items():
+        if key == "dummy":
+            # Placeholder property of the scroll tools, carries no meaning
+            continue
+        if isinstance(value, str):
+            value = value.strip()
+            if key in PATH_ARGUMENTS and value not in ("", "$"):
+                value = posixpath.normpath(value)
+        normalised[key] = value
+    return normalised
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8", errors="replace")).hexdigest()
+
+
+def _result_fingerprint(result: str) -> str:
+    """Fingerprint a tool result, ignoring the bash scroll warning."""
+    lines = [
+        line
+        for line in result.strip().splitlines()
+        if not line.startswith("WARNING: Scrolling many times")
+        and not line.startswith("If you know what you are looking for")
+    ]
+    return _digest("\n".join(lines).strip())
+
+
+class LoopDetector:
+    """
+    Detects repeated tool calls and cycles in a consultant's reflection.
+
+    Each call is fingerprinted by tool name and normalised arguments, and each
+    result by a hash of its output. The detector reports:
+        - exact repeats: the same call returning the same result as before
+        - near repeats: the same tool returning the same output as before, such as
+          scrolling past the end of a file or re-opening the same window
+        - cycles: the last N calls and results repeating the N before them
+    Every detection counts as a loop hit. Once max_loop_hits is reached the
+    reflection should end.
+    """
+
+    def __init__(self, max_loop_hits: int = 3, max_cycle_length: int = 3) -> None:
+        self._max_loop_hits = max_loop_hits
+        self._max_cycle_length = max_cycle_length
+        self._history: List[Tuple[str, str]] = []
+        # Result sent to the model and fingerprint of the output, per call
+        self._results_by_call: Dict[str, Tuple[str, str]] = {}
+        self._result_fingerprints: Dict[Tuple[str, str], str] = {}
+        self.loop_hits = 0
+
+    def start(self) -> None:
+        """Reset the detector for a new reflection."""
+        self._history = []
+        self._results_by_call = {}
+        self._result_fingerprints = {}
+        self.loop_hits = 0
+
+    @property
+    def should_stop(self) -> bool:
+        """Whether the agent has looped often enough that reflection should end."""
+        return self.loop_hits >= self._max_loop_hits
+
+    def _call_fingerprint(self, name: str, arguments: str) -> str:
+        args = _normalise_arguments(arguments)
+        return _digest(name + json.dumps(args, sort_keys=True, default=str))
+
+    def cached_result(self, name: str, arguments: str) -> Optional[str]:
+        """
+        Look up the result of an earlier identical call to a cacheable tool.
+
+        Args:
+            name: Name of the tool being called
+            arguments: JSON arguments of the call
+
+        Returns:
+            The cached result with a redirect hint appended, or None if the call
+            should be executed
+        """
+        if name not in CACHEABLE_TOOLS:
+            return None
+        if _normalise_arguments(arguments).get("file") == "$":
+            # Searches the currently open file, which may have changed
+            return None
+
+        cached = self._results_by_call.get(self._call_fingerprint(name, arguments))
+        if cached is None:
+            return None
+
+        self.loop_hits += 1
+        self._history.append((self._call_fingerprint(name, arguments), cached[1]))
+        return f"{cached[0]}\n\n{REPEAT_HINT}"
+
+    def record(
+        self, name: str, arguments: str, result: str, output: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Record an executed call and its result, and check for loops.
+
+        Args:
+            name: Name of the tool that was called
+            arguments: JSON arguments of the call
+            result: Result of the call, as sent to the model
+            output: Plain text output of the tool, which is fingerprinted.
+                Defaults to result.
+
+        Returns:
+            A redirect hint to append to the result if a loop was detected,
+            otherwise None
+        """
+        call_fingerprint = self._call_fingerprint(name, arguments)
+        result_fingerprint = _result_fingerprint(result if output is None else output)
+        entry = (call_fingerprint, result_fingerprint)
+
+        hint = None
+        previous = self._results_by_call.get(call_fingerprint)
+        if previous is not None and previous[1] == result_fingerprint:
+            hint = REPEAT_HINT
+        elif (name, result_fingerprint) in self._result_fingerprints:
+            hint = NO_CHANGE_HINT.format(tool=name)
+
+        self._history.append(entry)
+        self._results_by_call[call_fingerprint] = (result, result_fingerprint)
+        self._result_fingerprints[(name, result_fingerprint)] = call_fingerprint
+
+        if hint is None:
+            cycle_length = self._cycle_length()
+            if cycle_length:
+                hint = CYCLE_HINT.format(length=cycle_length)
+
+        if hint is not None:
+            self.loop_hits += 1
+        return hint
+
+    def _cycle_length(self) -> Optional[int]:
+        """Find a cycle of length >= 2 at the end of the call history."""
+        for length in range(2, self._max_cycle_length + 1):
+            if len(self._history) < 2 * length:
+                break
+            if self._history[-length:] == self._history[-2 * length : -length]:
+                return length
+        return None
@@ -0,0 +1,148 @@
+from typing import Optional, Set
+
+
+def _word_set(text: str) -> Set[str]:
+    return set(text.lower().split())
+
+
+def answer_similarity(first: str, second: str) -> float:
+    """
+    Compute the Jaccard similarity between the word sets of two answers.
+
+    Args:
+        first: First answer text
+        second: Second answer text
+
+    Returns:
+        Similarity between 0.0 and 1.0
+    """
+    first_words = _word_set(first)
+    second_words = _word_set(second)
+    if not first_words or not second_words:
+        return 0.0
+    return len(first_words & second_words) / len(first_words | second_words)
+
+
+class ReflectionBudget:
+    """
+    Controls how many reflection steps a consultant takes in one round.
+
+    With adaptive=False the budget is a fixed number of steps, as configured by
+    max_reflection_steps. With adaptive=True the limit starts at initial_steps and
+    is moved within [min_steps, max_steps] based on progress signals:
+        - steps that discover new files, lines or results near the limit extend it
+        - `patience` consecutive steps without anything new shorten it to stop
+        - two consecutive answer drafts that agree shorten it to stop
+    """
+
+    def __init__(
+        self,
+        initial_steps: int,
+        min_steps: Optional[int] = None,
+        max_steps: Optional[int] = None,
+        adaptive: bool = False,
+        patience: int = 3,
+        extension: int = 5,
+        stability_threshold: float = 0.8,
+    ) -> None:
+        self.adaptive = adaptive
+        self.initial_steps = initial_steps
+        self.min_steps = min(initial_steps, min_steps or initial_steps)
+        self.max_steps = max(initial_steps, max_steps or initial_steps)
+        self._patience = patience
+        self._extension = extension
+        self._stability_threshold = stability_threshold
+        self.limit = initial_steps
+        self._stale_steps = 0
+        self._last_answer: Optional[str] = None
+        self.total_steps_saved = 0
+
+    def start(self, previous_answer: Optional[str] = None) -> None:
+        """
+        Reset the budget for a new reflection.
+
+        Args:
+            previous_answer: The agent's answer from the previous round, if any,
+                used as the baseline for answer stability
+        """
+        self.limit = self.initial_steps
+        self._stale_steps = 0
+        self._last_answer = previous_answer
+
+    def allows(self, step: int) -> bool:
+        """Check whether the (zero-based) step may be taken."""
+        return step < self.limit
+
+    def observe_tool_step(self, step: int, new_findings: int) -> Optional[str]:
+        """
+        Update the budget after a step that called tools.
+
+        Args:
+            step: Zero-based index of the step just taken
+            new_findings: Number of facts or results the step discovered that the
+                agent hadn't seen before
+
+        Returns:
+            A description of the budget change, or None if it is unchanged
+        """
+        if not self.adaptive:
+            return None
+
+        if new_findings > 0:
+            self._stale_steps = 0
+            # Still making progress when about to run out, so keep going
+            if step + 1 >= self.limit and self.limit < self.max_steps:
+                self.limit = min(self.max_steps, self.limit + self._extension)
+                return f"extended to {self.limit} steps (step found {new_findings} new items)"
+            return None
+
+        self._stale_steps += 1
+        if self._stale_steps >= self._patience:
+            return self._stop_after(step, f"{self._stale_steps} steps without progress")
+        return None
+
+    def observe_answer(self, step: int, answer: str) -> Optional[str]:
+        """
+        Update the budget after a step that produced an answer draft.
+
+        Args:
+            step: Zero-based index of the step just taken
+            answer: Text of the draft
+
+        Returns:
+            A description of the budget change, or None if it is unchanged
+        """
+        previous_answer = self._last_answer
+        self._last_answer = answer
+        if not self.adaptive or previous_answer is None:
+            return None
+
+        similarity = answer_similarity(previous_answer, answer)
+        if similarity >= self._stability_threshold:
+            return self._stop_after(
+                step, f"answer stable (similarity {similarity:.2f})"
+            )
+        return None
+
+    def _stop_after(self, step: int, reason: str) -> Optional[str]:
+        """Shorten the limit so reflection ends after `step`, respecting min_steps."""
+        new_limit = max(self.min_steps, step + 1)
+        if new_limit >= self.limit:
+            return None
+        self.limit = new_limit
+        return f"shortened to {self.limit} steps ({reason})"
+
+    def finish(self, steps_used: int) -> int:
+        """
+        Record the end of a reflection.
+
+        Args:
+            steps_used: Number of reflection steps actually taken
+
+        Returns:
+            Steps saved relative to the configured initial budget (negative if the
+            budget was extended)
+        """
+        steps_saved = self.initial_steps - steps_used
+        self.total_steps_saved += steps_saved
+        return steps_saved
@@ -0,0 +1,52 @@
+from functools import lru_cache
+from typing import Any, Optional
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - tiktoken is optional
+    tiktoken = None
+
+# Encoding used for models tiktoken doesn't know about, such as OpenRouter models
+DEFAULT_ENCODING = "o200k_base"
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model: str) -> Optional[Any]:
+    """
+    Get the tiktoken encoding for a model, falling back to DEFAULT_ENCODING.
+
+    Returns None if the encoding can't be loaded, e.g. when tiktoken has to
+    download it and the sandbox is offline. The result is cached, so a failed
+    download isn't retried for every count.
+    """
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model.split("/")[-1])
+        except KeyError:
+            return tiktoken.get_encoding(DEFAULT_ENCODING)
+    except Exception as e:
+        print(f"Error loading tiktoken encoding: {type(e).__name__}: {str(e)}")
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    """
+    Count the tokens in a piece of text for a model.
+
+    Counts are exact for OpenAI models and an approximation for other model
+    families. Without tiktoken installed, or if its encoding can't be loaded, assumes
+    four characters per token.
+
+    Args:
+        text: Text to count tokens for
+        model: Model name, with or without a provider prefix ("openai/gpt-4o")
+
+    Returns:
+        Number of tokens
+    """
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
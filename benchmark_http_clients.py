@@ -0,0 +1,129 @@
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+from inspect_evals.swe_bench.autogen_team.models.client_factory import (
+    PROVIDER_BASE_URLS,
+)
+from inspect_evals.swe_bench.autogen_team.models.client_registry import (
+    HttpClientRegistry,
+    PoolLimits,
+)
+
+API_KEY_VARIABLES = {"openai": "OPENAI_API_KEY", "openrouter": "OPENROUTER_API_KEY"}
+
+
+class ConnectionTimer:
+    """Sums the time spent opening TCP connections and TLS handshakes."""
+
+    def __init__(self) -> None:
+        self.seconds = 0.0
+        self.connections = 0
+        self._started: Dict[str, float] = {}
+
+    async def trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        # httpcore reports each connection setup step as started/complete events
+        step, _, phase = event_name.rpartition(".")
+        if step not in ("connection.connect_tcp", "connection.start_tls"):
+            return
+        if phase == "started":
+            self._started[step] = time.perf_counter()
+        elif phase == "complete" and step in self._started:
+            self.seconds += time.perf_counter() - self._started.pop(step)
+            if step == "connection.connect_tcp":
+                self.connections += 1
+
+
+async def _consultant(
+    client: httpx.AsyncClient,
+    url: str,
+    headers: Dict[str, str],
+    requests: int,
+    timer: ConnectionTimer,
+) -> None:
+    for _ in range(requests):
+        # The response doesn't matter, only the connection it was sent on
+        await client.get(url, headers=headers, extensions={"trace": timer.trace})
+
+
+async def benchmark(
+    provider: str,
+    consultations: int,
+    consultants: int,
+    requests: int,
+) -> Dict[str, List[float]]:
+    """
+    Measure connection setup time per consultation, with one HTTP client per
+    consultant (as the OpenAI SDK does by default) and with the shared registry.
+
+    Each consultation runs its consultants concurrently, and each consultant
+    sends requests one after another, like reflection steps.
+
+    Args:
+        provider: Provider whose API to send requests to
+        consultations: Number of consultations to simulate
+        consultants: Number of consultants per consultation
+        requests: Number of requests per consultant
+
+    Returns:
+        Seconds of connection setup per consultation, for "per_consultant"
+        and "shared" clients
+    """
+    url = PROVIDER_BASE_URLS[provider] + "/models"
+    api_key = os.environ.get(API_KEY_VARIABLES[provider], "")
+    headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+    registry = HttpClientRegistry()
+    results: Dict[str, List[float]] = {"per_consultant": [], "shared": []}
+
+    for _ in range(consultations):
+        timer = ConnectionTimer()
+        clients = [httpx.AsyncClient() for _ in range(consultants)]
+        await asyncio.gather(
+            *(_consultant(c, url, headers, requests, timer) for c in clients)
+        )
+        for client in clients:
+            await client.aclose()
+        results["per_consultant"].append(timer.seconds)
+
+    for _ in range(consultations):
+        timer = ConnectionTimer()
+        clients = [
+            registry.acquire(provider, PROVIDER_BASE_URLS[provider], PoolLimits())
+            for _ in range(consultants)
+        ]
+        await asyncio.gather(
+            *(_consultant(c, url, headers, requests, timer) for c in clients)
+        )
+        for client in clients:
+            registry.release(client)
+        results["shared"].append(timer.seconds)
+
+    await registry.aclose()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark connection setup time per consultation, with and without shared HTTP clients"
+    )
+    parser.add_argument(
+        "--provider", choices=sorted(PROVIDER_BASE_URLS), default="openai"
+    )
+    parser.add_argument("--consultations", type=int, default=10)
+    parser.add_argument("--consultants", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=5)
+    args = parser.parse_args()
+
+    results = asyncio.run(
+        benchmark(args.provider, args.consultations, args.consultants, args.requests)
+    )
+    for name, seconds in results.items():
+        print(
+            f"{name}: {1000 * statistics.mean(seconds):.1f} ms of connection setup "
+            f"per consultation on average, {1000 * sum(seconds):.1f} ms in total"
+        )
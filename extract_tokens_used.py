@@ -6,7 +6,7 @@ import argparse
 from pathlib import Path
 
 
-def extract_token_usage(log_directory):
+def extract_token_usage(log_directory, solved=None):
     """
     Searches for team orchestration log files in the specified directory,
     extracts "Total token usage" information, and calculates statistics.
@@ -14,9 +14,13 @@ def extract_token_usage(log_directory):
 
     Args:
         log_directory: Path to the directory containing log files
+        solved: Number of instances the run solved, to report the cost per
+            solved instance
     """
     # Dictionary to store filename -> token usage mapping
     token_data = {}
+    # Dictionary to store filename -> dollar cost mapping, for logs with costs
+    cost_data = {}
 
     # Create path to the log directory
     log_dir_path = Path(log_directory)
@@ -29,6 +33,7 @@ def extract_token_usage(log_directory):
 
     # Regular expression to find token usage
     token_pattern = re.compile(r"Total token usage: Tokens: (\d+)")
+    cost_pattern = re.compile(r"Total token usage: Tokens: \d+ .*?Cost: \$([\d.]+)")
 
     print(
         f"Found {len(text_files)} team orchestration files to process in {log_directory}/"
@@ -46,6 +51,9 @@ def extract_token_usage(log_directory):
                     token_count = int(match.group(1))
                     token_data[file_path.name] = token_count
                     print(f"Found token usage in {file_path.name}: {token_count}")
+                cost_match = cost_pattern.search(file_content)
+                if cost_match:
+                    cost_data[file_path.name] = float(cost_match.group(1))
         except Exception as e:
             print(f"Error processing {file_path.name}: {e}")
 
@@ -61,6 +69,15 @@ def extract_token_usage(log_directory):
             "total": sum(token_values),
             "count": len(token_values),
         }
+    if cost_data:
+        cost_values = list(cost_data.values())
+        statistics_data["cost"] = {
+            "mean": statistics.mean(cost_values),
+            "total": sum(cost_values),
+            "count": len(cost_values),
+        }
+        if solved:
+            statistics_data["cost"]["per_solved_instance"] = sum(cost_values) / solved
 
     # Save the results to tokens_used.txt in the specified directory
     output_path = log_dir_path / "tokens_used.txt"
@@ -86,12 +103,26 @@ def extract_token_usage(log_directory):
             output_file.write(f"Standard deviation: {statistics_data['std_dev']:.2f}\n")
             output_file.write(f"Minimum tokens: {statistics_data['min']}\n")
             output_file.write(f"Maximum tokens: {statistics_data['max']}\n")
+        if "cost" in statistics_data:
+            cost = statistics_data["cost"]
+            output_file.write(f"Files with cost data: {cost['count']}\n")
+            output_file.write(f"Total cost: ${cost['total']:.4f}\n")
+            output_file.write(f"Mean cost per file: ${cost['mean']:.4f}\n")
+            if "per_solved_instance" in cost:
+                output_file.write(
+                    f"Cost per solved instance: ${cost['per_solved_instance']:.4f}\n"
+                )
 
         # Also write as JSON for easier processing
         output_file.write("\n\n# JSON format for programmatic use:\n")
         output_file.write(
             json.dumps(
-                {"token_data": token_data, "statistics": statistics_data}, indent=2
+                {
+                    "token_data": token_data,
+                    "cost_data": cost_data,
+                    "statistics": statistics_data,
+                },
+                indent=2,
             )
         )
 
@@ -105,8 +136,19 @@ def extract_token_usage(log_directory):
         print(f"Min tokens: {statistics_data['min']}")
         print(f"Max tokens: {statistics_data['max']}")
         print(f"Total tokens: {statistics_data['total']}")
+        if "cost" in statistics_data:
+            print(f"Total cost: ${statistics_data['cost']['total']:.4f}")
+            if "per_solved_instance" in statistics_data["cost"]:
+                print(
+                    "Cost per solved instance: "
+                    f"${statistics_data['cost']['per_solved_instance']:.4f}"
+                )
 
-    return {"token_data": token_data, "statistics": statistics_data}
+    return {
+        "token_data": token_data,
+        "cost_data": cost_data,
+        "statistics": statistics_data,
+    }
 
 
 if __name__ == "__main__":
@@ -121,8 +163,15 @@ if __name__ == "__main__":
         help="Directory containing log files (default: default_experiment)",
     )
 
+    parser.add_argument(
+        "--solved",
+        type=int,
+        default=None,
+        help="Number of instances the run solved, to report the cost per solved instance",
+    )
+
     # Parse arguments
     args = parser.parse_args()
 
     # Run the extraction with the specified directory
-    extract_token_usage(args.directory)
+    extract_token_usage(args.directory, solved=args.solved)
@@ -0,0 +1,630 @@
+"""
+Local stand-in for an OpenAI-compatible API, for running without network access.
+
+Serves chat completions, streamed or not, with tool calls, and the files and
+batches endpoints of the batch API. Responses are scripted or replayed, with
+configurable latency and injected faults, to load test the team, retries and
+rate limiting on one machine without spending money:
+
+    python stub_server.py --port 8000 --latency lognormal:0.8,0.5 \\
+        --rate-429 0.05 --rate-5xx 0.02 --context-window 32000
+
+Point agents at it with "provider": "local", or "base_url", in their config.
+For the batch executor (models/batch.py), set
+"batch": {"base_url": "http://127.0.0.1:8000/v1"}.
+
+A script is a JSON list of responses, chosen by the number of assistant
+messages already in the conversation, so each consultant steps through it
+independently. The last entry is repeated once the script runs out:
+
+    [
+        {"tool_calls": [{"name": "open", "arguments": {"path": "setup.py"}}]},
+        {"content": "Looking at setup.py next."},
+        {"fault": "429"},
+        {"content": "FINAL ANSWER: ..."}
+    ]
+
+Faults are "429", "500", "503", "truncated", "empty" (a 200 without choices,
+as OpenRouter sends for upstream failures) and "context_length". A replay file
+has a recorded chat completion response per line, served in order.
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+DEFAULT_CONTENT = "FINAL ANSWER: This is a response from the local stub server."
+FAULTS = ("429", "500", "503", "truncated", "empty", "context_length")
+
+
+def parse_latency(spec: str) -> Callable[[], float]:
+    """
+    Parse a latency distribution, in seconds.
+
+    Args:
+        spec: "fixed:S", "uniform:LOW,HIGH", "normal:MEAN,STD",
+            "lognormal:MEDIAN,SIGMA" or "exponential:MEAN"
+
+    Returns:
+        Function drawing a latency from the distribution, never negative
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(value) for value in args.split(",") if value]
+    samplers: Dict[str, Callable[[], float]] = {
+        "fixed": lambda: values[0],
+        "uniform": lambda: random.uniform(values[0], values[1]),
+        "normal": lambda: random.gauss(values[0], values[1]),
+        "lognormal": lambda: values[0] * random.lognormvariate(0, values[1]),
+        "exponential": lambda: random.expovariate(1 / values[0]),
+    }
+    if kind not in samplers:
+        raise ValueError(f"Unknown latency distribution: {spec}")
+    sampler = samplers[kind]
+    return lambda: max(0.0, sampler())
+
+
+@dataclass
+class StubConfig:
+    """How the stub answers, and which faults it injects at what rates."""
+
+    latency: Callable[[], float] = lambda: 0.0
+    chunk_delay: float = 0.01
+    rate_429: float = 0.0
+    rate_5xx: float = 0.0
+    rate_truncated: float = 0.0
+    rate_empty: float = 0.0
+    context_window: Optional[int] = None
+    requests_per_minute: Optional[int] = None
+    batch_delay: float = 0.0
+    script: List[Dict[str, Any]] = field(default_factory=list)
+    replay: List[Dict[str, Any]] = field(default_factory=list)
+
+
+class StubState:
+    """Uploaded files, batches and counters, shared by all handler threads."""
+
+    def __init__(self, config: StubConfig) -> None:
+        self.config = config
+        self.files: Dict[str, Tuple[Dict[str, Any], bytes]] = {}
+        self.batches: Dict[str, Dict[str, Any]] = {}
+        self.stats: Dict[str, int] = {"requests": 0, "responses": 0}
+        self.lock = threading.Lock()
+        self._replay_index = 0
+        self._window_start = time.time()
+        self._window_requests = 0
+
+    def count(self, key: str) -> None:
+        with self.lock:
+            self.stats[key] = self.stats.get(key, 0) + 1
+
+    def next_replay(self) -> Optional[Dict[str, Any]]:
+        if not self.config.replay:
+            return None
+        with self.lock:
+            record = self.config.replay[self._replay_index % len(self.config.replay)]
+            self._replay_index += 1
+        return record
+
+    def rate_limit_headers(self) -> Tuple[bool, Dict[str, str]]:
+        """Count a request against requests_per_minute, and whether it's over."""
+        limit = self.config.requests_per_minute
+        if limit is None:
+            return False, {}
+        with self.lock:
+            now = time.time()
+            if now - self._window_start >= 60:
+                self._window_start = now
+                self._window_requests = 0
+            self._window_requests += 1
+            remaining = max(0, limit - self._window_requests)
+            reset = 60 - (now - self._window_start)
+            over = self._window_requests > limit
+        return over, {
+            "x-ratelimit-limit-requests": str(limit),
+            "x-ratelimit-remaining-requests": str(remaining),
+            "x-ratelimit-reset-requests": f"{reset:.1f}s",
+        }
+
+    def add_file(self, filename: str, purpose: str, content: bytes) -> Dict[str, Any]:
+        file = {
+            "id": f"file-{uuid.uuid4().hex}",
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed",
+        }
+        with self.lock:
+            self.files[file["id"]] = (file, content)
+        return file
+
+
+def prompt_tokens(body: Dict[str, Any]) -> int:
+    """Rough prompt size, four characters to a token."""
+    return (
+        len(json.dumps(body.get("messages", []))) // 4
+        + len(json.dumps(body.get("tools", []))) // 4
+    )
+
+
+def scripted_entry(state: StubState, body: Dict[str, Any]) -> Dict[str, Any]:
+    """The script entry for a request's step, or the default final answer."""
+    script = state.config.script
+    if not script:
+        return {"content": DEFAULT_CONTENT}
+    step = sum(
+        1 for message in body.get("messages", []) if message.get("role") == "assistant"
+    )
+    return script[min(step, len(script) - 1)]
+
+
+def chat_completion(body: Dict[str, Any], entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Build a chat completion response from a script entry."""
+    message: Dict[str, Any] = {"role": "assistant", "content": entry.get("content")}
+    finish_reason = "stop"
+    if entry.get("tool_calls"):
+        message["tool_calls"] = [
+            {
+                "id": f"call_{uuid.uuid4().hex[:24]}",
+                "type": "function",
+                "function": {
+                    "name": call["name"],
+                    "arguments": json.dumps(call.get("arguments", {})),
+                },
+            }
+            for call in entry["tool_calls"]
+        ]
+        finish_reason = "tool_calls"
+    completion_tokens = len(json.dumps(message)) // 4
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+        "usage": {
+            "prompt_tokens": prompt_tokens(body),
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens(body) + completion_tokens,
+        },
+    }
+
+
+def completion_chunks(response: Dict[str, Any], chunk_chars: int = 16) -> List[Dict]:
+    """Split a chat completion response into streaming chunks."""
+    choice = response["choices"][0]
+    message = choice["message"]
+    base = {
+        "id": response["id"],
+        "object": "chat.completion.chunk",
+        "created": response["created"],
+        "model": response["model"],
+    }
+
+    def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> Dict:
+        return {
+            **base,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+
+    chunks = [chunk({"role": "assistant", "content": ""})]
+    content = message.get("content") or ""
+    for start in range(0, len(content), chunk_chars):
+        chunks.append(chunk({"content": content[start : start + chunk_chars]}))
+    for index, call in enumerate(message.get("tool_calls", [])):
+        chunks.append(
+            chunk(
+                {
+                    "tool_calls": [
+                        {
+                            "index": index,
+                            "id": call["id"],
+                            "type": "function",
+                            "function": {
+                                "name": call["function"]["name"],
+                                "arguments": call["function"]["arguments"],
+                            },
+                        }
+                    ]
+                }
+            )
+        )
+    chunks.append(chunk({}, choice["finish_reason"]))
+    return chunks
+
+
+def run_batch(state: StubState, batch_id: str) -> None:
+    """Answer every request of a batch, and mark the batch completed."""
+    with state.lock:
+        batch = state.batches[batch_id]
+        _, content = state.files[batch["input_file_id"]]
+        batch["status"] = "in_progress"
+
+    lines = []
+    for line in content.decode("utf-8").splitlines():
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        lines.append(
+            json.dumps(
+                {
+                    "id": f"batch_req_{uuid.uuid4().hex}",
+                    "custom_id": request["custom_id"],
+                    "response": {
+                        "status_code": 200,
+                        "request_id": uuid.uuid4().hex,
+                        "body": chat_completion(
+                            request["body"], scripted_entry(state, request["body"])
+                        ),
+                    },
+                    "error": None,
+                }
+            )
+        )
+
+    output = state.add_file("output.jsonl", "batch_output", "\n".join(lines).encode())
+    with state.lock:
+        batch.update(
+            status="completed",
+            output_file_id=output["id"],
+            completed_at=int(time.time()),
+            request_counts={
+                "total": len(lines),
+                "completed": len(lines),
+                "failed": 0,
+            },
+        )
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Routes API requests to the stub implementations."""
+
+    # Keep-alive, so connection pooling behaves as against a real API
+    protocol_version = "HTTP/1.1"
+    state: StubState
+
+    def _send_json(
+        self, status: int, body: Any, headers: Optional[Dict[str, str]] = None
+    ) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status: int, message: str, code: str, **headers) -> None:
+        self._send_json(
+            status,
+            {"error": {"message": message, "type": code, "code": code}},
+            headers,
+        )
+
+    def _read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _not_found(self) -> None:
+        self._send_error(404, f"No route for {self.path}", "not_found")
+
+    def do_POST(self) -> None:
+        body = self._read_body()
+        path = self.path.split("?")[0].rstrip("/")
+        if path.endswith("/chat/completions"):
+            self._chat_completions(json.loads(body))
+        elif path.endswith("/files"):
+            self._upload_file(body)
+        elif path.endswith("/batches"):
+            self._create_batch(json.loads(body))
+        else:
+            self._not_found()
+
+    def do_GET(self) -> None:
+        parts = self.path.split("?")[0].strip("/").split("/")
+        if parts[-1] == "stats":
+            with self.state.lock:
+                self._send_json(200, dict(self.state.stats))
+        elif len(parts) >= 2 and parts[-2] == "batches":
+            batch = self.state.batches.get(parts[-1])
+            if batch is None:
+                return self._not_found()
+            with self.state.lock:
+                self._send_json(200, dict(batch))
+        elif len(parts) >= 3 and parts[-3] == "files" and parts[-1] == "content":
+            file = self.state.files.get(parts[-2])
+            if file is None:
+                return self._not_found()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(file[1])))
+            self.end_headers()
+            self.wfile.write(file[1])
+        elif len(parts) >= 2 and parts[-2] == "files":
+            file = self.state.files.get(parts[-1])
+            if file is None:
+                return self._not_found()
+            self._send_json(200, file[0])
+        else:
+            self._not_found()
+
+    def _pick_fault(self, body: Dict[str, Any], entry: Dict[str, Any]) -> Optional[str]:
+        """The fault to inject into this request, if any."""
+        config = self.state.config
+        if entry.get("fault"):
+            return entry["fault"]
+        if config.context_window and prompt_tokens(body) > config.context_window:
+            return "context_length"
+        for fault, rate in (
+            ("429", config.rate_429),
+            (random.choice(("500", "503")), config.rate_5xx),
+            ("truncated", config.rate_truncated),
+            ("empty", config.rate_empty),
+        ):
+            if rate and random.random() < rate:
+                return fault
+        return None
+
+    def _chat_completions(self, body: Dict[str, Any]) -> None:
+        state = self.state
+        state.count("requests")
+        over_limit, limit_headers = state.rate_limit_headers()
+        time.sleep(state.config.latency())
+
+        if over_limit:
+            state.count("429")
+            return self._send_error(
+                429,
+                "Rate limit reached for requests",
+                "rate_limit_exceeded",
+                **limit_headers,
+                **{"retry-after": limit_headers["x-ratelimit-reset-requests"]},
+            )
+
+        replayed = state.next_replay()
+        entry = {} if replayed is not None else scripted_entry(state, body)
+        fault = self._pick_fault(body, entry)
+        if fault is not None:
+            state.count(fault)
+        if fault == "429":
+            return self._send_error(
+                429,
+                "Rate limit reached for requests",
+                "rate_limit_exceeded",
+                **{"retry-after": "1"},
+            )
+        if fault in ("500", "503"):
+            return self._send_error(
+                int(fault), "The server had an error", "server_error"
+            )
+        if fault == "context_length":
+            return self._send_error(
+                400,
+                f"This model's maximum context length is "
+                f"{state.config.context_window} tokens. However, your messages "
+                f"resulted in {prompt_tokens(body)} tokens.",
+                "context_length_exceeded",
+            )
+
+        if replayed is not None:
+            response = {**replayed, "model": body.get("model", replayed.get("model"))}
+        else:
+            response = chat_completion(body, entry)
+        if fault == "empty":
+            response = {**response, "choices": None}
+
+        state.count("responses")
+        if body.get("stream"):
+            self._stream(
+                body, response, truncated=fault == "truncated", headers=limit_headers
+            )
+        elif fault == "truncated":
+            # Promise the whole body, send half, and drop the connection
+            data = json.dumps(response).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data[: len(data) // 2])
+            self.close_connection = True
+        else:
+            self._send_json(200, response, limit_headers)
+
+    def _stream(
+        self,
+        body: Dict[str, Any],
+        response: Dict[str, Any],
+        truncated: bool,
+        headers: Dict[str, str],
+    ) -> None:
+        """Send a response as server-sent events, in chunked encoding."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+
+        events = (
+            [json.dumps(chunk) for chunk in completion_chunks(response)]
+            if response.get("choices")
+            else [json.dumps(response)]
+        )
+        if (body.get("stream_options") or {}).get("include_usage"):
+            events.append(
+                json.dumps(
+                    {
+                        "id": response["id"],
+                        "object": "chat.completion.chunk",
+                        "created": response["created"],
+                        "model": response["model"],
+                        "choices": [],
+                        "usage": response["usage"],
+                    }
+                )
+            )
+        events.append("[DONE]")
+        if truncated:
+            events = events[: len(events) // 2]
+
+        for event in events:
+            data = f"data: {event}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+            time.sleep(self.state.config.chunk_delay)
+        if truncated:
+            self.close_connection = True
+            return
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _upload_file(self, body: bytes) -> None:
+        message = BytesParser(policy=HTTP).parsebytes(
+            f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body
+        )
+        fields: Dict[str, Tuple[Optional[str], bytes]] = {}
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            fields[name] = (part.get_filename(), part.get_payload(decode=True))
+        filename, content = fields["file"]
+        purpose = fields.get("purpose", (None, b"batch"))[1].decode()
+        self._send_json(
+            200, self.state.add_file(filename or "upload.jsonl", purpose, content)
+        )
+
+    def _create_batch(self, request: Dict[str, Any]) -> None:
+        if request.get("input_file_id") not in self.state.files:
+            return self._send_error(400, "input_file_id not found", "invalid_request")
+        batch = {
+            "id": f"batch_{uuid.uuid4().hex}",
+            "object": "batch",
+            "endpoint": request["endpoint"],
+            "input_file_id": request["input_file_id"],
+            "completion_window": request.get("completion_window", "24h"),
+            "status": "validating",
+            "output_file_id": None,
+            "error_file_id": None,
+            "created_at": int(time.time()),
+        }
+        with self.state.lock:
+            self.state.batches[batch["id"]] = batch
+        timer = threading.Timer(
+            self.state.config.batch_delay, run_batch, (self.state, batch["id"])
+        )
+        timer.daemon = True
+        timer.start()
+        self._send_json(200, batch)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        # Keep load tests quiet
+        pass
+
+
+def load_replay(path: str) -> List[Dict[str, Any]]:
+    """Read recorded chat completion responses, one per line."""
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                # Also accept batch output records
+                records.append(record.get("response", {}).get("body", record))
+    return records
+
+
+def serve(
+    host: str = "127.0.0.1", port: int = 8000, config: Optional[StubConfig] = None
+) -> ThreadingHTTPServer:
+    """
+    Create the stub server. Call serve_forever() on it, e.g. in a thread.
+
+    Args:
+        host: Host to listen on
+        port: Port to listen on, 0 for any free port
+        config: Responses, latency and faults, defaults to StubConfig()
+
+    Returns:
+        The server, with the API under /v1
+    """
+    state = StubState(config or StubConfig())
+    handler = type("Handler", (StubHandler,), {"state": state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Local stand-in for an OpenAI-compatible API"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--latency",
+        default="fixed:0",
+        help="Latency before each response, e.g. fixed:0.5, uniform:0.2,2, "
+        "normal:1,0.3, lognormal:0.8,0.5 or exponential:1 (default: fixed:0)",
+    )
+    parser.add_argument(
+        "--chunk-delay",
+        type=float,
+        default=0.01,
+        help="Seconds between streamed chunks (default: 0.01)",
+    )
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-5xx", type=float, default=0.0)
+    parser.add_argument("--rate-truncated", type=float, default=0.0)
+    parser.add_argument("--rate-empty", type=float, default=0.0)
+    parser.add_argument(
+        "--context-window",
+        type=int,
+        default=None,
+        help="Reject prompts over this many tokens with a context length error",
+    )
+    parser.add_argument(
+        "--rpm",
+        type=int,
+        default=None,
+        help="Requests per minute before answering with 429s",
+    )
+    parser.add_argument(
+        "--batch-delay",
+        type=float,
+        default=0.0,
+        help="Seconds before a submitted batch completes (default: 0)",
+    )
+    parser.add_argument("--script", help="JSON file with a list of responses")
+    parser.add_argument(
+        "--replay", help="JSONL file of recorded responses to serve in order"
+    )
+    args = parser.parse_args()
+
+    script = []
+    if args.script:
+        with open(args.script, "r", encoding="utf-8") as f:
+            script = json.load(f)
+    stub_config = StubConfig(
+        latency=parse_latency(args.latency),
+        chunk_delay=args.chunk_delay,
+        rate_429=args.rate_429,
+        rate_5xx=args.rate_5xx,
+        rate_truncated=args.rate_truncated,
+        rate_empty=args.rate_empty,
+        context_window=args.context_window,
+        requests_per_minute=args.rpm,
+        batch_delay=args.batch_delay,
+        script=script,
+        replay=load_replay(args.replay) if args.replay else [],
+    )
+
+    server = serve(args.host, args.port, stub_config)
+    print(f"Stub API listening on http://{args.host}:{server.server_port}/v1")
+    server.serve_forever()
@@ -2,6 +2,7 @@ from .create_new_file import create_new_file
 from .edit_file import edit_file
 from .find_file import find_file
 from .open_file import open_file
+from .run_tests import run_tests
 from .scroll_down import scroll_down
 from .scroll_up import scroll_up
 from .search_dir import search_dir
@@ -14,6 +15,7 @@ __all__ = [
     "search_file",
     "create_new_file",
     "find_file",
+    "run_tests",
     "scroll_down",
     "scroll_up",
 ]
@@ -0,0 +1,161 @@
+import re
+import shlex
+from typing import Dict, List, Tuple
+
+from inspect_ai.tool import Tool, tool
+from inspect_ai.util import sandbox, store
+
+# Test results per "<tree hash>:<test id>", so unchanged reruns are instant
+RUN_TESTS_CACHE_KEY = "RUN_TESTS_CACHE"
+
+# Hash of the working tree, including uncommitted and untracked files, computed
+# with a throwaway index so the repository's own index is left untouched
+TREE_HASH_COMMAND = """
+cd "$(git rev-parse --show-toplevel)" || exit 1
+index=$(mktemp)
+cp "$(git rev-parse --git-dir)/index" "$index" 2>/dev/null
+GIT_INDEX_FILE="$index" git add -A . >/dev/null 2>&1 && GIT_INDEX_FILE="$index" git write-tree
+status=$?
+rm -f "$index"
+exit $status
+"""
+
+_PYTEST_RESULT = re.compile(
+    r"^(PASSED|FAILED|ERROR|SKIPPED|XFAIL|XPASS) (\S+)(?: - (.*))?$", re.MULTILINE
+)
+_DJANGO_RESULT = re.compile(
+    r"^(\w+) \(([\w.]+)\)(?:\n.*?)? \.\.\. (ok|FAIL|ERROR|skipped.*|expected failure|unexpected success)$",
+    re.MULTILINE,
+)
+_DJANGO_STATUS = {
+    "ok": "PASSED",
+    "FAIL": "FAILED",
+    "ERROR": "ERROR",
+    "expected failure": "XFAIL",
+    "unexpected success": "XPASS",
+}
+
+
+def _parse_pytest(output: str) -> Dict[str, str]:
+    """Map pytest node ids to a one-line result, from the -rA short summary."""
+    results = {}
+    for status, node_id, message in _PYTEST_RESULT.findall(output):
+        results[node_id] = f"{status} {node_id}" + (f" - {message}" if message else "")
+    return results
+
+
+def _parse_django(output: str) -> Dict[str, str]:
+    """Map Django test ids to a one-line result, from verbosity 2 output."""
+    results = {}
+    for name, test_class, status in _DJANGO_RESULT.findall(output):
+        # Python 3.11+ prints the full test id in the parentheses
+        test_id = (
+            test_class if test_class.endswith(f".{name}") else f"{test_class}.{name}"
+        )
+        status = _DJANGO_STATUS.get(status, "SKIPPED")
+        results[test_id] = f"{status} {test_id}"
+    return results
+
+
+def _results_for(test: str, results: Dict[str, str]) -> List[str]:
+    """Results belonging to a requested test id, test file or directory."""
+    test = test.rstrip("/")
+    return [
+        result
+        for test_id, result in sorted(results.items())
+        if test_id == test or test_id.startswith((f"{test}::", f"{test}/", f"{test}."))
+    ]
+
+
+def _summarise(test: str, results: List[str], cached: bool) -> str:
+    """Summarise the results for one requested test, listing only non-passes."""
+    passed = sum(1 for result in results if result.startswith("PASSED"))
+    others = [result for result in results if not result.startswith("PASSED")]
+    header = f"{test}: {passed} passed"
+    if others:
+        header += f", {len(others)} not passed"
+    if cached:
+        header += " (cached, workspace unchanged)"
+    return "\n".join([header, *(f"  {result}" for result in others)])
+
+
+async def _exec(command: str, timeout: int | None = None) -> Tuple[bool, str]:
+    result = await sandbox().exec(
+        ["bash", "-c", command],
+        timeout=timeout,
+        env={"PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    return result.success, result.stdout + result.stderr
+
+
+@tool(parallel=False)
+def run_tests(timeout: int = 300, workers: int = 4) -> Tool:
+    async def run_tests(tests: str) -> str:
+        """Runs the given tests and returns a compact pass/fail summary. Only pass specific test ids or test files, never the whole test suite. Results are cached until the code changes.
+
+        Args:
+            tests (str): space-separated test ids or test file paths, relative to the repository root, e.g. "tests/test_api.py::TestGet::test_params tests/test_utils.py" (pytest) or "model_fields.test_jsonfield" (Django's tests/runtests.py).
+
+        Returns:
+        str: the number of passed tests per requested test, and every test that did not pass
+        """
+        requested = sorted(set(tests.split()))
+        if not requested:
+            return "No tests given. Pass test ids or test file paths."
+
+        success, tree_hash = await _exec(TREE_HASH_COMMAND)
+        tree_hash = tree_hash.strip() if success else ""
+        cache: Dict[str, List[str]] = store().get(RUN_TESTS_CACHE_KEY, {})
+
+        summaries = {}
+        to_run = []
+        for test in requested:
+            cached = cache.get(f"{tree_hash}:{test}") if tree_hash else None
+            if cached is not None:
+                summaries[test] = _summarise(test, cached, cached=True)
+            else:
+                to_run.append(test)
+
+        if to_run:
+            is_django, _ = await _exec(
+                'cd "$(git rev-parse --show-toplevel)" && test -f tests/runtests.py'
+            )
+            quoted = " ".join(shlex.quote(test) for test in to_run)
+            if is_django:
+                command = (
+                    f"tests/runtests.py --verbosity 2 --parallel {workers} {quoted}"
+                )
+                parse = _parse_django
+            else:
+                # Use pytest-xdist workers when it is installed
+                command = (
+                    "python -m pytest -rA -q -p no:cacheprovider --tb=no "
+                    + f"$(python -c 'import xdist' 2>/dev/null && echo '-n {workers}') "
+                    + quoted
+                )
+                parse = _parse_pytest
+
+            try:
+                _, output = await _exec(
+                    f'cd "$(git rev-parse --show-toplevel)" && {command}',
+                    timeout=timeout,
+                )
+            except TimeoutError:
+                return f"Tests timed out after {timeout} seconds. Run fewer or more specific tests."
+
+            results = parse(output)
+            for test in to_run:
+                test_results = _results_for(test, results)
+                if not test_results:
+                    # Nothing collected, most likely a bad test id or a collection error
+                    tail = "\n".join(output.strip().splitlines()[-15:])
+                    summaries[test] = f"{test}: no test results\n{tail}"
+                    continue
+                if tree_hash:
+                    cache[f"{tree_hash}:{test}"] = test_results
+                summaries[test] = _summarise(test, test_results, cached=False)
+            store().set(RUN_TESTS_CACHE_KEY, cache)
+
+        return "\n".join(summaries[test] for test in requested)
+
+    return run_tests
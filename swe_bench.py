@@ -34,7 +34,10 @@ from inspect_evals.swe_bench.swe_agent_tools import (
     search_file,
 )
 
-from inspect_evals.swe_bench.autogen_team.main import consult_multi_agent_team
+from inspect_evals.swe_bench.autogen_team.main import (
+    cleanup_team,
+    consult_multi_agent_team,
+)
 from inspect_ai.solver import bridge
 
 COMPOSE_FILES_DIR = Path(user_cache_dir("inspect_swebench_eval")) / "compose_files/"
@@ -174,6 +177,7 @@ def swe_bench(
         solver=solver or default_solver(max_messages),
         epochs=epochs,
         scorer=scorer or swe_bench_scorer(),
+        cleanup=cleanup_team,
     )
 
 
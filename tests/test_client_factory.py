@@ -0,0 +1,96 @@
+"""OpenRouter provider preferences reach the request body."""
+
+import asyncio
+import json
+from typing import Any, Dict, List
+
+import httpx
+import pytest
+
+pytest.importorskip("inspect_evals")
+
+from autogen_core.models import UserMessage  # noqa: E402
+
+from inspect_evals.swe_bench.autogen_team.models.client_factory import (  # noqa: E402
+    create_model_client,
+)
+from inspect_evals.swe_bench.autogen_team.models.extra_body import (  # noqa: E402
+    ExtraBodyTransport,
+)
+
+COMPLETION = {
+    "id": "gen-1",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "anthropic/claude-3.5-sonnet",
+    "choices": [
+        {
+            "index": 0,
+            "message": {"role": "assistant", "content": "FINAL ANSWER: done"},
+            "finish_reason": "stop",
+        }
+    ],
+    "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+}
+
+
+def _run(
+    model_config: Dict[str, Any], statuses: List[int], monkeypatch
+) -> List[Dict[str, Any]]:
+    """Make one call, answering requests with the given statuses in turn."""
+    monkeypatch.setenv("OPENROUTER_API_KEY", "test")
+    bodies = []
+    responses = iter(statuses)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        bodies.append(json.loads(request.content))
+        status = next(responses)
+        if status != 200:
+            return httpx.Response(status, json={"error": {"message": "overloaded"}})
+        return httpx.Response(200, json=COMPLETION)
+
+    async def call() -> None:
+        transport = ExtraBodyTransport(httpx.MockTransport(handler))
+        async with httpx.AsyncClient(transport=transport) as http:
+            client = create_model_client(model_config, http_client=http)
+            await client.create([UserMessage(content="hi", source="user")])
+
+    asyncio.run(call())
+    return bodies
+
+
+def test_provider_preferences_are_sent(monkeypatch) -> None:
+    bodies = _run(
+        {
+            "provider": "openrouter",
+            "model": "anthropic/claude-3.5-sonnet",
+            "provider_order": ["Anthropic", "Amazon Bedrock"],
+            "require_full_parameter_support": True,
+            "middle_out": True,
+        },
+        [200],
+        monkeypatch,
+    )
+
+    assert bodies[0]["provider"] == {
+        "require_parameters": True,
+        "order": ["Anthropic", "Amazon Bedrock"],
+        "allow_fallbacks": False,
+    }
+    assert bodies[0]["transforms"] == ["middle-out"]
+
+
+def test_provider_order_fallback_changes_the_route(monkeypatch) -> None:
+    bodies = _run(
+        {
+            "provider": "openrouter",
+            "model": "anthropic/claude-3.5-sonnet",
+            "retry": {"max_attempts": 1, "base_delay": 0},
+            "fallbacks": [{"provider_order": ["Amazon Bedrock"]}],
+        },
+        [503, 200],
+        monkeypatch,
+    )
+
+    assert "provider" not in bodies[0]
+    assert bodies[1]["provider"]["order"] == ["Amazon Bedrock"]
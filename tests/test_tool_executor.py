@@ -0,0 +1,62 @@
+"""Classification of bash commands as read-only, for concurrent tool calls."""
+
+import pytest
+
+pytest.importorskip("inspect_evals")
+
+from inspect_evals.swe_bench.autogen_team.tool_executor import (  # noqa: E402
+    is_read_only_bash_command,
+)
+
+
+@pytest.mark.parametrize(
+    "command",
+    [
+        "ls -la",
+        "cat setup.py | head -20",
+        "grep -rn 'def save' src 2>/dev/null",
+        "find . -name '*.py' | wc -l",
+        "git diff HEAD~1 && git status",
+        "sed -n '10,20p' src/pkg/models.py",
+        "sed -n '/error/,/end/p' src/pkg/errors.py",
+        "sort names.txt | uniq -c",
+    ],
+)
+def test_read_only_commands(command: str) -> None:
+    assert is_read_only_bash_command(command)
+
+
+@pytest.mark.parametrize(
+    "command",
+    [
+        # Newlines separate commands
+        "ls\nrm -rf /testbed/x",
+        "ls -la\r\npython setup.py develop",
+        "cat a.py\x0bpython setup.py develop",
+        # Background jobs
+        "ls & rm -rf /testbed/x",
+        "grep -rn foo . &",
+        # Redirections and substitutions
+        "cat a.py > b.py",
+        "grep foo a.py >> out.txt",
+        "cat < a.py",
+        "echo $(rm a.py)",
+        "echo `rm a.py`",
+        # Commands that write files or run other commands
+        "sed -i 's/a/b/' a.py",
+        "sed -n -i 's/a/b/p' a.py",
+        "sed -n '1w out' a.py",
+        "sed -n '1e rm a.py' a.py",
+        "find . -name '*.pyc' -exec rm {} ;",
+        "find . -name '*.pyc' -delete",
+        "git grep -O foo",
+        "git diff --output=patch.diff",
+        "git checkout main",
+        "sort -o a.py b.py",
+        "uniq in.txt out.txt",
+        "tree -o out.txt",
+        "python -c 'print(1)'",
+    ],
+)
+def test_stateful_commands(command: str) -> None:
+    assert not is_read_only_bash_command(command)
@@ -0,0 +1,115 @@
+"""Blackboard facts are extracted from the plain output of real tool adapters."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("inspect_evals")
+
+from autogen_core import (  # noqa: E402
+    AgentId,
+    AgentInstantiationContext,
+    CancellationToken,
+    FunctionCall,
+    SingleThreadedAgentRuntime,
+)
+
+from inspect_evals.swe_bench.autogen_team.agents.consultant import (  # noqa: E402
+    CodeConsultant,
+)
+from inspect_evals.swe_bench.autogen_team.data_models.blackboard import (  # noqa: E402
+    Blackboard,
+)
+from inspect_evals.swe_bench.autogen_team.tools import (  # noqa: E402
+    OpenFileTool,
+    SearchDirTool,
+)
+from inspect_evals.swe_bench.autogen_team.utils.loop_detection import (  # noqa: E402
+    LoopDetector,
+)
+
+OPEN_OUTPUT = """[File: /testbed/src/pkg/models.py (120 lines total)]
+(1 more lines above)
+2:import json
+3:
+4:class Model:
+5:    def save(self):
+6:        return json.dumps(self.__dict__)
+(114 more lines below)
+WARNING: Scrolling many times in a row is very inefficient.
+If you know what you are looking for, use `search_file <pattern>` instead.
+"""
+
+SEARCH_DIR_OUTPUT = """Found 3 matches for "save" in /testbed/src:
+/testbed/src/pkg/models.py (2 matches)
+/testbed/src/pkg/store.py (1 matches)
+End of matches for "save" in /testbed/src
+"""
+
+
+async def _fixed_output(output: str, **kwargs: object) -> str:
+    return output
+
+
+def _consultant(tmp_path, tools, **kwargs) -> CodeConsultant:
+    runtime = SingleThreadedAgentRuntime()
+    with AgentInstantiationContext.populate_context(
+        (runtime, AgentId("CodeConsultantA", "default"))
+    ):
+        return CodeConsultant(
+            model_client=None,
+            topic_type="CodeConsultantA",
+            num_neighbors=2,
+            max_round=3,
+            tools=tools,
+            log_base_path=f"{tmp_path}/",
+            experiment_name="test",
+            **kwargs,
+        )
+
+
+def _call(consultant: CodeConsultant, name: str, arguments: str):
+    ctx = SimpleNamespace(cancellation_token=CancellationToken())
+    return asyncio.run(
+        consultant._execute_tool_call(
+            FunctionCall(id="call_1", name=name, arguments=arguments), ctx
+        )
+    )
+
+
+def test_open_and_search_dir_results_fill_the_blackboard(tmp_path) -> None:
+    blackboard = Blackboard()
+    open_tool = OpenFileTool(lambda **kwargs: _fixed_output(OPEN_OUTPUT))
+    search_tool = SearchDirTool(lambda **kwargs: _fixed_output(SEARCH_DIR_OUTPUT))
+    consultant = _consultant(tmp_path, [open_tool, search_tool], blackboard=blackboard)
+
+    result, output = _call(consultant, "open_file", '{"path": "src/pkg/models.py"}')
+    assert not result.is_error
+    assert output == OPEN_OUTPUT
+    _call(consultant, "search_dir", '{"search_term": "save", "dir": "/testbed/src"}')
+
+    digest = blackboard.digest("CodeConsultantB/default")
+    assert len(blackboard) > 0
+    assert "/testbed/src/pkg/models.py" in digest
+    assert "Model" in digest
+    assert "save" in digest
+    assert consultant._new_findings > 0
+
+
+def test_loop_detector_fingerprints_plain_output(tmp_path) -> None:
+    detector = LoopDetector()
+    detector.start()
+    outputs = iter([OPEN_OUTPUT, OPEN_OUTPUT.split("WARNING")[0]])
+    open_tool = OpenFileTool(lambda **kwargs: _fixed_output(next(outputs)))
+    consultant = _consultant(tmp_path, [open_tool], loop_detector=detector)
+
+    hints = []
+    for path in ("a.py", "b.py"):
+        arguments = f'{{"path": "{path}"}}'
+        result, output = _call(consultant, "open_file", arguments)
+        hints.append(detector.record("open_file", arguments, result.content, output))
+
+    # Only the scroll warning differs, so the second call shows nothing new
+    assert hints[0] is None
+    assert hints[1] is not None
@@ -0,0 +1,81 @@
+"""Parsing of tool calls written in the text of a model response."""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("inspect_evals")
+
+from autogen_core import (  # noqa: E402
+    AgentId,
+    AgentInstantiationContext,
+    CancellationToken,
+    FunctionCall,
+    SingleThreadedAgentRuntime,
+)
+from autogen_core.models import CreateResult, RequestUsage  # noqa: E402
+
+from inspect_evals.swe_bench.autogen_team.agents.consultant import (  # noqa: E402
+    CodeConsultant,
+)
+from inspect_evals.swe_bench.autogen_team.tool_protocol import (  # noqa: E402
+    INVALID_TOOL_CALL,
+    format_tool_calls,
+    parse_tool_call_response,
+)
+
+RESPONSE = """Let me look at the model first.
+<tool_call>{"name": "open_file", "arguments": {"path": "src/pkg/models.py"}}</tool_call>
+<tool_call>{"name": "search_dir", "arguments": {"search_term": "save"</tool_call>
+"""
+
+
+def _parse() -> CreateResult:
+    return parse_tool_call_response(
+        CreateResult(
+            finish_reason="stop",
+            content=RESPONSE,
+            usage=RequestUsage(prompt_tokens=10, completion_tokens=20),
+            cached=False,
+        )
+    )
+
+
+def test_malformed_block_becomes_an_invalid_call() -> None:
+    result = _parse()
+
+    assert result.finish_reason == "function_calls"
+    assert all(isinstance(call, FunctionCall) for call in result.content)
+    valid, invalid = result.content
+    assert valid.name == "open_file"
+    assert json.loads(valid.arguments) == {"path": "src/pkg/models.py"}
+    assert invalid.name == INVALID_TOOL_CALL
+    assert invalid.arguments.startswith('{"name": "search_dir"')
+    # The history shows both blocks as the model wrote them
+    assert format_tool_calls(result.content).count("<tool_call>") == 2
+
+
+def test_invalid_call_is_reported_to_the_model(tmp_path) -> None:
+    runtime = SingleThreadedAgentRuntime()
+    with AgentInstantiationContext.populate_context(
+        (runtime, AgentId("CodeConsultantA", "default"))
+    ):
+        consultant = CodeConsultant(
+            model_client=None,
+            topic_type="CodeConsultantA",
+            num_neighbors=2,
+            max_round=3,
+            tools=[],
+            log_base_path=f"{tmp_path}/",
+            experiment_name="test",
+            tool_protocol="text",
+        )
+    ctx = SimpleNamespace(cancellation_token=CancellationToken())
+
+    result, _ = asyncio.run(consultant._execute_tool_call(_parse().content[1], ctx))
+
+    assert result.is_error
+    assert result.call_id == "text_call_1"
+    assert result.content.startswith("Invalid tool call format:")